@@ -4,18 +4,22 @@ External APIs Manager
 """
 
 import asyncio
-import aiohttp
 import json
 from typing import Dict, List, Optional, Any
 from urllib.parse import urlparse, quote
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from config import Config
 from core.logger import get_security_logger
+from core.cache import cache_manager
+from core.http import http_hub
 from .virustotal import VirusTotalAPI
 
 logger = get_security_logger()
 
+# مساحات CacheManager التي يستخدمها المدير
+API_CACHE_TYPES = ('url_reputation', 'domain_info', 'ip_geolocation')
+
 class ExternalAPIManager:
     """مدير الـ APIs الخارجية"""
     
@@ -23,19 +27,6 @@ class ExternalAPIManager:
         self.virustotal = VirusTotalAPI()
         self.session = None
         
-        # إعدادات الطلبات
-        self.timeout = aiohttp.ClientTimeout(total=30)
-        self.headers = {
-            'User-Agent': 'CyberSentinel-Bot/1.0 Security Scanner'
-        }
-        
-        # كاش للنتائج
-        self.cache = {
-            'url_reputation': {},
-            'domain_info': {},
-            'ip_geolocation': {}
-        }
-        
         # قوائم الحماية
         self.threat_intelligence = {
             'malware_domains': set(),
@@ -47,11 +38,8 @@ class ExternalAPIManager:
     async def initialize(self):
         """تهيئة المدير والـ APIs"""
         try:
-            # إنشاء جلسة HTTP
-            self.session = aiohttp.ClientSession(
-                timeout=self.timeout,
-                headers=self.headers
-            )
+            # جلسة ملف threat_intel على الموصل المشترك (المهلة والترويسات في http_hub)
+            self.session = http_hub.session('threat_intel')
             
             # تهيئة VirusTotal
             await self.virustotal.initialize()
@@ -67,9 +55,8 @@ class ExternalAPIManager:
             return False
     
     async def close(self):
-        """إغلاق الجلسات"""
-        if self.session:
-            await self.session.close()
+        """ترك الجلسات (يغلقها http_hub مع البوت)"""
+        self.session = None
         
         if self.virustotal:
             await self.virustotal.close()
@@ -87,6 +74,10 @@ class ExternalAPIManager:
         }
         
         try:
+            cached = await cache_manager.get('url_reputation', url)
+            if cached is not None:
+                return cached
+            
             # 1. فحص VirusTotal
             vt_result = await self.virustotal.scan_url(url)
             if vt_result:
@@ -134,6 +125,7 @@ class ExternalAPIManager:
                 scan_result['threat_level'] = 'low'
             
             logger.info(f"🔍 فحص شامل للرابط {url[:50]}... - النتيجة: {scan_result['threat_level']}")
+            await cache_manager.set('url_reputation', url, scan_result)
             return scan_result
             
         except Exception as e:
@@ -175,11 +167,10 @@ class ExternalAPIManager:
     async def get_domain_intelligence(self, domain: str) -> Dict:
         """الحصول على معلومات استخباراتية عن النطاق"""
         try:
-            # التحقق من الكاش أولاً
-            if domain in self.cache['domain_info']:
-                cached_data = self.cache['domain_info'][domain]
-                if self._is_cache_valid(cached_data['timestamp']):
-                    return cached_data['data']
+            # التحقق من الكاش أولاً (صلاحية 24 ساعة من إعدادات المساحة)
+            cached = await cache_manager.get('domain_info', domain)
+            if cached is not None:
+                return cached
             
             intelligence = {
                 'domain': domain,
@@ -205,10 +196,7 @@ class ExternalAPIManager:
                 intelligence['threat_categories'].append('known_malware')
             
             # حفظ في الكاش
-            self.cache['domain_info'][domain] = {
-                'data': intelligence,
-                'timestamp': datetime.now()
-            }
+            await cache_manager.set('domain_info', domain, intelligence)
             
             return intelligence
             
@@ -296,6 +284,10 @@ class ExternalAPIManager:
             parsed_url = urlparse(url)
             domain = parsed_url.netloc
             
+            cached = await cache_manager.get('ip_geolocation', domain)
+            if cached is not None:
+                return cached
+            
             # يمكن استخدام خدمات مجانية مثل ipapi.co
             # هذا مثال أساسي
             
@@ -304,16 +296,19 @@ class ExternalAPIManager:
             
             # فحص الـ IPs المشبوهة
             if ip in self.threat_intelligence['suspicious_ips']:
-                return {
+                ip_info = {
                     'ip': ip,
                     'is_suspicious': True,
                     'reason': 'known_malicious_ip'
                 }
+            else:
+                ip_info = {
+                    'ip': ip,
+                    'is_suspicious': False
+                }
             
-            return {
-                'ip': ip,
-                'is_suspicious': False
-            }
+            await cache_manager.set('ip_geolocation', domain, ip_info)
+            return ip_info
             
         except Exception as e:
             logger.debug(f"لا يمكن الحصول على معلومات الـ IP للنطاق: {e}")
@@ -344,9 +339,9 @@ class ExternalAPIManager:
         except Exception as e:
             logger.error(f"خطأ في تحميل قوائم التهديدات: {e}")
     
-    def _is_cache_valid(self, timestamp: datetime, max_age_hours: int = 24) -> bool:
-        """التحقق من صحة الكاش"""
-        return datetime.now() - timestamp < timedelta(hours=max_age_hours)
+    def _cache_stats(self) -> Dict[str, Dict]:
+        """عدادات مساحات الكاش الخاصة بالـ APIs من CacheManager"""
+        return {cache_type: cache_manager.namespace_stats(cache_type) for cache_type in API_CACHE_TYPES}
     
     async def update_threat_intelligence(self):
         """تحديث قوائم التهديدات"""
@@ -362,6 +357,7 @@ class ExternalAPIManager:
     async def get_api_status(self) -> Dict:
         """الحصول على حالة جميع الـ APIs"""
         try:
+            cache_stats = self._cache_stats()
             status = {
                 'virustotal': {
                     'available': bool(Config.VIRUSTOTAL_API_KEY),
@@ -371,11 +367,12 @@ class ExternalAPIManager:
                 },
                 'external_apis': {
                     'session_active': self.session is not None,
+                    'http': http_hub.get_stats(),
                     'cache_size': {
-                        'url_reputation': len(self.cache['url_reputation']),
-                        'domain_info': len(self.cache['domain_info']),
-                        'ip_geolocation': len(self.cache['ip_geolocation'])
+                        cache_type: stats['entries'] for cache_type, stats in cache_stats.items()
                     },
+                    'cache': cache_stats,
+                    'cache_memory': cache_manager.get_memory_usage(),
                     'threat_intelligence': {
                         'malware_domains': len(self.threat_intelligence['malware_domains']),
                         'phishing_urls': len(self.threat_intelligence['phishing_urls']),
@@ -443,7 +440,7 @@ class ExternalAPIManager:
                 'total_scans_today': 0,
                 'threats_detected_today': 0,
                 'top_threat_types': {},
-                'cache_hit_rate': 0.0,
+                'cache_hit_rate': cache_manager.hit_rate(*API_CACHE_TYPES),
                 'api_calls_today': {
                     'virustotal': 0,
                     'domain_reputation': 0,
@@ -469,15 +466,13 @@ class ExternalAPIManager:
         """مسح الكاش"""
         try:
             if cache_type == 'all':
-                self.cache = {
-                    'url_reputation': {},
-                    'domain_info': {},
-                    'ip_geolocation': {}
-                }
-                logger.info("🗑️ تم مسح جميع الكاش")
-            elif cache_type in self.cache:
-                self.cache[cache_type] = {}
-                logger.info(f"🗑️ تم مسح كاش {cache_type}")
+                cleared = 0
+                for name in API_CACHE_TYPES:
+                    cleared += await cache_manager.clear(name)
+                logger.info(f"🗑️ تم مسح جميع الكاش ({cleared} عنصر)")
+            elif cache_type in API_CACHE_TYPES:
+                cleared = await cache_manager.clear(cache_type)
+                logger.info(f"🗑️ تم مسح كاش {cache_type} ({cleared} عنصر)")
             else:
                 logger.warning(f"نوع كاش غير معروف: {cache_type}")
                 
@@ -517,9 +512,7 @@ class ExternalAPIManager:
                     key: list(value) for key, value in self.threat_intelligence.items()
                 },
                 'cache_statistics': {
-                    'url_reputation_entries': len(self.cache['url_reputation']),
-                    'domain_info_entries': len(self.cache['domain_info']),
-                    'ip_geolocation_entries': len(self.cache['ip_geolocation'])
+                    f'{cache_type}_entries': stats['entries'] for cache_type, stats in self._cache_stats().items()
                 }
             }
             
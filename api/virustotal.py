@@ -4,17 +4,20 @@ VirusTotal API Integration
 """
 
 import asyncio
-import aiohttp
 import hashlib
 import base64
 from typing import Dict, Optional, List
 from urllib.parse import urlparse
 
 from config import Config
+from core.http import http_hub
 from core.logger import get_security_logger
 
 logger = get_security_logger()
 
+# الوقت المحجوز لطلب متابعة واحد عند حساب ما يتسع له المتبقي من مهلة المتصل
+POLL_REQUEST_ALLOWANCE = 1.0
+
 class VirusTotalAPI:
     """واجهة برمجة تطبيقات VirusTotal"""
     
@@ -36,10 +39,8 @@ class VirusTotalAPI:
             logger.warning("⚠️ لم يتم توفير مفتاح VirusTotal API")
             return False
         
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=30),
-            headers={'User-Agent': 'CyberSentinel-Bot/1.0'}
-        )
+        # جلسة ملف virustotal على الموصل المشترك
+        self.session = http_hub.session('virustotal')
         
         # اختبار الاتصال
         test_result = await self._test_connection()
@@ -51,29 +52,31 @@ class VirusTotalAPI:
             return False
     
     async def close(self):
-        """إغلاق الجلسة"""
-        if self.session:
-            await self.session.close()
+        """ترك الجلسة (يغلقها http_hub مع البوت)"""
+        self.session = None
     
-    async def scan_url(self, url: str) -> Optional[Dict]:
-        """فحص رابط باستخدام VirusTotal"""
+    async def scan_url(self, url: str, budget: Optional[float] = None) -> Optional[Dict]:
+        """فحص رابط باستخدام VirusTotal
+        
+        budget: الثواني المتاحة للمتصل، ولا يبدأ انتظار تقرير لن يصل قبل نهايتها.
+        كل طلب (تقرير، إرسال، متابعة) يُحسب من حد الطلبات.
+        """
         if not self.session or not self.api_key:
             return None
         
         try:
-            # التحقق من حدود الطلبات
-            if not await self._check_rate_limit():
-                logger.warning("تم تجاوز حد الطلبات لـ VirusTotal")
-                return None
+            deadline = None if budget is None else asyncio.get_running_loop().time() + budget
             
-            # إرسال الرابط للفحص
-            scan_id = await self._submit_url(url)
-            if not scan_id:
+            # تقرير موجود مسبقاً يغني عن الإرسال والانتظار
+            result = await self._get_scan_report(url)
+            if result is None:
                 return None
-            
-            # انتظار قصير ثم الحصول على النتيجة
-            await asyncio.sleep(2)
-            result = await self._get_scan_report(scan_id)
+            if result.get('response_code') != 1:
+                # إرسال الرابط للفحص ثم متابعة التقرير بفواصل متزايدة
+                scan_id = await self._submit_url(url)
+                if not scan_id:
+                    return None
+                result = await self._poll_scan_report(scan_id, deadline=deadline)
             
             return self._parse_scan_result(result, url)
             
@@ -140,6 +143,10 @@ class VirusTotalAPI:
     
     async def _submit_url(self, url: str) -> Optional[str]:
         """إرسال رابط للفحص"""
+        if not await self._check_rate_limit():
+            logger.warning("تم تجاوز حد الطلبات لـ VirusTotal")
+            return None
+        
         try:
             data = {
                 'apikey': self.api_key,
@@ -163,6 +170,10 @@ class VirusTotalAPI:
     
     async def _get_scan_report(self, scan_id: str) -> Optional[Dict]:
         """الحصول على تقرير الفحص"""
+        if not await self._check_rate_limit():
+            logger.warning("تم تجاوز حد الطلبات لـ VirusTotal")
+            return None
+        
         try:
             params = {
                 'apikey': self.api_key,
@@ -182,6 +193,24 @@ class VirusTotalAPI:
             logger.error(f"خطأ في الحصول على التقرير: {e}")
             return None
     
+    async def _poll_scan_report(self, scan_id: str, delays=(1, 2, 4),
+                                deadline: Optional[float] = None) -> Optional[Dict]:
+        """انتظار اكتمال الفحص بفواصل متزايدة حتى deadline (وقت الحلقة) أو نفاد الحد"""
+        loop = asyncio.get_running_loop()
+        result = None
+        for delay in delays:
+            if deadline is not None and loop.time() + delay + POLL_REQUEST_ALLOWANCE > deadline:
+                # الطلب لن يكتمل قبل مهلة المتصل: لا داعي لإهدار الحد
+                break
+            await asyncio.sleep(delay)
+            report = await self._get_scan_report(scan_id)
+            if report is None:
+                break
+            result = report
+            if result.get('response_code') == 1:
+                break
+        return result
+    
     def _parse_scan_result(self, result: Dict, url: str) -> Dict:
         """تحليل نتيجة فحص الرابط"""
         if not result:
@@ -9,6 +9,9 @@ from typing import Optional
 from config import Config
 from core.logger import setup_logger, get_security_logger
 from core.database import db_manager
+from core.cache import cache_manager
+from core.expiry import expiry_scheduler
+from core.http import http_hub
 
 # استيراد معالج الأحداث (إذا كان موجوداً)
 try:
@@ -201,6 +204,12 @@ class SecurityBot(commands.Bot):
             if hasattr(self, 'stats_update_task'):
                 self.stats_update_task.start()
             
+            # انتهاء صلاحية الكاش وبيانات الأنظمة الأمنية في الذاكرة
+            expiry_scheduler.start()
+            
+            # الموصل المشترك لطلبات HTTP (قد يكون بدأ مع أول تكامل)
+            http_hub.start()
+            
             logger.info("⚙️ تم بدء المهام الخلفية المتوفرة")
             
         except Exception as e:
@@ -275,6 +284,12 @@ class SecurityBot(commands.Bot):
             # مهمة تحديث الإحصائيات
             if hasattr(self, 'stats_update_task'):
                 self.stats_update_task.start()
+            
+            # انتهاء صلاحية الكاش وبيانات الأنظمة الأمنية في الذاكرة
+            expiry_scheduler.start()
+            
+            # الموصل المشترك لطلبات HTTP (قد يكون بدأ مع أول تكامل)
+            http_hub.start()
     
             logger.info("⚙️ تم بدء المهام الخلفية المتوفرة")
             
@@ -452,6 +467,23 @@ class SecurityBot(commands.Bot):
         if hasattr(self, 'stats_update_task'):
             self.stats_update_task.cancel()
         
+        # إيقاف إعادة فحص الروابط في الخلفية
+        if self.link_guardian:
+            try:
+                await self.link_guardian.close()
+            except Exception:
+                pass
+        
+        # إغلاق جلسات HTTP والموصل المشترك بعد توقف مستخدميها
+        await http_hub.close()
+        
+        # إيقاف مجدول انتهاء الصلاحية ثم إغلاق كاش القرص
+        await expiry_scheduler.stop()
+        try:
+            await cache_manager.close()
+        except Exception:
+            pass
+        
         # إغلاق قاعدة البيانات
         if hasattr(self, 'db_manager') and db_manager:
             try:
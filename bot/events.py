@@ -1,5 +1,6 @@
 import discord
 import asyncio
+import functools
 import re
 import hashlib
 from datetime import datetime, timedelta
@@ -64,8 +65,8 @@ class EventHandler:
             return
         
         try:
-            # الحصول على إعدادات السيرفر
-            guild_settings = await db_manager.get_guild_settings(message.guild.id)
+            # الحصول على إعدادات السيرفر من الذاكرة (بدون استعلام لكل رسالة)
+            guild_settings = db_manager.get_cached_guild_settings(message.guild.id)
             
             # تحديث نشاط المستخدم
             await self._track_user_activity(message)
@@ -197,19 +198,52 @@ class EventHandler:
         
         for url in urls:
             try:
-                # فحص الرابط مع نظام حماية الروابط
+                # حكم سريع محلي الآن، والحكم البعيد (VirusTotal) يصل لاحقاً إلى _on_remote_verdict
                 if self.bot.link_guardian:
-                    scan_result = await self.bot.link_guardian.scan_url(url)
+                    handled = {'malicious': False}
+                    scan_result = await self.bot.link_guardian.quick_verdict(
+                        url,
+                        message.guild.id,
+                        on_final=functools.partial(self._on_remote_verdict, message, url, handled)
+                    )
+                    is_malicious = scan_result.get('is_malicious', False)
+                    handled['malicious'] = is_malicious
+                    if not scan_result.get('followup'):
+                        db_manager.record_link_scan(message.guild.id, is_malicious)
                     
-                    if scan_result.get('is_malicious', False):
+                    if is_malicious:
                         await self._handle_malicious_link(message, url, scan_result)
                         
                         # تحديث الإحصائيات
                         self.bot.stats['threats_blocked'] += 1
+                    elif not scan_result.get('followup'):
+                        self._log_unconfirmed_link(message, url, scan_result)
                         
             except Exception as e:
                 logger.error(f"خطأ في فحص الرابط {url}: {e}")
     
+    async def _on_remote_verdict(self, message: discord.Message, url: str, handled: dict, scan_result: dict):
+        """الحكم النهائي بعد فحوص الشبكة: معالجة الرابط إذا لم يُعالج بالحكم السريع"""
+        is_malicious = scan_result.get('is_malicious', False)
+        db_manager.record_link_scan(message.guild.id, is_malicious)
+        
+        if is_malicious and not handled['malicious']:
+            handled['malicious'] = True
+            logger.warning(f"🚨 الحكم البعيد: رابط خبيث بعد السماح المؤقت به {url[:50]}")
+            await self._handle_malicious_link(message, url, scan_result)
+            self.bot.stats['threats_blocked'] += 1
+        elif not is_malicious:
+            self._log_unconfirmed_link(message, url, scan_result)
+    
+    def _log_unconfirmed_link(self, message: discord.Message, url: str, scan_result: dict):
+        """نتيجة مشبوهة دون دليل مؤكد (أنماط، إعادة توجيه، مهلة): تحذير في السجل فقط"""
+        if scan_result.get('is_safe', True):
+            return
+        logger.warning(
+            f"⚠️ رابط مشبوه غير مؤكد من {message.author.id} في {message.guild.id}: {url[:50]} "
+            f"({', '.join(scan_result.get('threats', [])) or scan_result.get('threat_level', 'unknown')})"
+        )
+    
     async def _monitor_behavior(self, message: discord.Message):
         """مراقبة السلوك العام"""
         if self.bot.behavior_watchdog:
@@ -324,11 +358,14 @@ class EventHandler:
     async def _handle_malicious_link(self, message: discord.Message, url: str, scan_result: dict):
         """معالجة الرابط الخبيث"""
         try:
-            # حذف الرسالة
-            await message.delete()
+            # حذف الرسالة (قد تكون حُذفت قبل وصول الحكم البعيد، ويبقى تسجيل المستخدم)
+            try:
+                await message.delete()
+            except discord.NotFound:
+                pass
             
             # تسجيل التهديد
-            await db_manager.add_threat(
+            await db_manager.queue_threat(
                 message.guild.id,
                 message.author.id,
                 "malicious_link",
@@ -337,7 +374,7 @@ class EventHandler:
             )
             
             # إضافة نقاط خطر
-            await db_manager.add_danger_points(
+            await db_manager.queue_danger_points(
                 message.guild.id,
                 message.author.id,
                 5
@@ -366,14 +403,14 @@ class EventHandler:
         """معالجة السلوك المشبوه"""
         # إضافة نقاط خطر
         danger_points = analysis.get('danger_level', 2)
-        await db_manager.add_danger_points(
+        await db_manager.queue_danger_points(
             message.guild.id,
             message.author.id,
             danger_points
         )
         
         # تسجيل التهديد
-        await db_manager.add_threat(
+        await db_manager.queue_threat(
             message.guild.id,
             message.author.id,
             "suspicious_behavior",
@@ -403,14 +440,14 @@ class EventHandler:
             await message.channel.delete_messages(messages_to_delete)
             
             # إضافة نقاط خطر
-            await db_manager.add_danger_points(
+            await db_manager.queue_danger_points(
                 message.guild.id,
                 message.author.id,
                 3
             )
             
             # تسجيل التهديد
-            await db_manager.add_threat(
+            await db_manager.queue_threat(
                 message.guild.id,
                 message.author.id,
                 "spam",
@@ -445,7 +482,8 @@ class EventHandler:
             await user.send(embed=embed)
             
             # إضافة نقطة خطر واحدة
-            await db_manager.add_danger_points(guild.id, user.id, 1)
+            await db_manager.queue_danger_points(guild.id, user.id, 1)
+            db_manager.increment_stat(guild.id, 'users_warned')
             
             log_security_event(
                 "HIGH_ACTIVITY",
@@ -540,9 +578,9 @@ class EventHandler:
     # معالجات إضافية
     async def _handle_suspicious_content(self, message: discord.Message, pattern: str):
         """معالجة المحتوى المشبوه"""
-        await db_manager.add_danger_points(message.guild.id, message.author.id, 2)
+        await db_manager.queue_danger_points(message.guild.id, message.author.id, 2)
         
-        await db_manager.add_threat(
+        await db_manager.queue_threat(
             message.guild.id,
             message.author.id,
             "suspicious_content",
@@ -564,7 +602,7 @@ class EventHandler:
             
             await message.channel.send(embed=embed, delete_after=10)
             
-            await db_manager.add_danger_points(message.guild.id, message.author.id, 4)
+            await db_manager.queue_danger_points(message.guild.id, message.author.id, 4)
             
         except Exception as e:
             logger.error(f"خطأ في معالجة الملف الخطير: {e}")
@@ -631,6 +669,8 @@ class EventHandler:
             f"Rapid joins detected: {join_count} in {Config.RAID_DETECTION_WINDOW}s"
         )
         
+        db_manager.increment_stat(guild.id, 'raids_prevented')
+        
         # إرسال تنبيه للإدارة
         embed = discord.Embed(
             title="🚨 تحذير من هجوم محتمل",
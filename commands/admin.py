@@ -6,6 +6,8 @@ from datetime import datetime
 from config import Config
 from core.logger import get_security_logger, log_security_event
 from core.database import db_manager
+from core.cache import cache_manager
+from commands.pagination import ThreatLogView
 
 logger = get_security_logger()
 
@@ -256,6 +258,108 @@ class AdminCommands(commands.Cog):
         
         await ctx.send(embed=embed)
     
+    @commands.command(name='db_stats')
+    async def database_stats(self, ctx, action: Optional[str] = None):
+        """عرض قياسات أداء قاعدة البيانات (on/off/reset للمالك)"""
+        metrics = db_manager.metrics
+        
+        if action:
+            # القياسات مشتركة بين جميع السيرفرات
+            if ctx.author.id != Config.OWNER_ID:
+                await ctx.send("❌ التحكم في القياسات متاح لمالك البوت فقط")
+                return
+            
+            action = action.lower()
+            if action == 'on':
+                metrics.enabled = True
+            elif action == 'off':
+                metrics.enabled = False
+            elif action == 'reset':
+                metrics.reset()
+            else:
+                await ctx.send("❌ الخيارات المتاحة: on, off, reset")
+                return
+        
+        snapshot = metrics.snapshot()
+        embed = discord.Embed(
+            title="🗄️ أداء قاعدة البيانات",
+            description=(
+                f"القياس: {'✅ مفعل' if snapshot['enabled'] else '❌ معطل'}\n"
+                f"منذ: {snapshot['since'][:16]}\n"
+                f"حد الاستعلام البطيء: {snapshot['slow_query_ms']}ms"
+            ),
+            color=Config.COLORS['info'],
+            timestamp=datetime.now()
+        )
+        
+        # الدوال الأعلى في الزمن الإجمالي
+        methods = sorted(snapshot['methods'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        if methods:
+            lines = [
+                f"`{name}` ×{stats['calls']} | p50 {stats['p50_ms']} / p95 {stats['p95_ms']} / "
+                f"p99 {stats['p99_ms']}ms | صفوف {stats['rows']} | قفل {stats['lock_wait_p95_ms']}ms"
+                for name, stats in methods[:8]
+            ]
+            embed.add_field(name="⏱️ الدوال", value="\n".join(lines)[:1024], inline=False)
+        
+        link_filter = db_manager.get_scanned_links_filter_stats()
+        if link_filter['enabled']:
+            embed.add_field(
+                name="🌸 مرشح الروابط المفحوصة",
+                value=(
+                    f"{link_filter['items']} رابط | {link_filter['stages']} طبقة | "
+                    f"{link_filter['bytes'] / 1024:.0f}KB | استعلامات موفرة {link_filter['skipped_lookups']}"
+                ),
+                inline=False
+            )
+        
+        slow = snapshot['slow_queries'][-5:]
+        if slow:
+            lines = [f"`{entry['name'][:60]}` {entry['elapsed_ms']}ms" for entry in reversed(slow)]
+            embed.add_field(name="🐢 آخر الاستعلامات البطيئة", value="\n".join(lines)[:1024], inline=False)
+        
+        await ctx.send(embed=embed)
+    
+    @commands.command(name='cache_stats')
+    async def cache_stats(self, ctx, action: Optional[str] = None):
+        """عرض قياسات الكاش لكل مساحة (reset للمالك)"""
+        if action:
+            if ctx.author.id != Config.OWNER_ID:
+                await ctx.send("❌ التحكم في القياسات متاح لمالك البوت فقط")
+                return
+            
+            if action.lower() != 'reset':
+                await ctx.send("❌ الخيارات المتاحة: reset")
+                return
+            cache_manager.reset_metrics()
+        
+        snapshot = cache_manager.snapshot()
+        memory = snapshot['memory']
+        embed = discord.Embed(
+            title="🧠 أداء الكاش",
+            description=(
+                f"منذ: {snapshot['since'][:16]}\n"
+                f"الذاكرة: {memory['bytes'] / 1024:.1f}KB من {memory['budget'] / 1024:.0f}KB "
+                f"({memory['entries']} عنصر، إخلاء مشترك {memory['budget_evictions']})"
+            ),
+            color=Config.COLORS['info'],
+            timestamp=datetime.now()
+        )
+        
+        for cache_type, stats in list(snapshot['namespaces'].items())[:10]:
+            embed.add_field(
+                name=f"`{cache_type}` (TTL {stats['ttl']}s)",
+                value=(
+                    f"إصابة {stats['hit_rate']:.0%} | قديم {stats['stale_hits']} | إخفاق {stats['misses']}\n"
+                    f"عناصر {stats['entries']} | إخلاء {stats['evictions']} | انتهاء {stats['expirations']}\n"
+                    f"عمر الإصابة p50/p95: {stats['hit_age_seconds']['p50']}/{stats['hit_age_seconds']['p95']}s\n"
+                    f"التحميل p95: {stats['loader_latency_ms']['p95']}ms | الحجم p95: {stats['entry_size_bytes']['p95']}B"
+                ),
+                inline=False
+            )
+        
+        await ctx.send(embed=embed)
+    
     @commands.command(name='reset_user')
     async def reset_user_danger(self, ctx, user: discord.Member):
         """إعادة تعيين نقاط الخطر لمستخدم"""
@@ -279,12 +383,12 @@ class AdminCommands(commands.Cog):
     @commands.command(name='view_threats')
     async def view_recent_threats(self, ctx, limit: int = 10):
         """عرض التهديدات الأخيرة"""
-        if limit > 50:
-            limit = 50
+        limit = max(1, min(limit, 10))
         
-        threats = await db_manager.get_recent_threats(ctx.guild.id, limit)
+        view = ThreatLogView(ctx.author.id, ctx.guild, "⚠️ التهديدات الأخيرة", page_size=limit)
+        embed = await view.load_page()
         
-        if not threats:
+        if embed is None:
             embed = discord.Embed(
                 title="✅ لا توجد تهديدات",
                 description="لم يتم اكتشاف أي تهديدات مؤخراً",
@@ -293,27 +397,7 @@ class AdminCommands(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        embed = discord.Embed(
-            title="⚠️ التهديدات الأخيرة",
-            description=f"آخر {len(threats)} تهديد تم اكتشافه",
-            color=Config.COLORS['warning']
-        )
-        
-        for threat in threats[:10]:  # عرض أول 10 فقط
-            user = ctx.guild.get_member(threat['user_id'])
-            user_name = user.display_name if user else f"مستخدم {threat['user_id']}"
-            
-            embed.add_field(
-                name=f"🚨 {threat['threat_type']}",
-                value=(
-                    f"**المستخدم:** {user_name}\n"
-                    f"**الخطورة:** {threat['severity']}\n"
-                    f"**التاريخ:** {threat['timestamp'][:16]}"
-                ),
-                inline=True
-            )
-        
-        await ctx.send(embed=embed)
+        view.message = await ctx.send(embed=embed, view=view)
     
     @commands.command(name='export_data')
     async def export_security_data(self, ctx):
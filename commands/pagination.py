@@ -0,0 +1,102 @@
+"""
+أدوات ترقيم الصفحات التفاعلية للأوامر
+تجلب كل صفحة من قاعدة البيانات عند عرضها فقط (ترقيم بالمفتاح)
+"""
+
+import discord
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from config import Config
+from core.database import db_manager
+from core.logger import get_security_logger
+
+logger = get_security_logger()
+
+class ThreatLogView(discord.ui.View):
+    """عرض سجل التهديدات صفحة بصفحة بأزرار السابق/التالي"""
+
+    def __init__(self, author_id: int, guild: discord.Guild, title: str,
+                 user_id: Optional[int] = None, page_size: int = 5, timeout: float = 180):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.guild = guild
+        self.title = title
+        self.user_id = user_id
+        self.page_size = page_size
+        self.message: Optional[discord.Message] = None
+
+        # مؤشر بداية كل صفحة تمت زيارتها للرجوع دون إعادة المسح
+        self._cursors: List[Optional[Tuple[str, int]]] = [None]
+        self._next_cursor: Optional[Tuple[str, int]] = None
+        self.page = 0
+
+    async def load_page(self) -> Optional[discord.Embed]:
+        """جلب الصفحة الحالية وبناء الرسالة، None إذا كان السجل فارغاً"""
+        threats, self._next_cursor = await db_manager.get_threats_page(
+            self.guild.id, self.user_id, self._cursors[self.page], self.page_size
+        )
+
+        if not threats and self.page == 0:
+            return None
+
+        embed = discord.Embed(
+            title=self.title if self.page == 0 else f"{self.title} - صفحة {self.page + 1}",
+            description="\n".join(self._format_threat(threat) for threat in threats),
+            color=Config.COLORS['warning'],
+            timestamp=datetime.now()
+        )
+        embed.set_footer(text=f"صفحة {self.page + 1}")
+
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self._next_cursor is None
+        return embed
+
+    def _format_threat(self, threat: dict) -> str:
+        member = self.guild.get_member(threat['user_id'])
+        user_name = member.display_name if member else f"User {threat['user_id']}"
+        content = threat.get('content') or ''
+
+        return (
+            f"**{threat['threat_type']}** - {user_name} ({threat.get('severity', 'medium')})\n"
+            f"📅 {str(threat['timestamp'])[:16]}\n"
+            f"📝 {content[:100]}{'...' if len(content) > 100 else ''}\n"
+        )
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ هذه القائمة خاصة بمن طلبها", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="السابق", emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.page > 0:
+            self.page -= 1
+            self._cursors.pop()
+        await self._refresh(interaction)
+
+    @discord.ui.button(label="التالي", emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self._next_cursor is not None:
+            self._cursors.append(self._next_cursor)
+            self.page += 1
+        await self._refresh(interaction)
+
+    async def _refresh(self, interaction: discord.Interaction):
+        try:
+            embed = await self.load_page()
+            await interaction.response.edit_message(embed=embed, view=self)
+        except Exception as e:
+            logger.error(f"خطأ في تحميل صفحة سجل التهديدات: {e}")
+            await interaction.response.send_message("❌ تعذر تحميل الصفحة", ephemeral=True)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
@@ -1,13 +1,15 @@
 import discord
 from discord.ext import commands
 import asyncio
+import shutil
 from datetime import datetime, timedelta
 from typing import Optional
-import json
 
 from config import Config
 from core.logger import get_security_logger, log_security_event
 from core.database import db_manager
+from core.export import EXPORT_FORMATS, StreamingExporter
+from commands.pagination import ThreatLogView
 
 logger = get_security_logger()
 
@@ -36,12 +38,9 @@ class ReportsCommands(commands.Cog):
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
             
-            # إحصائيات التهديدات
-            threats = await db_manager.get_threats_in_period(ctx.guild.id, start_date, end_date)
-            threat_types = {}
-            for threat in threats:
-                threat_type = threat['threat_type']
-                threat_types[threat_type] = threat_types.get(threat_type, 0) + 1
+            # إحصائيات التهديدات من جداول التجميع
+            threat_summary = await db_manager.get_threat_summary(ctx.guild.id, start_date, end_date)
+            threat_types = threat_summary['by_type']
             
             # المستخدمين عالي الخطورة
             high_risk_users = await db_manager.get_high_risk_users(ctx.guild.id)
@@ -60,7 +59,7 @@ class ReportsCommands(commands.Cog):
             # إحصائيات عامة
             report_embed.add_field(
                 name="📈 الإحصائيات العامة",
-                value=f"🚨 إجمالي التهديدات: **{len(threats)}**\n"
+                value=f"🚨 إجمالي التهديدات: **{threat_summary['total']}**\n"
                       f"👥 مستخدمين عالي الخطورة: **{len(high_risk_users)}**\n"
                       f"🔗 روابط مفحوصة: **{scanned_links}**",
                 inline=False
@@ -95,7 +94,7 @@ class ReportsCommands(commands.Cog):
             
             # توصيات أمنية
             recommendations = []
-            if len(threats) > 50:
+            if threat_summary['total'] > 50:
                 recommendations.append("• نشاط تهديدات عالي - يُنصح بزيادة مستوى الحماية")
             if len(high_risk_users) > 10:
                 recommendations.append("• عدد كبير من المستخدمين عالي الخطورة")
@@ -128,20 +127,22 @@ class ReportsCommands(commands.Cog):
     
     @commands.command(name='threat_log')
     @commands.has_permissions(manage_messages=True)
-    async def threat_log(self, ctx, user: Optional[discord.Member] = None, limit: int = 10):
+    async def threat_log(self, ctx, user: Optional[discord.Member] = None, limit: int = 5):
         """عرض سجل التهديدات"""
-        if limit > 50:
-            limit = 50
+        # limit هو عدد التهديدات في الصفحة الواحدة
+        limit = max(1, min(limit, 10))
         
         try:
             if user:
-                threats = await db_manager.get_user_threats(ctx.guild.id, user.id, limit)
                 title = f"📋 سجل التهديدات - {user.display_name}"
             else:
-                threats = await db_manager.get_recent_threats(ctx.guild.id, limit)
                 title = "📋 سجل التهديدات الأخيرة"
             
-            if not threats:
+            view = ThreatLogView(ctx.author.id, ctx.guild, title,
+                                 user_id=user.id if user else None, page_size=limit)
+            embed = await view.load_page()
+            
+            if embed is None:
                 embed = discord.Embed(
                     title="📋 سجل التهديدات",
                     description="لا توجد تهديدات مسجلة",
@@ -150,41 +151,7 @@ class ReportsCommands(commands.Cog):
                 await ctx.send(embed=embed)
                 return
             
-            embed = discord.Embed(
-                title=title,
-                color=Config.COLORS['warning'],
-                timestamp=datetime.now()
-            )
-            
-            threat_list = []
-            for threat in threats:
-                user_obj = ctx.guild.get_member(threat['user_id'])
-                user_name = user_obj.display_name if user_obj else f"User {threat['user_id']}"
-                
-                threat_list.append(
-                    f"**{threat['threat_type']}** - {user_name}\n"
-                    f"📅 {threat['timestamp'][:16]}\n"
-                    f"📝 {threat['details'][:100]}{'...' if len(threat['details']) > 100 else ''}\n"
-                )
-            
-            # تقسيم القائمة إلى صفحات
-            page_size = 5
-            pages = [threat_list[i:i + page_size] for i in range(0, len(threat_list), page_size)]
-            
-            for i, page in enumerate(pages):
-                if i > 0:
-                    embed = discord.Embed(
-                        title=f"{title} - صفحة {i + 1}",
-                        color=Config.COLORS['warning']
-                    )
-                
-                embed.description = "\n".join(page)
-                embed.set_footer(text=f"صفحة {i + 1}/{len(pages)}")
-                
-                await ctx.send(embed=embed)
-                
-                if i < len(pages) - 1:
-                    await asyncio.sleep(1)  # تأخير بسيط بين الصفحات
+            view.message = await ctx.send(embed=embed, view=view)
             
         except Exception as e:
             logger.error(f"خطأ في عرض سجل التهديدات: {e}")
@@ -197,41 +164,37 @@ class ReportsCommands(commands.Cog):
     
     @commands.command(name='export_data')
     @commands.has_permissions(administrator=True)
-    async def export_security_data(self, ctx, days: int = 30):
-        """تصدير البيانات الأمنية"""
+    async def export_security_data(self, ctx, days: int = 30, export_format: str = 'ndjson'):
+        """تصدير البيانات الأمنية (ndjson أو csv مضغوط)"""
         if days > 90:
             days = 90  # حد أقصى 3 أشهر
         
+        export_format = export_format.lower()
+        if export_format not in EXPORT_FORMATS:
+            await ctx.send(f"❌ الصيغ المدعومة: {', '.join(EXPORT_FORMATS)}")
+            return
+        
+        exporter = None
         try:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
             
-            # جمع البيانات
-            threats = await db_manager.get_threats_in_period(ctx.guild.id, start_date, end_date)
-            scanned_links = await db_manager.get_scanned_links_in_period(ctx.guild.id, start_date, end_date)
-            user_scores = await db_manager.get_all_user_scores(ctx.guild.id)
-            
-            # إنشاء ملف JSON
-            export_data = {
-                "guild_id": ctx.guild.id,
+            # كتابة متدفقة إلى مجلد مؤقت خارج حلقة الأحداث
+            exporter = StreamingExporter(ctx.guild.id, start_date, end_date, export_format)
+            paths = await exporter.export({
                 "guild_name": ctx.guild.name,
-                "export_date": datetime.now().isoformat(),
-                "period_days": days,
-                "threats": threats,
-                "scanned_links": scanned_links,
-                "user_danger_scores": user_scores,
-                "statistics": {
-                    "total_threats": len(threats),
-                    "total_scanned_links": len(scanned_links),
-                    "high_risk_users": len([u for u in user_scores if u['danger_points'] >= Config.MAX_DANGER_POINTS * 0.8])
-                }
-            }
+                "period_days": days
+            })
             
-            # إنشاء ملف مؤقت
-            filename = f"security_data_{ctx.guild.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=2)
+            total_size = sum(path.stat().st_size for path in paths)
+            if total_size > ctx.guild.filesize_limit:
+                embed = discord.Embed(
+                    title="❌ حجم التصدير كبير",
+                    description=f"حجم الملف ({total_size // 1024} KB) يتجاوز حد الرفع في السيرفر، جرب فترة أقصر",
+                    color=Config.COLORS['error']
+                )
+                await ctx.send(embed=embed)
+                return
             
             # إرسال الملف
             embed = discord.Embed(
@@ -239,12 +202,17 @@ class ReportsCommands(commands.Cog):
                 description=f"تم تصدير البيانات الأمنية لآخر {days} يوم",
                 color=Config.COLORS['success']
             )
+            embed.add_field(
+                name="📊 الإحصائيات",
+                value=(
+                    f"🚨 تهديدات: {exporter.statistics['total_threats']}\n"
+                    f"🔗 روابط مفحوصة: {exporter.statistics['total_scanned_links']}\n"
+                    f"👥 مستخدمين خطرين: {exporter.statistics['high_risk_users']}"
+                ),
+                inline=False
+            )
             
-            await ctx.send(embed=embed, file=discord.File(filename))
-            
-            # حذف الملف المؤقت
-            import os
-            os.remove(filename)
+            await ctx.send(embed=embed, files=[discord.File(path) for path in paths])
             
         except Exception as e:
             logger.error(f"خطأ في تصدير البيانات: {e}")
@@ -254,6 +222,10 @@ class ReportsCommands(commands.Cog):
                 color=Config.COLORS['error']
             )
             await ctx.send(embed=error_embed)
+        finally:
+            # حذف الملفات المؤقتة
+            if exporter:
+                await asyncio.to_thread(shutil.rmtree, exporter.output_dir, True)
     
     @commands.command(name='stats')
     async def security_stats(self, ctx):
@@ -262,7 +234,7 @@ class ReportsCommands(commands.Cog):
             # إحصائيات اليوم
             today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             
-            today_threats = await db_manager.get_threats_in_period(ctx.guild.id, today, datetime.now())
+            today_threats = await db_manager.get_threat_summary(ctx.guild.id, today, datetime.now())
             total_threats = await db_manager.get_total_threats_count(ctx.guild.id)
             high_risk_users = await db_manager.get_high_risk_users(ctx.guild.id)
             
@@ -274,7 +246,7 @@ class ReportsCommands(commands.Cog):
             
             embed.add_field(
                 name="📅 اليوم",
-                value=f"🚨 تهديدات: {len(today_threats)}",
+                value=f"🚨 تهديدات: {today_threats['total']}",
                 inline=True
             )
             
@@ -30,7 +30,8 @@ class SecurityCommands(commands.Cog):
         try:
             # فحص الرابط باستخدام نظام حماية الروابط
             if self.bot.link_guardian:
-                scan_result = await self.bot.link_guardian.scan_url(url)
+                scan_result = await self.bot.link_guardian.scan_url(url, ctx.guild.id)
+                db_manager.record_link_scan(ctx.guild.id, scan_result.get('is_malicious', False))
                 
                 # إنشاء embed النتيجة
                 if scan_result.get('is_safe', True):
@@ -152,7 +153,9 @@ class SecurityCommands(commands.Cog):
         if recent_threats:
             threat_list = []
             for threat in recent_threats:
-                threat_list.append(f"• {threat['threat_type']} ({threat['timestamp'][:10]})")
+                occurrences = threat.get('occurrences') or 1
+                repeats = f" ×{occurrences}" if occurrences > 1 else ""
+                threat_list.append(f"• {threat['threat_type']}{repeats} ({threat['timestamp'][:10]})")
             
             embed.add_field(
                 name="🚨 التهديدات الأخيرة",
@@ -177,6 +180,7 @@ class SecurityCommands(commands.Cog):
             reason,
             "medium"
         )
+        db_manager.increment_stat(ctx.guild.id, 'users_warned')
         
         # إرسال رسالة للمستخدم
         try:
@@ -235,9 +239,10 @@ class SecurityCommands(commands.Cog):
             high_risk_users = await db_manager.get_high_risk_users(ctx.guild.id)
             scan_results['high_risk_users'] = len(high_risk_users)
             
-            # فحص التهديدات الأخيرة
-            recent_threats = await db_manager.get_recent_threats(ctx.guild.id, 24)  # آخر 24 ساعة
-            scan_results['recent_threats'] = len(recent_threats)
+            # فحص التهديدات الأخيرة (آخر 24 ساعة، كل تكرار داخل الحادثة المدمجة يُحسب)
+            now = datetime.utcnow()
+            threat_summary = await db_manager.get_threat_summary(ctx.guild.id, now - timedelta(hours=24), now)
+            scan_results['recent_threats'] = threat_summary['total']
             
             # فحص الأعضاء الجدد المشبوهين
             suspicious_count = 0
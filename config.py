@@ -31,11 +31,45 @@ class Config:
     # Database
     DATABASE_URL: str = os.getenv('DATABASE_URL', 'sqlite:///security_bot.db')
     DATABASE_PATH: str = os.getenv('DATABASE_PATH', 'security_bot.db')  # إضافة مسار قاعدة البيانات
+    DATABASE_READ_POOL_SIZE: int = int(os.getenv('DATABASE_READ_POOL_SIZE', 4))  # عدد اتصالات القراءة
+    DATABASE_CACHE_SIZE_KB: int = int(os.getenv('DATABASE_CACHE_SIZE_KB', 16384))  # حجم كاش الصفحات لكل اتصال
+    DATABASE_MMAP_SIZE: int = int(os.getenv('DATABASE_MMAP_SIZE', 268435456))  # 256MB
+    DATABASE_BUSY_TIMEOUT_MS: int = int(os.getenv('DATABASE_BUSY_TIMEOUT_MS', 5000))
+    DB_WRITE_BATCH_SIZE: int = int(os.getenv('DB_WRITE_BATCH_SIZE', 200))  # تفريغ الطابور عند هذا العدد
+    DB_WRITE_FLUSH_INTERVAL: float = float(os.getenv('DB_WRITE_FLUSH_INTERVAL', 2.0))  # أو كل هذه المدة بالثواني
+    THREAT_INCIDENT_WINDOW: float = float(os.getenv('THREAT_INCIDENT_WINDOW', 60.0))  # دمج التهديدات المتكررة خلال هذه المدة (0 للتعطيل)
+    STATS_FLUSH_INTERVAL: float = float(os.getenv('STATS_FLUSH_INTERVAL', 30.0))  # كتابة العدادات اليومية
+    EXPORT_BATCH_SIZE: int = int(os.getenv('EXPORT_BATCH_SIZE', 500))  # عدد الصفوف في كل دفعة تصدير
+    DB_METRICS_ENABLED: bool = os.getenv('DB_METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')  # قياس زمن الاستعلامات
+    DB_SLOW_QUERY_MS: float = float(os.getenv('DB_SLOW_QUERY_MS', 100.0))  # حد سجل الاستعلامات البطيئة
+    
+    # Cache
+    CACHE_MEMORY_BUDGET_BYTES: int = int(os.getenv('CACHE_MEMORY_BUDGET_BYTES', 24 * 1024 * 1024))  # حد مشترك لجميع مساحات الكاش
+    LINK_FILTER_CAPACITY: int = int(os.getenv('LINK_FILTER_CAPACITY', 100000))  # سعة الطبقة الأولى لمرشح الروابط المفحوصة
+    LINK_FILTER_ERROR_RATE: float = float(os.getenv('LINK_FILTER_ERROR_RATE', 0.001))  # نسبة الإيجاب الكاذب
+    LINK_TTL_SAFE: int = int(os.getenv('LINK_TTL_SAFE', 3600))  # صلاحية حكم "آمن" (ساعة)
+    LINK_TTL_MALICIOUS: int = int(os.getenv('LINK_TTL_MALICIOUS', 7 * 86400))  # صلاحية حكم "خبيث" (أسبوع)
+    LINK_TTL_UNKNOWN: int = int(os.getenv('LINK_TTL_UNKNOWN', 300))  # صلاحية نتيجة غير حاسمة (5 دقائق)
+    LINK_RESCAN_WINDOW: float = float(os.getenv('LINK_RESCAN_WINDOW', 0.2))  # إعادة الفحص في آخر 20% من الصلاحية
+    LINK_RESCAN_MIN_HITS: int = int(os.getenv('LINK_RESCAN_MIN_HITS', 2))  # عدد الطلبات داخل النافذة قبل إعادة الفحص
+    LINK_RESCAN_QUEUE_SIZE: int = int(os.getenv('LINK_RESCAN_QUEUE_SIZE', 200))
+    LINK_WARMUP_LIMIT: int = int(os.getenv('LINK_WARMUP_LIMIT', 5000))  # عدد النتائج المحملة للكاش عند البدء
+    LINK_FOLLOWUP_QUEUE_SIZE: int = int(os.getenv('LINK_FOLLOWUP_QUEUE_SIZE', 100))  # روابط تنتظر الحكم البعيد
+    LINK_FOLLOWUP_WORKERS: int = int(os.getenv('LINK_FOLLOWUP_WORKERS', 2))
+    LINK_FOLLOWUP_MAX_WAITERS: int = int(os.getenv('LINK_FOLLOWUP_MAX_WAITERS', 20))  # رسائل تنتظر نتيجة الرابط نفسه
+    LINK_FOLLOWUP_FALLBACK_TIMEOUT: float = float(os.getenv('LINK_FOLLOWUP_FALLBACK_TIMEOUT', 3.0))  # فحص مباشر عند امتلاء الطابور
     
     # Security Settings
     DEFAULT_PROTECTION_LEVEL: int = int(os.getenv('DEFAULT_PROTECTION_LEVEL', 2))
     MAX_DANGER_POINTS: int = int(os.getenv('MAX_DANGER_POINTS', 10))
-    LINK_SCAN_TIMEOUT: int = int(os.getenv('LINK_SCAN_TIMEOUT', 30))
+    LINK_SCAN_TIMEOUT: float = float(os.getenv('LINK_SCAN_TIMEOUT', 8.0))  # مهلة واحدة لجميع فحوص الشبكة للرابط
+    
+    # HTTP Client (موصل مشترك لجميع التكاملات)
+    HTTP_POOL_LIMIT: int = int(os.getenv('HTTP_POOL_LIMIT', 100))  # أقصى عدد اتصالات مفتوحة
+    HTTP_LIMIT_PER_HOST: int = int(os.getenv('HTTP_LIMIT_PER_HOST', 10))  # أقصى اتصالات لكل مضيف
+    HTTP_DNS_TTL: int = int(os.getenv('HTTP_DNS_TTL', 300))  # مدة كاش DNS بالثواني
+    HTTP_KEEPALIVE: float = float(os.getenv('HTTP_KEEPALIVE', 30.0))  # إبقاء الاتصال الخامل مفتوحاً
+    HTTP_DEFAULT_TIMEOUT: float = float(os.getenv('HTTP_DEFAULT_TIMEOUT', 30.0))  # مهلة الملفات غير المعرّفة
     
     # Rate Limiting
     MAX_MESSAGES_PER_MINUTE: int = int(os.getenv('MAX_MESSAGES_PER_MINUTE', 10))
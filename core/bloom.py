@@ -0,0 +1,136 @@
+"""
+Bloom Filter - مرشح بلوم قابل للتوسع لاستبعاد المفاتيح غير الموجودة دون قاعدة البيانات
+"غير موجود" مؤكد دائماً، و"موجود" قد يكون إيجاباً كاذباً بنسبة error_rate تقريباً
+يتوسع بإضافة طبقات أكبر بنسبة خطأ أصغر (Almeida et al.) فلا يلزم معرفة الحجم مسبقاً
+"""
+
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+MAGIC = b'CSBF1\n'
+
+def _hashes(key: str) -> Tuple[int, int]:
+    """قيمتا هاش 64-بت للتجزئة المزدوجة (h1 + i*h2)"""
+    digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+class BloomFilter:
+    """طبقة واحدة بسعة ونسبة خطأ ثابتتين"""
+
+    def __init__(self, capacity: int, error_rate: float, bits: Optional[bytearray] = None, count: int = 0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, h1: int, h2: int):
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, h1: int, h2: int):
+        for position in self._positions(h1, h2):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def contains(self, h1: int, h2: int) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(h1, h2))
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+class ScalableBloomFilter:
+    """سلسلة طبقات تُضاف عند امتلاء الأخيرة"""
+
+    def __init__(self, initial_capacity: int = 10000, error_rate: float = 0.001,
+                 growth: int = 2, tightening: float = 0.5):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        # مجموع أخطاء الطبقات متسلسلة هندسية تبقى تحت error_rate
+        self.stages: List[BloomFilter] = [BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def add(self, key: str) -> bool:
+        """إضافة مفتاح، و False إذا كان موجوداً (أو إيجاباً كاذباً) مسبقاً"""
+        h1, h2 = _hashes(key)
+        if any(stage.contains(h1, h2) for stage in self.stages):
+            return False
+
+        stage = self.stages[-1]
+        if stage.full:
+            stage = BloomFilter(stage.capacity * self.growth, stage.error_rate * self.tightening)
+            self.stages.append(stage)
+        stage.add(h1, h2)
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        h1, h2 = _hashes(key)
+        # الأحدث أولاً: المفاتيح الجديدة أكثر طلباً
+        return any(stage.contains(h1, h2) for stage in reversed(self.stages))
+
+    def __len__(self) -> int:
+        return sum(stage.count for stage in self.stages)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'items': len(self),
+            'stages': len(self.stages),
+            'bytes': sum(len(stage.bits) for stage in self.stages),
+            'error_rate': self.error_rate
+        }
+
+    def save(self, path: Path, metadata: Optional[Dict[str, Any]] = None):
+        """حفظ المرشح في ملف (كتابة ذرية عبر ملف مؤقت)"""
+        header = {
+            'initial_capacity': self.initial_capacity,
+            'error_rate': self.error_rate,
+            'growth': self.growth,
+            'tightening': self.tightening,
+            'stages': [
+                {'capacity': stage.capacity, 'error_rate': stage.error_rate, 'count': stage.count}
+                for stage in self.stages
+            ],
+            'metadata': metadata or {}
+        }
+
+        path = Path(path)
+        temp_path = path.with_name(path.name + '.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(json.dumps(header).encode() + b'\n')
+            for stage in self.stages:
+                f.write(stage.bits)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional[Tuple['ScalableBloomFilter', Dict[str, Any]]]:
+        """تحميل المرشح وبياناته الوصفية، أو None إذا لم يوجد الملف أو كان تالفاً"""
+        try:
+            with open(path, 'rb') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return None
+                header = json.loads(f.readline())
+
+                bloom = cls(header['initial_capacity'], header['error_rate'],
+                            header['growth'], header['tightening'])
+                bloom.stages = []
+                for info in header['stages']:
+                    stage = BloomFilter(info['capacity'], info['error_rate'], count=info['count'])
+                    bits = f.read(len(stage.bits))
+                    if len(bits) != len(stage.bits):
+                        return None
+                    stage.bits = bytearray(bits)
+                    bloom.stages.append(stage)
+
+                if not bloom.stages or f.read(1):
+                    return None
+                return bloom, header.get('metadata', {})
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
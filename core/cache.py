@@ -1,90 +1,600 @@
-from typing import Any, Optional, Dict
-from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional, Dict, Tuple
+from collections import OrderedDict
 import asyncio
 import json
+import sys
+import time
+from datetime import datetime
 from pathlib import Path
 
+import aiosqlite
+
+from config import Config
+from core.logger import get_security_logger
+from core.metrics import Histogram, exponential_bounds
+from core.expiry import ExpiryGroup, ExpiryScheduler, expiry_scheduler
+
+logger = get_security_logger()
+
+# 16 بايت حتى ~8MB لحجم العناصر، وثانية حتى ~80 ساعة لعمر العنصر عند الإصابة
+ENTRY_SIZE_BOUNDS = exponential_bounds(16, 2, 20)
+HIT_AGE_BOUNDS_S = exponential_bounds(1, 1.5, 32)
+
+DEFAULT_NAMESPACE_CONFIG = {'ttl': 3600, 'max_entries': 1000, 'max_bytes': 1024 * 1024, 'persist': True}
+
+# مساحات الكاش المعروفة: النوع -> الإعدادات
+# persist=False يبقي المساحة في الذاكرة فقط (بيانات سريعة التغير أو رخيصة الحساب)
+CACHE_NAMESPACES = {
+    # الطبقة الدائمة لنتائج الروابط هي scanned_links خلف مرشح Bloom، فلا قرص هنا
+    'url_scan': {'ttl': 3600, 'stale_ttl': 600, 'max_entries': 10000, 'max_bytes': 8 * 1024 * 1024, 'persist': False},  # 1 hour
+    'user_info': {'ttl': 1800, 'max_entries': 5000, 'max_bytes': 4 * 1024 * 1024},  # 30 minutes
+    'guild_settings': {'ttl': 300, 'max_entries': 1000, 'max_bytes': 1024 * 1024},  # 5 minutes
+    'url_reputation': {'ttl': 3600, 'max_entries': 5000, 'max_bytes': 4 * 1024 * 1024},  # 1 hour
+    'domain_info': {'ttl': 86400, 'max_entries': 5000, 'max_bytes': 4 * 1024 * 1024},  # 24 hours
+    'ip_geolocation': {'ttl': 3600, 'max_entries': 5000, 'max_bytes': 1024 * 1024, 'persist': False}  # 1 hour
+}
+
+def estimate_size(value: Any) -> int:
+    """حجم تقريبي للقيمة بالبايت (طول تمثيل JSON)"""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+class LRUNamespace:
+    """مساحة كاش في الذاكرة محدودة بعدد العناصر والحجم، مع إخلاء LRU وانتهاء صلاحية كسول"""
+    
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int, stale_ttl: float = 0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl  # مدة الاحتفاظ بالقيمة بعد انتهائها لتقديمها قديمة أثناء التحديث
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, expires_at, size, stored_at)
+        self.bytes = 0
+        self.expiry: Optional[ExpiryGroup] = None  # يُسجل كل عنصر موعد انتهائه عند الإضافة
+        
+        # عدادات لضبط أحجام المساحات
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        
+        # توزيعات لضبط TTL والحجم: عمر العنصر عند الإصابة يبين أي TTL يكفي لمعظم الإصابات
+        self.disk_hits = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.loader_latency = Histogram()
+        self.entry_size = Histogram(ENTRY_SIZE_BOUNDS)
+        self.hit_age = Histogram(HIT_AGE_BOUNDS_S)
+    
+    def lookup(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """(القيمة، هل هي صالحة) أو None إذا لم توجد أو تجاوزت نافذة القِدم"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        value, expires_at, _, stored_at = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                # انتهاء الصلاحية عند الوصول
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.stale_hits += 1
+            self.hit_age.record(now - stored_at)
+            return value, False
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.hit_age.record(now - stored_at)
+        return value, True
+    
+    def peek(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """مثل lookup دون تحديث الترتيب أو العدادات"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        value, expires_at = entry[0], entry[1]
+        now = time.monotonic()
+        if expires_at + self.stale_ttl <= now:
+            return None
+        return value, expires_at > now
+    
+    def remaining(self, key: str) -> Optional[float]:
+        entry = self._entries.get(key)
+        return entry[1] - time.monotonic() if entry is not None else None
+    
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            # القيمة القديمة لا تُعاد من get العادية
+            self.misses += 1
+            if entry[1] + self.stale_ttl <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+            return None
+        
+        result = self.lookup(key)
+        return result[0] if result else None
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # أكبر من المساحة كاملة - لا يُخزن في الذاكرة
+            self._remove(key)
+            return
+        
+        self._remove(key)
+        now = time.monotonic()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at, size, now)
+        self.bytes += size
+        self.entry_size.record(size)
+        if self.expiry is not None:
+            self.expiry.schedule_at(key, expires_at + self.stale_ttl)
+        
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self.evict_oldest()
+    
+    def evict_oldest(self) -> int:
+        """إخلاء أقدم عنصر استخداماً، ويعيد عدد البايتات المحررة"""
+        if not self._entries:
+            return 0
+        
+        oldest = next(iter(self._entries))
+        size = self._entries[oldest][2]
+        self._remove(oldest)
+        self.evictions += 1
+        return size
+    
+    def delete(self, key: str) -> bool:
+        return self._remove(key)
+    
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.bytes -= entry[2]
+        if self.expiry is not None:
+            self.expiry.cancel(key)
+        return True
+    
+    def expire(self, key: str) -> Optional[float]:
+        """معالج المجدول: حذف العنصر عند انتهاء نافذته، أو الثواني المتبقية لإعادة جدولته"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        remaining = entry[1] + self.stale_ttl - time.monotonic()
+        if remaining > 0:
+            return remaining
+        
+        self._remove(key)
+        self.expirations += 1
+        return None
+    
+    def purge_expired(self) -> int:
+        """حذف العناصر المنتهية (المستحقة فقط عبر المجدول، أو مسح كامل بدونه)"""
+        if self.expiry is not None:
+            before = self.expirations
+            self.expiry.run_due()
+            return self.expirations - before
+        
+        now = time.monotonic()
+        expired = [
+            key for key, entry in self._entries.items() if entry[1] + self.stale_ttl <= now
+        ]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        return len(expired)
+    
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+        if self.expiry is not None:
+            self.expiry.clear()
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def record_load(self, elapsed_ms: float, failed: bool = False):
+        self.loads += 1
+        self.loader_latency.record(elapsed_ms)
+        if failed:
+            self.load_errors += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """العدادات مع التوزيعات وإعدادات المساحة الحالية"""
+        return {
+            **self.get_stats(),
+            'ttl': self.ttl,
+            'stale_ttl': self.stale_ttl,
+            'disk_hits': self.disk_hits,
+            'loads': self.loads,
+            'load_errors': self.load_errors,
+            'loader_latency_ms': self.loader_latency.snapshot(),
+            'entry_size_bytes': self.entry_size.snapshot(),
+            'hit_age_seconds': self.hit_age.snapshot()
+        }
+    
+    def reset_metrics(self):
+        self.hits = self.stale_hits = self.misses = 0
+        self.evictions = self.expirations = 0
+        self.disk_hits = self.loads = self.load_errors = 0
+        self.loader_latency.reset()
+        self.entry_size.reset()
+        self.hit_age.reset()
+
+class SQLiteDiskTier:
+    """مخزن مفتاح-قيمة في ملف SQLite واحد مفهرس، تعمل جميع عملياته خارج حلقة الأحداث"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.db: Optional[aiosqlite.Connection] = None
+        self._lock = asyncio.Lock()
+    
+    async def _connection(self) -> aiosqlite.Connection:
+        if self.db is None:
+            async with self._lock:
+                if self.db is None:
+                    db = await aiosqlite.connect(self.path)
+                    await db.execute('PRAGMA journal_mode = WAL')
+                    await db.execute('PRAGMA synchronous = NORMAL')
+                    await db.execute('''
+                        CREATE TABLE IF NOT EXISTS cache_entries (
+                            namespace TEXT NOT NULL,
+                            key TEXT NOT NULL,
+                            value TEXT NOT NULL,
+                            expires_at REAL NOT NULL,
+                            PRIMARY KEY (namespace, key)
+                        ) WITHOUT ROWID
+                    ''')
+                    await db.execute('CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_entries(expires_at)')
+                    await db.commit()
+                    self.db = db
+        return self.db
+    
+    async def get(self, namespace: str, key: str, grace: float = 0) -> Optional[Tuple[Any, float]]:
+        """القيمة ووقت انتهائها، أو None إذا لم توجد أو انتهت منذ أكثر من grace ثانية"""
+        db = await self._connection()
+        async with db.execute(
+            'SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at > ?',
+            (namespace, key, time.time() - grace)
+        ) as cursor:
+            row = await cursor.fetchone()
+        
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+    
+    async def set(self, namespace: str, key: str, value: Any, expires_at: float):
+        db = await self._connection()
+        await db.execute(
+            'INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+            (namespace, key, json.dumps(value, default=str), expires_at)
+        )
+        await db.commit()
+    
+    async def delete(self, namespace: str, key: str):
+        db = await self._connection()
+        await db.execute('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (namespace, key))
+        await db.commit()
+    
+    async def clear(self, namespace: Optional[str] = None):
+        db = await self._connection()
+        if namespace is None:
+            await db.execute('DELETE FROM cache_entries')
+        else:
+            await db.execute('DELETE FROM cache_entries WHERE namespace = ?', (namespace,))
+        await db.commit()
+    
+    async def purge_expired(self, grace: float = 0) -> int:
+        """حذف جميع العناصر المنتهية بأمر واحد"""
+        db = await self._connection()
+        cursor = await db.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time() - grace,))
+        await db.commit()
+        return cursor.rowcount
+    
+    async def close(self):
+        if self.db is not None:
+            await self.db.close()
+            self.db = None
+
 class CacheManager:
-    def __init__(self, cache_dir: str = "cache"):
+    def __init__(self, cache_dir: str = "cache", cache_config: Optional[Dict[str, Dict[str, Any]]] = None,
+                 memory_budget: Optional[int] = None, expiry: Optional[ExpiryScheduler] = None):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
-        self.memory_cache: Dict[str, Dict[str, Any]] = {}
-        self.cache_config = {
-            'url_scan': {'ttl': 3600},  # 1 hour
-            'user_info': {'ttl': 1800},  # 30 minutes
-            'guild_settings': {'ttl': 300}  # 5 minutes
-        }
+        self.memory_cache: Dict[str, LRUNamespace] = {}
+        self.cache_config = cache_config or CACHE_NAMESPACES
+        
+        # حد مشترك لذاكرة جميع المساحات فوق حدود كل مساحة
+        self.memory_budget = Config.CACHE_MEMORY_BUDGET_BYTES if memory_budget is None else memory_budget
+        self.budget_evictions = 0
+        self.metrics_since = datetime.now()
+        
+        # انتهاء صلاحية عناصر الذاكرة عبر المجدول المشترك بدل المسح الكامل
+        self.expiry = expiry or expiry_scheduler
+        
+        # طبقة القرص: ملف SQLite واحد بدل ملف JSON لكل مفتاح
+        self.disk = SQLiteDiskTier(self.cache_dir / "cache.db")
+        
+        # عمليات التحميل الجارية لكل (نوع، مفتاح) لدمج الطلبات المتزامنة
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+    
+    def _namespace(self, cache_type: str) -> LRUNamespace:
+        """مساحة الذاكرة لنوع الكاش (تُنشأ عند أول استخدام)"""
+        namespace = self.memory_cache.get(cache_type)
+        if namespace is None:
+            config = self._config(cache_type)
+            namespace = LRUNamespace(config['ttl'], config['max_entries'], config['max_bytes'],
+                                     config.get('stale_ttl', 0))
+            namespace.expiry = self.expiry.group(f'cache:{cache_type}', namespace.expire)
+            self.memory_cache[cache_type] = namespace
+        return namespace
+    
+    def _config(self, cache_type: str) -> Dict[str, Any]:
+        return {**DEFAULT_NAMESPACE_CONFIG, **self.cache_config.get(cache_type, {})}
+    
+    def _persistent(self, cache_type: str) -> bool:
+        return self._config(cache_type)['persist']
+    
+    def _store(self, namespace: LRUNamespace, key: str, value: Any, ttl: Optional[float] = None):
+        """تخزين في الذاكرة ثم إخلاء ما يتجاوز الحد المشترك"""
+        namespace.set(key, value, ttl)
+        self._enforce_budget()
+    
+    def _enforce_budget(self):
+        """الإخلاء من المساحة الأكثر امتلاءً نسبةً لحدها حتى يعود المجموع تحت الحد المشترك"""
+        total = self.memory_bytes()
+        while total > self.memory_budget:
+            fullest = max(
+                (namespace for namespace in self.memory_cache.values() if len(namespace)),
+                key=lambda namespace: namespace.bytes / namespace.max_bytes,
+                default=None
+            )
+            if fullest is None:
+                break
+            total -= fullest.evict_oldest()
+            self.budget_evictions += 1
+    
+    def memory_bytes(self) -> int:
+        return sum(namespace.bytes for namespace in self.memory_cache.values())
     
     async def get(self, cache_type: str, key: str) -> Optional[Any]:
         """استرجاع قيمة من الكاش"""
         # فحص الكاش في الذاكرة
-        if cache_type in self.memory_cache and key in self.memory_cache[cache_type]:
-            data = self.memory_cache[cache_type][key]
-            if not self._is_expired(data['timestamp'], cache_type):
-                return data['value']
-        
-        # فحص الكاش في الملفات
-        cache_file = self.cache_dir / f"{cache_type}_{key}.json"
-        if cache_file.exists():
-            try:
-                data = json.loads(cache_file.read_text())
-                if not self._is_expired(data['timestamp'], cache_type):
-                    # تحديث الكاش في الذاكرة
-                    self._update_memory_cache(cache_type, key, data)
-                    return data['value']
-            except Exception:
-                pass
+        namespace = self._namespace(cache_type)
+        value = namespace.get(key)
+        if value is not None or not self._persistent(cache_type):
+            return value
         
-        return None
+        # فحص الكاش على القرص
+        try:
+            entry = await self.disk.get(cache_type, key)
+        except Exception:
+            return None
+        
+        if entry is None:
+            return None
+        
+        # تحديث الكاش في الذاكرة بالمدة المتبقية فقط
+        value, expires_at = entry
+        namespace.disk_hits += 1
+        self._store(namespace, key, value, expires_at - time.time())
+        return value
     
-    async def set(self, cache_type: str, key: str, value: Any):
-        """تخزين قيمة في الكاش"""
-        data = {
-            'value': value,
-            'timestamp': datetime.now().timestamp()
-        }
+    async def set(self, cache_type: str, key: str, value: Any, ttl: Optional[float] = None,
+                  persist: bool = True):
+        """تخزين قيمة في الكاش (ttl يتجاوز مدة المساحة لهذا العنصر فقط)
+        
+        persist=False للقيم المحمّلة من مصدر دائم آخر (مثل تسخين الكاش من القاعدة).
+        """
+        if ttl is None:
+            ttl = self._get_ttl(cache_type)
         
         # تحديث الكاش في الذاكرة
-        if cache_type not in self.memory_cache:
-            self.memory_cache[cache_type] = {}
-        self.memory_cache[cache_type][key] = data
+        self._store(self._namespace(cache_type), key, value, ttl)
+        if not persist or not self._persistent(cache_type):
+            return
         
-        # تخزين في الملفات
-        cache_file = self.cache_dir / f"{cache_type}_{key}.json"
+        # تخزين على القرص
         try:
-            cache_file.write_text(json.dumps(data))
+            await self.disk.set(cache_type, key, value, time.time() + ttl)
         except Exception:
             pass
     
-    def _is_expired(self, timestamp: float, cache_type: str) -> bool:
-        """التحقق من انتهاء صلاحية الكاش"""
-        ttl = self.cache_config.get(cache_type, {}).get('ttl', 3600)
-        return (datetime.now().timestamp() - timestamp) > ttl
+    async def get_or_compute(self, cache_type: str, key: str,
+                             loader: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """إرجاع القيمة من الكاش أو حسابها مرة واحدة فقط مهما تعدد الطلبات المتزامنة
+        
+        إذا كانت القيمة منتهية وضمن نافذة stale_ttl تُعاد فوراً ويُحدَّث الكاش في الخلفية.
+        """
+        result = await self._lookup(cache_type, key)
+        if result is not None:
+            value, fresh = result
+            if not fresh:
+                self._start_load(cache_type, key, loader)
+            return value
+        
+        # قد يكون تحميل آخر اكتمل أثناء انتظار القرص
+        if (cache_type, key) not in self._inflight:
+            result = self._namespace(cache_type).peek(key)
+            if result is not None:
+                if not result[1]:
+                    self._start_load(cache_type, key, loader)
+                return result[0]
+        
+        # shield: إلغاء أحد المنتظرين لا يلغي التحميل المشترك
+        return await asyncio.shield(self._start_load(cache_type, key, loader))
     
-    def _update_memory_cache(self, cache_type: str, key: str, data: dict):
-        """تحديث الكاش في الذاكرة"""
-        if cache_type not in self.memory_cache:
-            self.memory_cache[cache_type] = {}
-        self.memory_cache[cache_type][key] = data
+    async def _lookup(self, cache_type: str, key: str) -> Optional[Tuple[Any, bool]]:
+        """البحث في الذاكرة ثم القرص مع قبول القيم القديمة ضمن نافذة stale_ttl"""
+        namespace = self._namespace(cache_type)
+        result = namespace.lookup(key)
+        if result is not None or not self._persistent(cache_type):
+            return result
+        
+        try:
+            entry = await self.disk.get(cache_type, key, grace=namespace.stale_ttl)
+        except Exception:
+            return None
+        
+        if entry is None:
+            return None
+        
+        value, expires_at = entry
+        namespace.disk_hits += 1
+        remaining = expires_at - time.time()
+        self._store(namespace, key, value, remaining)
+        return value, remaining > 0
+    
+    def _start_load(self, cache_type: str, key: str, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """بدء تحميل المفتاح أو الانضمام لتحميل جارٍ"""
+        flight_key = (cache_type, key)
+        task = self._inflight.get(flight_key)
+        if task is None:
+            task = asyncio.create_task(self._run_loader(cache_type, key, loader))
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda done: self._finish_load(flight_key, done))
+        return task
     
-    async def cleanup(self):
+    async def _run_loader(self, cache_type: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        namespace = self._namespace(cache_type)
+        start = time.perf_counter()
+        try:
+            value = await loader()
+        except Exception:
+            namespace.record_load((time.perf_counter() - start) * 1000, failed=True)
+            raise
+        
+        namespace.record_load((time.perf_counter() - start) * 1000)
+        if value is not None:
+            await self.set(cache_type, key, value)
+        return value
+    
+    def _finish_load(self, flight_key: Tuple[str, str], task: asyncio.Task):
+        if self._inflight.get(flight_key) is task:
+            del self._inflight[flight_key]
+        
+        # تحديثات الخلفية قد لا ينتظرها أحد
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"⚠️ فشل تحميل قيمة الكاش {flight_key[0]}:{flight_key[1][:50]}: {task.exception()}")
+    
+    def remaining_ttl(self, cache_type: str, key: str) -> Optional[float]:
+        """الثواني المتبقية لصلاحية عنصر في الذاكرة (سالبة ضمن نافذة القِدم) أو None"""
+        return self._namespace(cache_type).remaining(key)
+    
+    async def delete(self, cache_type: str, key: str):
+        """حذف قيمة من الكاش"""
+        self._namespace(cache_type).delete(key)
+        if not self._persistent(cache_type):
+            return
+        
+        try:
+            await self.disk.delete(cache_type, key)
+        except Exception:
+            pass
+    
+    async def clear(self, cache_type: Optional[str] = None) -> int:
+        """مسح مساحة واحدة أو جميع المساحات من الذاكرة والقرص، ويعيد عدد العناصر الممسوحة من الذاكرة"""
+        cache_types = [cache_type] if cache_type else list(self.memory_cache)
+        cleared = 0
+        for name in cache_types:
+            namespace = self.memory_cache.get(name)
+            if namespace is not None:
+                cleared += len(namespace)
+                namespace.clear()
+        
+        try:
+            await self.disk.clear(cache_type)
+        except Exception as e:
+            logger.warning(f"⚠️ فشل مسح كاش القرص {cache_type or 'all'}: {e}")
+        
+        return cleared
+    
+    def _get_ttl(self, cache_type: str) -> float:
+        return self._config(cache_type)['ttl']
+    
+    def namespace_stats(self, cache_type: str) -> Dict[str, Any]:
+        """عدادات مساحة واحدة (تُنشأ فارغة إذا لم تُستخدم بعد)"""
+        return self._namespace(cache_type).get_stats()
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """عدادات كل مساحة في الذاكرة (العناصر، الحجم، الإصابات، الإخلاء)"""
+        return {cache_type: namespace.get_stats() for cache_type, namespace in self.memory_cache.items()}
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """نسخة من جميع قياسات الكاش لضبط TTL والأحجام"""
+        return {
+            'since': self.metrics_since.isoformat(),
+            'memory': self.get_memory_usage(),
+            'namespaces': {cache_type: namespace.snapshot() for cache_type, namespace in self.memory_cache.items()}
+        }
+    
+    def reset_metrics(self):
+        for namespace in self.memory_cache.values():
+            namespace.reset_metrics()
+        self.budget_evictions = 0
+        self.metrics_since = datetime.now()
+    
+    def hit_rate(self, *cache_types: str) -> float:
+        """نسبة الإصابة الصالحة المجمعة لعدة مساحات (أو جميعها)"""
+        namespaces = [self._namespace(name) for name in cache_types] if cache_types else list(self.memory_cache.values())
+        hits = sum(namespace.hits for namespace in namespaces)
+        lookups = sum(namespace.hits + namespace.stale_hits + namespace.misses for namespace in namespaces)
+        return round(hits / lookups, 4) if lookups else 0.0
+    
+    def get_memory_usage(self) -> Dict[str, Any]:
+        """استخدام الذاكرة الإجمالي مقابل الحد المشترك"""
+        return {
+            'bytes': self.memory_bytes(),
+            'budget': self.memory_budget,
+            'entries': sum(len(namespace) for namespace in self.memory_cache.values()),
+            'budget_evictions': self.budget_evictions
+        }
+    
+    async def cleanup(self) -> int:
         """تنظيف الكاش القديم"""
-        # تنظيف الكاش في الذاكرة
-        for cache_type in list(self.memory_cache.keys()):
-            for key in list(self.memory_cache[cache_type].keys()):
-                data = self.memory_cache[cache_type][key]
-                if self._is_expired(data['timestamp'], cache_type):
-                    del self.memory_cache[cache_type][key]
-        
-        # تنظيف ملفات الكاش
-        for cache_file in self.cache_dir.glob("*.json"):
-            try:
-                data = json.loads(cache_file.read_text())
-                cache_type = cache_file.stem.split('_')[0]
-                if self._is_expired(data['timestamp'], cache_type):
-                    cache_file.unlink()
-            except Exception:
-                pass
+        # تنظيف الكاش في الذاكرة (العناصر المستحقة فقط)
+        for namespace in self.memory_cache.values():
+            namespace.purge_expired()
+        
+        # حذف جماعي للعناصر المنتهية على القرص (مع إبقاء نافذة القِدم الأطول)
+        grace = max((config.get('stale_ttl', 0) for config in self.cache_config.values()), default=0)
+        try:
+            return await self.disk.purge_expired(grace)
+        except Exception:
+            return 0
+    
+    async def close(self):
+        await self.disk.close()
 
 # إنشاء مثيل عام
-cache_manager = CacheManager()
\ No newline at end of file
+cache_manager = CacheManager()
@@ -1,137 +1,254 @@
 import aiofiles
 import aiosqlite
+import asyncio
+import hashlib
 import json
+import re
+import time
+from contextlib import aclosing, asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 from pathlib import Path
 
+from config import Config
 from core.logger import get_database_logger
+from core.migrations import run_migrations
+from core.partitions import ThreatPartitions, partition_key, partition_name
+from core.rollups import day_bucket, hour_bucket, split_range
+from core.query_metrics import DatabaseMetrics, InstrumentedConnection, instrumented
+from core.bloom import ScalableBloomFilter
+from core.expiry import ExpiryScheduler, expiry_scheduler
 
 logger = get_database_logger()
 
+# الإعدادات الافتراضية لأي سيرفر جديد
+DEFAULT_GUILD_SETTINGS = {
+    'admin_channel_id': None,
+    'protection_level': 2,
+    'auto_ban_threshold': 10,
+    'link_scan_enabled': True,
+    'anti_raid_enabled': True,
+    'behavior_monitoring': True
+}
+
+# عدادات جدول الإحصائيات اليومية
+STAT_COUNTERS = (
+    'threats_detected',
+    'links_scanned',
+    'malicious_links_blocked',
+    'users_warned',
+    'users_banned',
+    'raids_prevented'
+)
+
+class GuildSettingsCache:
+    """كاش إعدادات السيرفرات في الذاكرة مع رقم إصدار لكل سيرفر"""
+    
+    def __init__(self):
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._versions: Dict[int, int] = {}
+    
+    def get(self, guild_id: int) -> Optional[Dict[str, Any]]:
+        """الحصول على نسخة من إعدادات السيرفر المحفوظة"""
+        entry = self._entries.get(guild_id)
+        if entry is None:
+            return None
+        return dict(entry['settings'])
+    
+    def set(self, guild_id: int, settings: Dict[str, Any]):
+        """حفظ إعدادات السيرفر كاملة وزيادة رقم الإصدار"""
+        version = self._bump_version(guild_id)
+        self._entries[guild_id] = {'settings': dict(settings), 'version': version}
+    
+    def update(self, guild_id: int, **changes) -> bool:
+        """تحديث جزئي للإعدادات المحفوظة (يرجع False إذا لم تكن محفوظة)"""
+        entry = self._entries.get(guild_id)
+        if entry is None:
+            # لا توجد نسخة كاملة - نبطل أي نسخة قديمة ليتم تحميلها من القاعدة
+            self._bump_version(guild_id)
+            return False
+        
+        entry['settings'].update(changes)
+        entry['version'] = self._bump_version(guild_id)
+        return True
+    
+    def invalidate(self, guild_id: Optional[int] = None):
+        """إبطال إعدادات سيرفر محدد أو جميع السيرفرات"""
+        guild_ids = [guild_id] if guild_id is not None else list(self._entries.keys())
+        for gid in guild_ids:
+            self._entries.pop(gid, None)
+            self._bump_version(gid)
+    
+    def get_version(self, guild_id: int) -> int:
+        """رقم الإصدار الحالي لإعدادات السيرفر"""
+        return self._versions.get(guild_id, 0)
+    
+    def is_current(self, guild_id: int, version: int) -> bool:
+        """التحقق من أن نسخة مأخوذة سابقاً ما زالت صالحة"""
+        return self.get_version(guild_id) == version
+    
+    def _bump_version(self, guild_id: int) -> int:
+        version = self._versions.get(guild_id, 0) + 1
+        self._versions[guild_id] = version
+        return version
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
 class DatabaseManager:
     """مدير قاعدة البيانات الرئيسي"""
     
-    def __init__(self, db_path: str = "security_bot.db"):
+    def __init__(self, db_path: str = "security_bot.db", read_pool_size: Optional[int] = None,
+                 incident_window: Optional[float] = None, expiry: Optional[ExpiryScheduler] = None):
         self.db_path = db_path
         self.initialized = False
+        self.guild_settings_cache = GuildSettingsCache()
+        
+        # قياس أداء الاستعلامات (معطل افتراضياً)
+        self.metrics = DatabaseMetrics(Config.DB_METRICS_ENABLED, Config.DB_SLOW_QUERY_MS)
+        
+        # اتصال الكتابة الدائم ومجمع اتصالات القراءة
+        self.db: Optional[aiosqlite.Connection] = None
+        self.read_pool_size = Config.DATABASE_READ_POOL_SIZE if read_pool_size is None else read_pool_size
+        self._readers: List[aiosqlite.Connection] = []
+        self._read_pool: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+        
+        # أقسام التهديدات الشهرية
+        self.threat_partitions = ThreatPartitions()
+        self._next_threat_id = 1
+        
+        # طابور الكتابة المؤجلة للتهديدات ونقاط الخطر
+        self.write_batch_size = Config.DB_WRITE_BATCH_SIZE
+        self.write_flush_interval = Config.DB_WRITE_FLUSH_INTERVAL
+        self._pending_threats: List[Dict[str, Any]] = []
+        self._pending_danger_points: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self._flush_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        # دمج التهديدات المتكررة: (سيرفر، مستخدم، نوع، بصمة المحتوى) -> الحادثة المفتوحة
+        self.incident_window = Config.THREAT_INCIDENT_WINDOW if incident_window is None else incident_window
+        self._open_incidents: Dict[Tuple[int, int, str, str], Dict[str, Any]] = {}
+        self._pending_incident_updates: Dict[int, Dict[str, Any]] = {}
+        self._incident_expiry = (expiry or expiry_scheduler).group('db:incidents', self._expire_incident)
+        self.incidents_merged = 0
+        
+        # مجمّع عدادات الإحصائيات اليومية في الذاكرة
+        self.stats_flush_interval = Config.STATS_FLUSH_INTERVAL
+        self._pending_stats: Dict[Tuple[int, str, str], int] = {}
+        self._last_stats_flush = 0.0
+        
+        # تجميعات الساعة: (سيرفر، ساعة، نوع التهديد) -> [العدد، عالي الخطورة] و (سيرفر، ساعة) -> [مفحوص، ضار]
+        self._pending_threat_rollups: Dict[Tuple[int, str, str], List[int]] = {}
+        self._pending_scan_rollups: Dict[Tuple[int, str], List[int]] = {}
+        
+        # مرشح بلوم أمام scanned_links: الروابط الجديدة لا تصل إلى القاعدة
+        self.scanned_links_filter: Optional[ScalableBloomFilter] = None
+        self.scanned_links_filter_path = None if db_path == ':memory:' else Path(f"{db_path}.bloom")
+        self._filter_max_id = 0  # أكبر id في scanned_links ممثل في المرشح
+        self.filter_skips = 0
     
     async def initialize(self):
-        """إنشاء قاعدة البيانات والجداول"""
+        """إنشاء قاعدة البيانات والجداول وفتح الاتصالات الدائمة"""
+        if self.initialized:
+            return
+        
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await self._create_tables(db)
-                await self._insert_default_data(db)
-                await db.commit()
+            self.db = await aiosqlite.connect(self.db_path)
+            await self._apply_pragmas(self.db)
+            
+            await run_migrations(self.db)
+            await self._load_threat_partitions(self.db)
+            await self._insert_default_data(self.db)
+            await self.db.commit()
+            
+            # تحميل إعدادات جميع السيرفرات إلى الذاكرة
+            await self._load_guild_settings_cache(self.db)
+            await self._load_scanned_links_filter(self.db)
+            
+            await self._open_read_pool()
+            
+            # بدء مهمة تفريغ طابور الكتابة
+            self._flush_task = asyncio.create_task(self._flush_loop())
             
             self.initialized = True
-            logger.info("✅ تم إنشاء قاعدة البيانات بنجاح")
+            logger.info(f"✅ تم إنشاء قاعدة البيانات بنجاح ({len(self._readers)} اتصال قراءة)")
             
         except Exception as e:
             logger.error(f"❌ خطأ في إنشاء قاعدة البيانات: {e}")
+            await self.close()
             raise
     
-    async def _create_tables(self, db: aiosqlite.Connection):
-        """إنشاء جداول قاعدة البيانات"""
-        
-        # جدول إعدادات السيرفرات
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS guild_settings (
-                guild_id INTEGER PRIMARY KEY,
-                admin_channel_id INTEGER,
-                protection_level INTEGER DEFAULT 2,
-                auto_ban_threshold INTEGER DEFAULT 10,
-                link_scan_enabled BOOLEAN DEFAULT 1,
-                anti_raid_enabled BOOLEAN DEFAULT 1,
-                behavior_monitoring BOOLEAN DEFAULT 1,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # جدول التهديدات
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS threats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                threat_type TEXT NOT NULL,
-                content TEXT,
-                severity TEXT DEFAULT 'medium',
-                status TEXT DEFAULT 'detected',
-                action_taken TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                resolved_at DATETIME,
-                resolved_by INTEGER
-            )
-        ''')
-        
-        # جدول الروابط المفحوصة
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS scanned_links (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                url_hash TEXT UNIQUE NOT NULL,
-                original_url TEXT NOT NULL,
-                is_malicious BOOLEAN NOT NULL,
-                scan_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                virustotal_score INTEGER DEFAULT 0,
-                scan_engines TEXT,
-                threat_names TEXT
-            )
-        ''')
-        
-        # جدول نقاط الخطر للمستخدمين
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS user_danger_scores (
-                user_id INTEGER,
-                guild_id INTEGER,
-                danger_points INTEGER DEFAULT 0,
-                total_warnings INTEGER DEFAULT 0,
-                last_warning DATETIME,
-                last_violation DATETIME,
-                status TEXT DEFAULT 'active',
-                PRIMARY KEY (user_id, guild_id)
-            )
-        ''')
-        
-        # جدول البلاغات
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS reports (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                reporter_id INTEGER NOT NULL,
-                reported_user_id INTEGER NOT NULL,
-                reason TEXT NOT NULL,
-                evidence TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                handled_by INTEGER,
-                handled_at DATETIME,
-                action_taken TEXT
-            )
-        ''')
-        
-        # جدول إحصائيات الأمان
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS security_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                stat_date DATE NOT NULL,
-                threats_detected INTEGER DEFAULT 0,
-                links_scanned INTEGER DEFAULT 0,
-                malicious_links_blocked INTEGER DEFAULT 0,
-                users_warned INTEGER DEFAULT 0,
-                users_banned INTEGER DEFAULT 0,
-                raids_prevented INTEGER DEFAULT 0,
-                UNIQUE(guild_id, stat_date)
-            )
-        ''')
+    async def _apply_pragmas(self, db: aiosqlite.Connection, read_only: bool = False):
+        """ضبط إعدادات الأداء للاتصال"""
+        if not read_only:
+            await db.execute('PRAGMA journal_mode = WAL')
+            await db.execute('PRAGMA synchronous = NORMAL')
+        else:
+            await db.execute('PRAGMA query_only = 1')
+        
+        await db.execute(f'PRAGMA cache_size = -{int(Config.DATABASE_CACHE_SIZE_KB)}')
+        await db.execute(f'PRAGMA mmap_size = {int(Config.DATABASE_MMAP_SIZE)}')
+        await db.execute('PRAGMA temp_store = MEMORY')
+        await db.execute(f'PRAGMA busy_timeout = {int(Config.DATABASE_BUSY_TIMEOUT_MS)}')
+    
+    async def _open_read_pool(self):
+        """فتح مجمع اتصالات القراءة فقط"""
+        if self.read_pool_size <= 0 or self.db_path == ':memory:':
+            return
+        
+        self._read_pool = asyncio.Queue()
+        uri = f"file:{Path(self.db_path).resolve().as_posix()}?mode=ro"
+        for _ in range(self.read_pool_size):
+            reader = await aiosqlite.connect(uri, uri=True)
+            await self._apply_pragmas(reader, read_only=True)
+            self._readers.append(reader)
+            self._read_pool.put_nowait(reader)
+    
+    def _instrument(self, db: aiosqlite.Connection):
+        """تغليف الاتصال لقياس الأوامر عند تفعيل القياس"""
+        return InstrumentedConnection(db, self.metrics) if self.metrics.enabled else db
+    
+    def _record_lock_wait(self, wait_start: float):
+        if self.metrics.enabled:
+            self.metrics.record_lock_wait((time.perf_counter() - wait_start) * 1000)
+    
+    @asynccontextmanager
+    async def _writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """الحصول على اتصال الكتابة (اتصال مؤقت إذا لم تتم التهيئة)"""
+        if self.db is None:
+            async with aiosqlite.connect(self.db_path) as db:
+                yield db
+            return
         
-        # إنشاء الفهارس لتسريع الاستعلامات
-        await db.execute('CREATE INDEX IF NOT EXISTS idx_threats_guild_user ON threats(guild_id, user_id)')
-        await db.execute('CREATE INDEX IF NOT EXISTS idx_threats_timestamp ON threats(timestamp)')
-        await db.execute('CREATE INDEX IF NOT EXISTS idx_scanned_links_hash ON scanned_links(url_hash)')
-        await db.execute('CREATE INDEX IF NOT EXISTS idx_user_scores_guild ON user_danger_scores(guild_id)')
+        wait_start = time.perf_counter()
+        async with self._write_lock:
+            self._record_lock_wait(wait_start)
+            try:
+                yield self._instrument(self.db)
+            except Exception:
+                # عدم ترك معاملة مفتوحة على الاتصال الدائم
+                await self.db.rollback()
+                # الأقسام المنشأة أو المحذوفة داخل المعاملة تراجعت معها
+                await self.threat_partitions.load(self.db)
+                raise
+    
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """الحصول على اتصال قراءة من المجمع"""
+        if self._read_pool is None:
+            async with self._writer() as db:
+                yield db
+            return
+        
+        wait_start = time.perf_counter()
+        reader = await self._read_pool.get()
+        self._record_lock_wait(wait_start)
+        try:
+            yield self._instrument(reader)
+        finally:
+            self._read_pool.put_nowait(reader)
     
     async def _insert_default_data(self, db: aiosqlite.Connection):
         """إدراج البيانات الافتراضية"""
@@ -139,35 +256,58 @@ class DatabaseManager:
         pass
     
     # وظائف إعدادات السيرفر
+    async def _load_guild_settings_cache(self, db: aiosqlite.Connection):
+        """تحميل إعدادات جميع السيرفرات إلى الكاش"""
+        async with db.execute('SELECT * FROM guild_settings') as cursor:
+            columns = [description[0] for description in cursor.description]
+            rows = await cursor.fetchall()
+        
+        self.guild_settings_cache.invalidate()
+        for row in rows:
+            settings = dict(zip(columns, row))
+            self.guild_settings_cache.set(settings['guild_id'], settings)
+        
+        logger.info(f"⚙️ تم تحميل إعدادات {len(rows)} سيرفر إلى الذاكرة")
+    
+    def get_cached_guild_settings(self, guild_id: int) -> Dict[str, Any]:
+        """الحصول على إعدادات السيرفر من الذاكرة فقط (بدون أي عملية على القاعدة)"""
+        settings = self.guild_settings_cache.get(guild_id)
+        if settings is None:
+            settings = {'guild_id': guild_id, **DEFAULT_GUILD_SETTINGS}
+        return settings
+    
+    @instrumented
     async def get_guild_settings(self, guild_id: int) -> Dict[str, Any]:
         """الحصول على إعدادات السيرفر"""
-        async with aiosqlite.connect(self.db_path) as db:
+        cached = self.guild_settings_cache.get(guild_id)
+        if cached is not None:
+            return cached
+        
+        # تحديث يتم أثناء القراءة يغير الإصدار، فلا تُعاد النسخة القديمة إلى الكاش
+        version = self.guild_settings_cache.get_version(guild_id)
+        async with self._reader() as db:
             async with db.execute(
                 'SELECT * FROM guild_settings WHERE guild_id = ?', 
                 (guild_id,)
             ) as cursor:
                 row = await cursor.fetchone()
-                
-                if row:
-                    columns = [description[0] for description in cursor.description]
-                    return dict(zip(columns, row))
-                else:
-                    # إنشاء إعدادات افتراضية
-                    return await self.create_default_guild_settings(guild_id)
+                columns = [description[0] for description in cursor.description]
+        
+        if row:
+            settings = dict(zip(columns, row))
+            if self.guild_settings_cache.is_current(guild_id, version):
+                self.guild_settings_cache.set(guild_id, settings)
+            return dict(settings)
+        
+        # إنشاء إعدادات افتراضية
+        return await self.create_default_guild_settings(guild_id)
     
+    @instrumented
     async def create_default_guild_settings(self, guild_id: int) -> Dict[str, Any]:
         """إنشاء إعدادات افتراضية للسيرفر"""
-        default_settings = {
-            'guild_id': guild_id,
-            'admin_channel_id': None,
-            'protection_level': 2,
-            'auto_ban_threshold': 10,
-            'link_scan_enabled': True,
-            'anti_raid_enabled': True,
-            'behavior_monitoring': True
-        }
+        default_settings = {'guild_id': guild_id, **DEFAULT_GUILD_SETTINGS}
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._writer() as db:
             await db.execute('''
                 INSERT OR REPLACE INTO guild_settings 
                 (guild_id, protection_level, auto_ban_threshold, link_scan_enabled, anti_raid_enabled, behavior_monitoring)
@@ -175,8 +315,11 @@ class DatabaseManager:
             ''', (guild_id, 2, 10, 1, 1, 1))
             await db.commit()
         
-        return default_settings
+        # الكتابة المباشرة في الكاش
+        self.guild_settings_cache.set(guild_id, default_settings)
+        return dict(default_settings)
     
+    @instrumented
     async def update_guild_settings(self, guild_id: int, **kwargs):
         """تحديث إعدادات السيرفر"""
         if not kwargs:
@@ -186,68 +329,285 @@ class DatabaseManager:
         set_clause = ', '.join([f"{key} = ?" for key in kwargs.keys()])
         values = list(kwargs.values()) + [guild_id]
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._writer() as db:
             await db.execute(f'''
                 UPDATE guild_settings 
                 SET {set_clause}, updated_at = CURRENT_TIMESTAMP
                 WHERE guild_id = ?
             ''', values)
             await db.commit()
+        
+        # الكتابة المباشرة في الكاش
+        self.guild_settings_cache.update(guild_id, **kwargs)
     
     # وظائف التهديدات
+    async def _load_threat_partitions(self, db: aiosqlite.Connection):
+        """تحميل أقسام التهديدات وآخر معرف مستخدم"""
+        await self.threat_partitions.load(db)
+        
+        async with db.execute('SELECT MAX(id) FROM threats') as cursor:
+            self._next_threat_id = ((await cursor.fetchone())[0] or 0) + 1
+    
+    def _allocate_threat_id(self) -> int:
+        """معرفات التهديدات فريدة عبر جميع الأقسام"""
+        threat_id = self._next_threat_id
+        self._next_threat_id += 1
+        return threat_id
+    
+    @instrumented
     async def add_threat(self, guild_id: int, user_id: int, threat_type: str, 
                         content: str = None, severity: str = 'medium') -> int:
         """إضافة تهديد جديد"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute('''
-                INSERT INTO threats (guild_id, user_id, threat_type, content, severity)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (guild_id, user_id, threat_type, content, severity))
+        timestamp = self._utc_timestamp()
+        
+        async with self._writer() as db:
+            key = partition_key(timestamp)
+            await self.threat_partitions.ensure(db, key)
+            
+            threat_id = self._allocate_threat_id()
+            await db.execute(f'''
+                INSERT INTO {partition_name(key)}
+                (id, guild_id, user_id, threat_type, content, severity, timestamp, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (threat_id, guild_id, user_id, threat_type, content, severity, timestamp, timestamp))
             
-            threat_id = cursor.lastrowid
             await db.commit()
             
             # تحديث الإحصائيات
-            await self._update_daily_stats(db, guild_id, 'threats_detected', 1)
+            self._record_threat_stats(guild_id, threat_type, severity, timestamp)
             
             logger.info(f"🚨 تم تسجيل تهديد جديد: {threat_type} من المستخدم {user_id}")
             return threat_id
     
+    async def _fetch_threats(self, partitions: List[str], where: str, params: tuple,
+                             limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """قراءة التهديدات من الأقسام بالترتيب من الأحدث والتوقف عند اكتمال الحد"""
+        results: List[Dict[str, Any]] = []
+        
+        for name in partitions:
+            query = f'SELECT * FROM {name} WHERE {where} ORDER BY timestamp DESC, id DESC'
+            query_params = params
+            if limit is not None:
+                query += ' LIMIT ?'
+                query_params = params + (limit - len(results),)
+            
+            results.extend(await self._fetch_all(query, query_params))
+            if limit is not None and len(results) >= limit:
+                break
+        
+        return results
+    
+    @instrumented
     async def get_user_threats(self, guild_id: int, user_id: int, 
                               days: int = 30) -> List[Dict[str, Any]]:
         """الحصول على تهديدات المستخدم في فترة معينة"""
         since_date = datetime.now() - timedelta(days=days)
         
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute('''
-                SELECT * FROM threats 
-                WHERE guild_id = ? AND user_id = ? AND timestamp >= ?
-                ORDER BY timestamp DESC
-            ''', (guild_id, user_id, since_date)) as cursor:
-                
+        rows = await self._fetch_threats(
+            self.threat_partitions.names_between(since_date),
+            'guild_id = ? AND user_id = ? AND timestamp >= ?',
+            (guild_id, user_id, self._format_timestamp(since_date))
+        )
+        
+        pending = self.get_pending_threats(guild_id, user_id)
+        return pending[::-1] + rows
+    
+    async def _fetch_all(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """تنفيذ استعلام قراءة وإرجاع النتائج كقواميس"""
+        async with self._reader() as db:
+            async with db.execute(query, params) as cursor:
                 rows = await cursor.fetchall()
                 columns = [description[0] for description in cursor.description]
-                return [dict(zip(columns, row)) for row in rows]
+        return [dict(zip(columns, row)) for row in rows]
+    
+    @staticmethod
+    def _format_timestamp(value) -> str:
+        """تحويل التاريخ لنفس تنسيق الأعمدة المخزنة للمقارنة النصية"""
+        if isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        return str(value)
+    
+    @instrumented
+    async def get_threats_in_period(self, guild_id: int, start_date: datetime,
+                                    end_date: datetime) -> List[Dict[str, Any]]:
+        """الحصول على تهديدات السيرفر في فترة زمنية (الأقسام المتقاطعة فقط)"""
+        return await self._fetch_threats(
+            self.threat_partitions.names_between(start_date, end_date),
+            'guild_id = ? AND timestamp >= ? AND timestamp <= ?',
+            (guild_id, self._format_timestamp(start_date), self._format_timestamp(end_date))
+        )
+    
+    @instrumented
+    async def get_recent_threats(self, guild_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """الحصول على أحدث تهديدات السيرفر (شاملة المنتظرة في الطابور)"""
+        pending = self.get_pending_threats(guild_id)[::-1][:limit]
+        if len(pending) >= limit:
+            return pending
+        
+        rows = await self._fetch_threats(
+            self.threat_partitions.names_between(), 'guild_id = ?', (guild_id,), limit - len(pending)
+        )
+        return pending + rows
+    
+    @instrumented
+    async def get_user_recent_threats(self, guild_id: int, user_id: int,
+                                      limit: int = 5) -> List[Dict[str, Any]]:
+        """الحصول على أحدث تهديدات مستخدم"""
+        pending = self.get_pending_threats(guild_id, user_id)[::-1][:limit]
+        if len(pending) >= limit:
+            return pending
+        
+        rows = await self._fetch_threats(
+            self.threat_partitions.names_between(), 'guild_id = ? AND user_id = ?',
+            (guild_id, user_id), limit - len(pending)
+        )
+        return pending + rows
+    
+    async def iter_rows(self, query: str, params: tuple = (),
+                        batch_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """قراءة نتائج الاستعلام على دفعات عبر مؤشر دون تحميلها كاملة في الذاكرة"""
+        batch_size = batch_size or Config.EXPORT_BATCH_SIZE
+        
+        async with self._reader() as db:
+            async with db.execute(query, params) as cursor:
+                columns = [description[0] for description in cursor.description]
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(zip(columns, row))
+    
+    async def iter_threats_in_period(self, guild_id: int, start_date: datetime,
+                                     end_date: datetime) -> AsyncIterator[Dict[str, Any]]:
+        """تهديدات السيرفر في فترة زمنية كتدفق صفوف، قسماً بعد قسم"""
+        params = (guild_id, self._format_timestamp(start_date), self._format_timestamp(end_date))
+        
+        for name in self.threat_partitions.names_between(start_date, end_date):
+            rows = self.iter_rows(f'''
+                SELECT * FROM {name}
+                WHERE guild_id = ? AND timestamp >= ? AND timestamp <= ?
+                ORDER BY timestamp DESC, id DESC
+            ''', params)
+            async with aclosing(rows):
+                async for row in rows:
+                    yield row
+    
+    def iter_user_scores(self, guild_id: int) -> AsyncIterator[Dict[str, Any]]:
+        """نقاط الخطر لمستخدمي السيرفر كتدفق صفوف"""
+        return self.iter_rows('''
+            SELECT * FROM user_danger_scores
+            WHERE guild_id = ?
+            ORDER BY danger_points DESC
+        ''', (guild_id,))
+    
+    @instrumented
+    async def get_threats_page(self, guild_id: int, user_id: Optional[int] = None,
+                               before: Optional[Tuple[str, int]] = None,
+                               limit: int = 10) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """صفحة من سجل التهديدات بترقيم المفتاح (timestamp, id)
+        
+        before: مؤشر آخر صف في الصفحة السابقة، None للصفحة الأولى.
+        يعيد (الصفوف، مؤشر الصفحة التالية أو None إذا انتهى السجل).
+        """
+        if before is None and self.get_pending_threats(guild_id, user_id):
+            # الصفحة الأولى يجب أن تعرض أحدث التهديدات المنتظرة في الطابور
+            await self.flush_pending_writes()
+        
+        conditions = ['guild_id = ?']
+        params: List[Any] = [guild_id]
+        
+        if user_id is not None:
+            conditions.append('user_id = ?')
+            params.append(user_id)
+        
+        if before is not None:
+            conditions.append('(timestamp, id) < (?, ?)')
+            params.extend([self._format_timestamp(before[0]), before[1]])
+        
+        # البدء من قسم المؤشر، مع صف إضافي لمعرفة وجود صفحة تالية دون COUNT(*)
+        partitions = self.threat_partitions.names_between(end=before[0] if before else None)
+        rows = await self._fetch_threats(partitions, ' AND '.join(conditions), tuple(params), limit + 1)
+        
+        if len(rows) <= limit:
+            return rows, None
+        
+        rows = rows[:limit]
+        return rows, (rows[-1]['timestamp'], rows[-1]['id'])
+    
+    @instrumented
+    async def get_total_threats_count(self, guild_id: int) -> int:
+        """عدد تهديدات السيرفر الإجمالي (من التجميع اليومي)"""
+        async with self._reader() as db:
+            async with db.execute(
+                'SELECT COALESCE(SUM(threat_count), 0) FROM threat_rollup_daily WHERE guild_id = ?', (guild_id,)
+            ) as cursor:
+                count = (await cursor.fetchone())[0]
+        
+        count += sum(
+            value[0] for (gid, _, _), value in self._pending_threat_rollups.items() if gid == guild_id
+        )
+        return count + len(self.get_pending_threats(guild_id))
     
     # وظائف نقاط الخطر
+    @instrumented
+    async def get_high_risk_users(self, guild_id: int, min_points: Optional[int] = None,
+                                  limit: int = 50) -> List[Dict[str, Any]]:
+        """المستخدمون الأعلى خطورة مرتبين تنازلياً (idx_user_scores_risk)"""
+        if min_points is None:
+            min_points = int(Config.MAX_DANGER_POINTS * 0.8)
+        
+        return await self._fetch_all('''
+            SELECT user_id, danger_points, total_warnings FROM user_danger_scores
+            WHERE guild_id = ? AND danger_points >= ?
+            ORDER BY danger_points DESC
+            LIMIT ?
+        ''', (guild_id, min_points, limit))
+    
+    @instrumented
+    async def get_all_user_scores(self, guild_id: int) -> List[Dict[str, Any]]:
+        """جميع نقاط الخطر لمستخدمي السيرفر"""
+        return await self._fetch_all('''
+            SELECT * FROM user_danger_scores
+            WHERE guild_id = ?
+            ORDER BY danger_points DESC
+        ''', (guild_id,))
+    
+    # وظائف نقاط الخطر
+    @instrumented
     async def add_danger_points(self, guild_id: int, user_id: int, points: int):
         """إضافة نقاط خطر للمستخدم"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._writer() as db:
             await db.execute('''
-                INSERT OR REPLACE INTO user_danger_scores 
+                INSERT INTO user_danger_scores 
                 (user_id, guild_id, danger_points, total_warnings, last_warning)
-                VALUES (
-                    ?, ?, 
-                    COALESCE((SELECT danger_points FROM user_danger_scores WHERE user_id = ? AND guild_id = ?), 0) + ?,
-                    COALESCE((SELECT total_warnings FROM user_danger_scores WHERE user_id = ? AND guild_id = ?), 0) + 1,
-                    CURRENT_TIMESTAMP
-                )
-            ''', (user_id, guild_id, user_id, guild_id, points, user_id, guild_id))
+                VALUES (?, ?, ?, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                    danger_points = danger_points + excluded.danger_points,
+                    total_warnings = total_warnings + excluded.total_warnings,
+                    last_warning = excluded.last_warning
+            ''', (user_id, guild_id, points))
             await db.commit()
     
+    @instrumented
+    async def reset_danger_points(self, guild_id: int, user_id: int):
+        """تصفير نقاط خطر المستخدم مع إسقاط نقاطه المنتظرة في الطابور"""
+        # قفل التفريغ: نقاط سُحبت من الطابور لتفريغ جارٍ تُكتب قبل التصفير لا بعده
+        async with self._flush_lock:
+            self._pending_danger_points.pop((guild_id, user_id), None)
+            
+            async with self._writer() as db:
+                await db.execute('''
+                    INSERT INTO user_danger_scores (user_id, guild_id, danger_points)
+                    VALUES (?, ?, 0)
+                    ON CONFLICT(user_id, guild_id) DO UPDATE SET danger_points = 0
+                ''', (user_id, guild_id))
+                await db.commit()
+    
+    @instrumented
     async def get_user_danger_score(self, guild_id: int, user_id: int) -> Dict[str, Any]:
-        """الحصول على نقاط خطر المستخدم"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """الحصول على نقاط خطر المستخدم (شاملة النقاط المنتظرة في الطابور)"""
+        async with self._reader() as db:
             async with db.execute('''
                 SELECT * FROM user_danger_scores 
                 WHERE guild_id = ? AND user_id = ?
@@ -256,26 +616,344 @@ class DatabaseManager:
                 row = await cursor.fetchone()
                 if row:
                     columns = [description[0] for description in cursor.description]
-                    return dict(zip(columns, row))
+                    score = dict(zip(columns, row))
                 else:
-                    return {'danger_points': 0, 'total_warnings': 0}
+                    score = {'danger_points': 0, 'total_warnings': 0}
+        
+        pending = self._pending_danger_points.get((guild_id, user_id))
+        if pending:
+            score['danger_points'] = (score.get('danger_points') or 0) + pending['points']
+            score['total_warnings'] = (score.get('total_warnings') or 0) + pending['warnings']
+            score['last_warning'] = pending['last_warning']
+        
+        return score
+    
+    # طابور الكتابة المؤجلة
+    async def queue_threat(self, guild_id: int, user_id: int, threat_type: str,
+                           content: str = None, severity: str = 'medium'):
+        """إضافة تهديد إلى طابور الكتابة المؤجلة"""
+        if self._flush_task is None:
+            # لا توجد مهمة تفريغ (القاعدة غير مهيأة) - كتابة مباشرة
+            await self.add_threat(guild_id, user_id, threat_type, content, severity)
+            return
+        
+        timestamp = self._utc_timestamp()
+        incident_key = (guild_id, user_id, threat_type, self._content_fingerprint(content))
+        if self._merge_incident(incident_key, severity, timestamp):
+            return
+        
+        threat = {
+            'id': self._allocate_threat_id(),
+            'guild_id': guild_id,
+            'user_id': user_id,
+            'threat_type': threat_type,
+            'content': content,
+            'severity': severity,
+            'status': 'detected',
+            'timestamp': timestamp,
+            'occurrences': 1,
+            'last_seen': timestamp,
+            'pending': True
+        }
+        self._pending_threats.append(threat)
+        
+        if self.incident_window > 0:
+            self._open_incidents[incident_key] = {'threat': threat, 'opened_at': time.monotonic()}
+            self._incident_expiry.schedule(incident_key, self.incident_window)
+        self._signal_flush_if_full()
+    
+    @staticmethod
+    def _content_fingerprint(content: Optional[str]) -> str:
+        """بصمة المحتوى بعد توحيد المسافات والأرقام ("تكرار الرسالة 5 مرات" = "... 7 مرات")"""
+        normalized = re.sub(r'\d+', '#', ' '.join((content or '').lower().split()))
+        return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+    
+    def _merge_incident(self, incident_key: Tuple[int, int, str, str], severity: str, timestamp: str) -> bool:
+        """زيادة عداد الحادثة المفتوحة بدل صف جديد، و False إذا لم توجد حادثة ضمن النافذة"""
+        incident = self._open_incidents.get(incident_key)
+        # النافذة تبدأ من أول ظهور ولا تنزلق مع التكرار: السبام المستمر يفتح صفاً جديداً كل نافذة
+        if incident is None or time.monotonic() - incident['opened_at'] > self.incident_window:
+            return False
+        
+        threat = incident['threat']
+        if threat['pending']:
+            # الصف لم يُكتب بعد - التعديل في الطابور نفسه
+            threat['occurrences'] += 1
+            threat['last_seen'] = timestamp
+        else:
+            update = self._pending_incident_updates.setdefault(
+                threat['id'], {'partition': partition_key(threat['timestamp']), 'occurrences': 0, 'last_seen': None}
+            )
+            update['occurrences'] += 1
+            update['last_seen'] = timestamp
+        
+        self.incidents_merged += 1
+        # العدادات والتجميعات تحسب كل تكرار كما لو كان صفاً مستقلاً
+        self._record_threat_stats(incident_key[0], incident_key[2], severity, timestamp)
+        self._signal_flush_if_full()
+        return True
+    
+    def _expire_incident(self, incident_key: Tuple[int, int, str, str]) -> Optional[float]:
+        """إغلاق الحادثة بعد انقضاء نافذتها (معالج جدولة الانتهاء)"""
+        incident = self._open_incidents.get(incident_key)
+        if incident is None:
+            return None
+        
+        remaining = incident['opened_at'] + self.incident_window - time.monotonic()
+        if remaining > 0:
+            return remaining
+        
+        del self._open_incidents[incident_key]
+        return None
+    
+    async def queue_danger_points(self, guild_id: int, user_id: int, points: int):
+        """إضافة نقاط خطر إلى طابور الكتابة المؤجلة (تُدمج لكل مستخدم)"""
+        if self._flush_task is None:
+            await self.add_danger_points(guild_id, user_id, points)
+            return
+        
+        pending = self._pending_danger_points.setdefault(
+            (guild_id, user_id),
+            {'points': 0, 'warnings': 0, 'last_warning': None}
+        )
+        pending['points'] += points
+        pending['warnings'] += 1
+        pending['last_warning'] = self._utc_timestamp()
+        self._signal_flush_if_full()
+    
+    def get_pending_threats(self, guild_id: Optional[int] = None,
+                            user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """قراءة التهديدات التي لم تُكتب بعد في القاعدة"""
+        return [
+            dict(threat) for threat in self._pending_threats
+            if (guild_id is None or threat['guild_id'] == guild_id)
+            and (user_id is None or threat['user_id'] == user_id)
+        ]
+    
+    def get_pending_writes_count(self) -> int:
+        """عدد العمليات المنتظرة في طابور الكتابة"""
+        return len(self._pending_threats) + len(self._pending_danger_points) + len(self._pending_incident_updates)
+    
+    def _signal_flush_if_full(self):
+        if self.get_pending_writes_count() >= self.write_batch_size:
+            self._flush_event.set()
+    
+    async def _flush_loop(self):
+        """تفريغ الطابور عند امتلائه أو كل فترة زمنية"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.write_flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            
+            try:
+                await self.flush_pending_writes()
+            except Exception as e:
+                logger.error(f"خطأ في تفريغ طابور الكتابة: {e}")
+            
+            if time.monotonic() - self._last_stats_flush >= self.stats_flush_interval:
+                try:
+                    await self.flush_stats()
+                except Exception as e:
+                    logger.error(f"خطأ في كتابة الإحصائيات اليومية: {e}")
+    
+    @instrumented
+    async def flush_pending_writes(self) -> int:
+        """كتابة جميع العمليات المنتظرة في معاملة واحدة"""
+        async with self._flush_lock:
+            threats, self._pending_threats = self._pending_threats, []
+            danger_points, self._pending_danger_points = self._pending_danger_points, {}
+            incident_updates, self._pending_incident_updates = self._pending_incident_updates, {}
+            
+            if not threats and not danger_points and not incident_updates:
+                return 0
+            
+            # التكرارات التي تصل أثناء الكتابة تذهب إلى incident_updates
+            for threat in threats:
+                threat['pending'] = False
+            
+            try:
+                async with self._writer() as db:
+                    if threats:
+                        by_partition: Dict[str, List[Dict[str, Any]]] = {}
+                        for threat in threats:
+                            by_partition.setdefault(partition_key(threat['timestamp']), []).append(threat)
+                        
+                        for key, partition_threats in by_partition.items():
+                            await self.threat_partitions.ensure(db, key)
+                            await db.executemany(f'''
+                                INSERT INTO {partition_name(key)}
+                                (id, guild_id, user_id, threat_type, content, severity, timestamp, occurrences, last_seen)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            ''', [
+                                (t['id'], t['guild_id'], t['user_id'], t['threat_type'], t['content'],
+                                 t['severity'], t['timestamp'], t['occurrences'], t['last_seen'])
+                                for t in partition_threats
+                            ])
+                    
+                    if incident_updates:
+                        by_partition: Dict[str, List[tuple]] = {}
+                        for threat_id, update in incident_updates.items():
+                            # قسم حذفه التنظيف لا يحتاج تحديثاً
+                            if update['partition'] in self.threat_partitions.keys:
+                                by_partition.setdefault(update['partition'], []).append(
+                                    (update['occurrences'], update['last_seen'], threat_id)
+                                )
+                        
+                        for key, params in by_partition.items():
+                            await db.executemany(f'''
+                                UPDATE {partition_name(key)}
+                                SET occurrences = occurrences + ?, last_seen = ?
+                                WHERE id = ?
+                            ''', params)
+                    
+                    if danger_points:
+                        await db.executemany('''
+                            INSERT INTO user_danger_scores 
+                            (user_id, guild_id, danger_points, total_warnings, last_warning)
+                            VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                                danger_points = danger_points + excluded.danger_points,
+                                total_warnings = total_warnings + excluded.total_warnings,
+                                last_warning = excluded.last_warning
+                        ''', [
+                            (user_id, guild_id, p['points'], p['warnings'], p['last_warning'])
+                            for (guild_id, user_id), p in danger_points.items()
+                        ])
+                    
+                    await db.commit()
+                    
+            except Exception:
+                # إعادة العمليات للطابور لعدم فقدانها
+                for threat in threats:
+                    threat['pending'] = True
+                self._pending_threats = threats + self._pending_threats
+                for threat_id, update in incident_updates.items():
+                    current = self._pending_incident_updates.get(threat_id)
+                    if current:
+                        current['occurrences'] += update['occurrences']
+                    else:
+                        self._pending_incident_updates[threat_id] = update
+                for key, p in danger_points.items():
+                    current = self._pending_danger_points.get(key)
+                    if current:
+                        current['points'] += p['points']
+                        current['warnings'] += p['warnings']
+                    else:
+                        self._pending_danger_points[key] = p
+                raise
+            
+            # العدادات والتجميعات بعد نجاح الكتابة فقط: التهديدات المعادة للطابور تُحسب عند كتابتها
+            for t in threats:
+                self._record_threat_stats(t['guild_id'], t['threat_type'], t['severity'], t['timestamp'])
+            
+            written = len(threats) + len(danger_points) + len(incident_updates)
+            logger.debug(f"💾 تم تفريغ {written} عملية كتابة مؤجلة")
+            return written
+    
+    @staticmethod
+    def _utc_timestamp() -> str:
+        """الوقت الحالي بنفس تنسيق CURRENT_TIMESTAMP في SQLite"""
+        return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
     
     # وظائف الروابط المفحوصة
+    async def _load_scanned_links_filter(self, db: aiosqlite.Connection):
+        """تحميل مرشح scanned_links من القرص واستكمال ما أُضيف بعده، أو بناؤه من الجدول"""
+        async with db.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM scanned_links') as cursor:
+            row_count, max_id = await cursor.fetchone()
+        
+        loaded = None
+        if self.scanned_links_filter_path is not None:
+            loaded = await asyncio.to_thread(ScalableBloomFilter.load, self.scanned_links_filter_path)
+        
+        if loaded is not None:
+            bloom, metadata = loaded
+            saved_max_id = metadata.get('max_id', 0)
+            # قاعدة مختلفة أو حذف كثير منذ الحفظ (مفاتيح ميتة ترفع الإيجاب الكاذب)
+            if saved_max_id <= max_id and len(bloom) <= 2 * row_count + Config.LINK_FILTER_CAPACITY:
+                self.scanned_links_filter = bloom
+                self._filter_max_id = saved_max_id
+                added = await self._add_scanned_links_to_filter(db, saved_max_id)
+                logger.info(f"🌸 تم تحميل مرشح الروابط ({len(bloom)} عنصر، {added} جديد)")
+                return
+        
+        await self.rebuild_scanned_links_filter(db)
+    
+    async def _add_scanned_links_to_filter(self, db: aiosqlite.Connection, after_id: int = 0) -> int:
+        """إضافة صفوف scanned_links ذات id أكبر من after_id إلى المرشح"""
+        added = 0
+        async with db.execute('SELECT id, url_hash FROM scanned_links WHERE id > ? ORDER BY id', (after_id,)) as cursor:
+            while True:
+                rows = await cursor.fetchmany(Config.EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                for row_id, url_hash in rows:
+                    self.scanned_links_filter.add(url_hash)
+                    self._filter_max_id = max(self._filter_max_id, row_id)
+                added += len(rows)
+        return added
+    
+    async def rebuild_scanned_links_filter(self, db: aiosqlite.Connection):
+        """بناء مرشح جديد من جميع صفوف scanned_links"""
+        self.scanned_links_filter = ScalableBloomFilter(Config.LINK_FILTER_CAPACITY, Config.LINK_FILTER_ERROR_RATE)
+        self._filter_max_id = 0
+        added = await self._add_scanned_links_to_filter(db)
+        logger.info(f"🌸 تم بناء مرشح الروابط من {added} رابط")
+    
+    async def save_scanned_links_filter(self):
+        """حفظ المرشح على القرص لبدء سريع"""
+        if self.scanned_links_filter is None or self.scanned_links_filter_path is None:
+            return
+        
+        try:
+            await asyncio.to_thread(
+                self.scanned_links_filter.save, self.scanned_links_filter_path, {'max_id': self._filter_max_id}
+            )
+        except Exception as e:
+            logger.error(f"❌ فشل حفظ مرشح الروابط: {e}")
+    
+    def get_scanned_links_filter_stats(self) -> Dict[str, Any]:
+        if self.scanned_links_filter is None:
+            return {'enabled': False}
+        return {'enabled': True, 'skipped_lookups': self.filter_skips, **self.scanned_links_filter.get_stats()}
+    
+    def iter_recent_scanned_links(self, limit: int) -> AsyncIterator[Dict[str, Any]]:
+        """أحدث الروابط المفحوصة أولاً (فهرس scan_date)"""
+        return self.iter_rows('''
+            SELECT url_hash, original_url, is_malicious, virustotal_score, threat_names, scan_date
+            FROM scanned_links
+            ORDER BY scan_date DESC
+            LIMIT ?
+        ''', (limit,))
+    
+    @instrumented
     async def add_scanned_link(self, url_hash: str, original_url: str, 
                               is_malicious: bool, vt_score: int = 0, 
                               scan_engines: str = None, threat_names: str = None):
         """إضافة رابط مفحوص"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
+        # الإضافة للمرشح قبل الكتابة: فشل الكتابة يترك إيجاباً كاذباً فقط
+        if self.scanned_links_filter is not None:
+            self.scanned_links_filter.add(url_hash)
+        
+        async with self._writer() as db:
+            cursor = await db.execute('''
                 INSERT OR REPLACE INTO scanned_links 
                 (url_hash, original_url, is_malicious, virustotal_score, scan_engines, threat_names)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (url_hash, original_url, is_malicious, vt_score, scan_engines, threat_names))
             await db.commit()
+            self._filter_max_id = max(self._filter_max_id, cursor.lastrowid or 0)
     
+    @instrumented
     async def get_scanned_link(self, url_hash: str) -> Optional[Dict[str, Any]]:
         """الحصول على نتيجة فحص رابط محفوظ"""
-        async with aiosqlite.connect(self.db_path) as db:
+        if self.scanned_links_filter is not None and url_hash not in self.scanned_links_filter:
+            # غير موجود بالتأكيد
+            self.filter_skips += 1
+            return None
+        
+        async with self._reader() as db:
             async with db.execute('''
                 SELECT * FROM scanned_links WHERE url_hash = ?
             ''', (url_hash,)) as cursor:
@@ -287,35 +965,220 @@ class DatabaseManager:
                 return None
     
     # وظائف الإحصائيات
-    async def _update_daily_stats(self, db: aiosqlite.Connection, guild_id: int, 
-                                 stat_name: str, increment: int = 1):
-        """تحديث الإحصائيات اليومية"""
-        today = datetime.now().date()
-        
-        await db.execute(f'''
-            INSERT OR REPLACE INTO security_stats 
-            (guild_id, stat_date, {stat_name})
-            VALUES (
-                ?, ?, 
-                COALESCE((SELECT {stat_name} FROM security_stats WHERE guild_id = ? AND stat_date = ?), 0) + ?
-            )
-        ''', (guild_id, today, guild_id, today, increment))
+    def increment_stat(self, guild_id: int, stat_name: str, increment: int = 1):
+        """زيادة عداد يومي في الذاكرة (يُكتب دورياً عبر flush_stats)"""
+        if stat_name not in STAT_COUNTERS:
+            raise ValueError(f"عداد إحصائيات غير معروف: {stat_name}")
+        if guild_id is None:
+            return
+        
+        key = (guild_id, datetime.now().date().isoformat(), stat_name)
+        self._pending_stats[key] = self._pending_stats.get(key, 0) + increment
     
+    def _record_threat_stats(self, guild_id: int, threat_type: str, severity: str, timestamp: str):
+        """تحديث العداد اليومي وتجميع الساعة لتهديد مكتوب"""
+        self.increment_stat(guild_id, 'threats_detected')
+        
+        rollup = self._pending_threat_rollups.setdefault((guild_id, hour_bucket(timestamp), threat_type), [0, 0])
+        rollup[0] += 1
+        if severity == 'high':
+            rollup[1] += 1
+    
+    def record_link_scan(self, guild_id: int, is_malicious: bool):
+        """تسجيل فحص رابط في العدادات اليومية وتجميع الساعة"""
+        if guild_id is None:
+            return
+        
+        self.increment_stat(guild_id, 'links_scanned')
+        if is_malicious:
+            self.increment_stat(guild_id, 'malicious_links_blocked')
+        
+        rollup = self._pending_scan_rollups.setdefault((guild_id, hour_bucket(datetime.utcnow())), [0, 0])
+        rollup[0] += 1
+        if is_malicious:
+            rollup[1] += 1
+    
+    def get_pending_stats(self, guild_id: int) -> Dict[str, int]:
+        """العدادات التي لم تُكتب بعد لسيرفر معين"""
+        totals = {name: 0 for name in STAT_COUNTERS}
+        for (gid, _, stat_name), value in self._pending_stats.items():
+            if gid == guild_id:
+                totals[stat_name] += value
+        return totals
+    
+    @instrumented
+    async def flush_stats(self) -> int:
+        """كتابة العدادات اليومية وتجميعات الساعة/اليوم بعمليات UPSERT في معاملة واحدة"""
+        async with self._flush_lock:
+            pending, self._pending_stats = self._pending_stats, {}
+            threat_rollups, self._pending_threat_rollups = self._pending_threat_rollups, {}
+            scan_rollups, self._pending_scan_rollups = self._pending_scan_rollups, {}
+            self._last_stats_flush = time.monotonic()
+            
+            if not pending and not threat_rollups and not scan_rollups:
+                return 0
+            
+            rows: Dict[Tuple[int, str], Dict[str, int]] = {}
+            for (guild_id, stat_date, stat_name), value in pending.items():
+                rows.setdefault((guild_id, stat_date), dict.fromkeys(STAT_COUNTERS, 0))[stat_name] += value
+            
+            daily_rollups: Dict[Tuple[int, str, str], List[int]] = {}
+            for (guild_id, hour, threat_type), (count, high) in threat_rollups.items():
+                daily = daily_rollups.setdefault((guild_id, day_bucket(hour), threat_type), [0, 0])
+                daily[0] += count
+                daily[1] += high
+            
+            columns = ', '.join(STAT_COUNTERS)
+            placeholders = ', '.join('?' for _ in STAT_COUNTERS)
+            updates = ', '.join(f"{name} = {name} + excluded.{name}" for name in STAT_COUNTERS)
+            
+            try:
+                async with self._writer() as db:
+                    await db.executemany(f'''
+                        INSERT INTO security_stats (guild_id, stat_date, {columns})
+                        VALUES (?, ?, {placeholders})
+                        ON CONFLICT(guild_id, stat_date) DO UPDATE SET {updates}
+                    ''', [
+                        (guild_id, stat_date, *(counters[name] for name in STAT_COUNTERS))
+                        for (guild_id, stat_date), counters in rows.items()
+                    ])
+                    
+                    for table, buckets in (('threat_rollup_hourly', threat_rollups),
+                                           ('threat_rollup_daily', daily_rollups)):
+                        await db.executemany(f'''
+                            INSERT INTO {table} (guild_id, bucket, threat_type, threat_count, high_count)
+                            VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT(guild_id, bucket, threat_type) DO UPDATE SET
+                                threat_count = threat_count + excluded.threat_count,
+                                high_count = high_count + excluded.high_count
+                        ''', [(*key, count, high) for key, (count, high) in buckets.items()])
+                    
+                    await db.executemany('''
+                        INSERT INTO scan_rollup_hourly (guild_id, bucket, links_scanned, malicious_links)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(guild_id, bucket) DO UPDATE SET
+                            links_scanned = links_scanned + excluded.links_scanned,
+                            malicious_links = malicious_links + excluded.malicious_links
+                    ''', [(*key, scanned, malicious) for key, (scanned, malicious) in scan_rollups.items()])
+                    
+                    await db.commit()
+                    
+            except Exception:
+                # إعادة العدادات للذاكرة لعدم فقدانها
+                for key, value in pending.items():
+                    self._pending_stats[key] = self._pending_stats.get(key, 0) + value
+                for target, source in ((self._pending_threat_rollups, threat_rollups),
+                                       (self._pending_scan_rollups, scan_rollups)):
+                    for key, (first, second) in source.items():
+                        current = target.setdefault(key, [0, 0])
+                        current[0] += first
+                        current[1] += second
+                raise
+            
+            return len(rows) + len(threat_rollups) + len(scan_rollups)
+    
+    async def _sum_rollup(self, db: aiosqlite.Connection, table: str, columns: str,
+                          guild_id: int, bucket_range: Tuple[str, str],
+                          group_by: Optional[str] = None) -> List[tuple]:
+        select = f"{group_by}, {columns}" if group_by else columns
+        query = f'SELECT {select} FROM {table} WHERE guild_id = ? AND bucket >= ? AND bucket <= ?'
+        if group_by:
+            query += f' GROUP BY {group_by}'
+        
+        async with db.execute(query, (guild_id, *bucket_range)) as cursor:
+            return await cursor.fetchall()
+    
+    @instrumented
+    async def get_threat_summary(self, guild_id: int, start_date: datetime,
+                                 end_date: datetime) -> Dict[str, Any]:
+        """ملخص التهديدات في فترة من جداول التجميع: الإجمالي، عالي الخطورة، وحسب النوع"""
+        hourly_ranges, daily_range = split_range(start_date, end_date)
+        by_type: Dict[str, int] = {}
+        high = 0
+        
+        async with self._reader() as db:
+            parts = [('threat_rollup_hourly', bucket_range) for bucket_range in hourly_ranges]
+            if daily_range:
+                parts.append(('threat_rollup_daily', daily_range))
+            
+            for table, bucket_range in parts:
+                for threat_type, count, high_count in await self._sum_rollup(
+                    db, table, 'SUM(threat_count), SUM(high_count)', guild_id, bucket_range, 'threat_type'
+                ):
+                    by_type[threat_type] = by_type.get(threat_type, 0) + count
+                    high += high_count
+        
+        # التجميعات والتهديدات التي لم تُكتب بعد
+        first_hour, last_hour = hour_bucket(start_date), hour_bucket(end_date)
+        pending = [
+            (threat_type, count, high_count)
+            for (gid, hour, threat_type), (count, high_count) in self._pending_threat_rollups.items()
+            if gid == guild_id and first_hour <= hour <= last_hour
+        ]
+        pending.extend(
+            (t['threat_type'], 1, int(t['severity'] == 'high'))
+            for t in self.get_pending_threats(guild_id)
+            if first_hour <= hour_bucket(t['timestamp']) <= last_hour
+        )
+        for threat_type, count, high_count in pending:
+            by_type[threat_type] = by_type.get(threat_type, 0) + count
+            high += high_count
+        
+        return {
+            'total': sum(by_type.values()),
+            'high': high,
+            'by_type': by_type
+        }
+    
+    @instrumented
+    async def get_scan_summary(self, guild_id: int, start_date: datetime,
+                               end_date: datetime) -> Dict[str, int]:
+        """عدد الروابط المفحوصة والضارة في فترة من تجميع الساعة"""
+        bucket_range = (hour_bucket(start_date), hour_bucket(end_date))
+        
+        async with self._reader() as db:
+            row = (await self._sum_rollup(
+                db, 'scan_rollup_hourly', 'SUM(links_scanned), SUM(malicious_links)', guild_id, bucket_range
+            ))[0]
+        
+        scanned, malicious = row[0] or 0, row[1] or 0
+        for (gid, hour), (count, malicious_count) in self._pending_scan_rollups.items():
+            if gid == guild_id and bucket_range[0] <= hour <= bucket_range[1]:
+                scanned += count
+                malicious += malicious_count
+        
+        return {'scanned': scanned, 'malicious': malicious}
+    
+    @instrumented
+    async def get_scanned_links_count(self, guild_id: int, start_date: datetime,
+                                      end_date: datetime) -> int:
+        """عدد الروابط المفحوصة في السيرفر خلال فترة"""
+        return (await self.get_scan_summary(guild_id, start_date, end_date))['scanned']
+    
+    @instrumented
     async def get_guild_security_stats(self, guild_id: int) -> dict:
         """جلب إحصائيات الأمان للسيرفر"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                # إحصائيات التهديدات
+            async with self._reader() as db:
+                # إحصائيات التهديدات من التجميع اليومي
                 threats_cursor = await db.execute("""
                     SELECT 
-                        COUNT(*) as total_threats,
-                        COUNT(CASE WHEN severity = 'high' THEN 1 END) as high_threats,
-                        COUNT(CASE WHEN status = 'resolved' THEN 1 END) as resolved_threats
-                    FROM threats
+                        COALESCE(SUM(threat_count), 0) as total_threats,
+                        COALESCE(SUM(high_count), 0) as high_threats
+                    FROM threat_rollup_daily
                     WHERE guild_id = ?
                 """, (guild_id,))
                 threat_stats = await threats_cursor.fetchone()
                 
+                # التهديدات المحلولة (فهرس الحالة في كل قسم)
+                resolved_threats = 0
+                for name in self.threat_partitions.names_between():
+                    resolved_cursor = await db.execute(
+                        f"SELECT COUNT(*) FROM {name} WHERE guild_id = ? AND status = 'resolved'",
+                        (guild_id,)
+                    )
+                    resolved_threats += (await resolved_cursor.fetchone())[0]
+                
                 # إحصائيات المستخدمين المحظورين
                 banned_cursor = await db.execute("""
                     SELECT COUNT(*) 
@@ -324,24 +1187,33 @@ class DatabaseManager:
                 """, (guild_id,))
                 banned_count = (await banned_cursor.fetchone())[0]
                 
-                # إحصائيات الروابط المفحوصة
+                # إحصائيات الروابط المفحوصة من العدادات اليومية للسيرفر
                 links_cursor = await db.execute("""
                     SELECT 
-                        COUNT(*) as total_scanned,
-                        COUNT(CASE WHEN is_malicious THEN 1 END) as malicious_links
-                    FROM scanned_links
-                    WHERE id IN (SELECT DISTINCT url_hash FROM threats WHERE guild_id = ?)
+                        COALESCE(SUM(links_scanned), 0) as total_scanned,
+                        COALESCE(SUM(malicious_links_blocked), 0) as malicious_links
+                    FROM security_stats
+                    WHERE guild_id = ?
                 """, (guild_id,))
                 link_stats = await links_cursor.fetchone()
-                
-                return {
-                    "total_threats": threat_stats[0],
-                    "high_threats": threat_stats[1],
-                    "resolved_threats": threat_stats[2],
-                    "banned_users": banned_count,
-                    "scanned_links": link_stats[0],
-                    "malicious_links": link_stats[1]
-                }
+            
+            pending_stats = self.get_pending_stats(guild_id)
+            pending_threats = [
+                value for (gid, _, _), value in self._pending_threat_rollups.items() if gid == guild_id
+            ]
+            queued_threats = self.get_pending_threats(guild_id)
+            
+            return {
+                "total_threats": threat_stats[0] + sum(count for count, _ in pending_threats) + len(queued_threats),
+                "high_threats": (
+                    threat_stats[1] + sum(high for _, high in pending_threats)
+                    + sum(1 for t in queued_threats if t['severity'] == 'high')
+                ),
+                "resolved_threats": resolved_threats,
+                "banned_users": banned_count,
+                "scanned_links": link_stats[0] + pending_stats['links_scanned'],
+                "malicious_links": link_stats[1] + pending_stats['malicious_links_blocked']
+            }
         except Exception as e:
             logger.error(f"خطأ في جلب إحصائيات الأمان: {e}")
             return {
@@ -353,9 +1225,10 @@ class DatabaseManager:
                 "malicious_links": 0
             }
     
+    @instrumented
     async def get_total_stats(self, guild_id: int) -> Dict[str, int]:
         """الحصول على إجمالي الإحصائيات"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._reader() as db:
             async with db.execute('''
                 SELECT 
                     SUM(threats_detected) as total_threats,
@@ -369,22 +1242,25 @@ class DatabaseManager:
             ''', (guild_id,)) as cursor:
                 
                 row = await cursor.fetchone()
-                if row:
-                    return {
-                        'total_threats': row[0] or 0,
-                        'total_links_scanned': row[1] or 0,
-                        'total_malicious_blocked': row[2] or 0,
-                        'total_users_warned': row[3] or 0,
-                        'total_users_banned': row[4] or 0,
-                        'total_raids_prevented': row[5] or 0
-                    }
-                return {}
+        
+        # إضافة العدادات التي لم تُكتب بعد
+        pending = self.get_pending_stats(guild_id)
+        row = row or (0,) * len(STAT_COUNTERS)
+        return {
+            'total_threats': (row[0] or 0) + pending['threats_detected'],
+            'total_links_scanned': (row[1] or 0) + pending['links_scanned'],
+            'total_malicious_blocked': (row[2] or 0) + pending['malicious_links_blocked'],
+            'total_users_warned': (row[3] or 0) + pending['users_warned'],
+            'total_users_banned': (row[4] or 0) + pending['users_banned'],
+            'total_raids_prevented': (row[5] or 0) + pending['raids_prevented']
+        }
     
     # وظائف البلاغات
+    @instrumented
     async def create_report(self, guild_id: int, reporter_id: int, reported_user_id: int, 
                            reason: str, evidence: str = None) -> int:
         """إنشاء بلاغ جديد"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._writer() as db:
             cursor = await db.execute('''
                 INSERT INTO reports (guild_id, reporter_id, reported_user_id, reason, evidence)
                 VALUES (?, ?, ?, ?, ?)
@@ -396,9 +1272,10 @@ class DatabaseManager:
             logger.info(f"📝 تم إنشاء بلاغ جديد #{report_id} في السيرفر {guild_id}")
             return report_id
     
+    @instrumented
     async def get_pending_reports(self, guild_id: int) -> List[Dict[str, Any]]:
         """الحصول على البلاغات المعلقة"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._reader() as db:
             async with db.execute('''
                 SELECT * FROM reports 
                 WHERE guild_id = ? AND status = 'pending'
@@ -409,9 +1286,10 @@ class DatabaseManager:
                 columns = [description[0] for description in cursor.description]
                 return [dict(zip(columns, row)) for row in rows]
     
+    @instrumented
     async def handle_report(self, report_id: int, handler_id: int, action_taken: str):
         """معالجة بلاغ"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._writer() as db:
             await db.execute('''
                 UPDATE reports 
                 SET status = 'handled', handled_by = ?, handled_at = CURRENT_TIMESTAMP, action_taken = ?
@@ -420,23 +1298,35 @@ class DatabaseManager:
             await db.commit()
     
     # وظائف الصيانة
+    @instrumented
     async def cleanup_old_data(self, days: int = 90):
         """تنظيف البيانات القديمة"""
         cutoff_date = datetime.now() - timedelta(days=days)
         
-        async with aiosqlite.connect(self.db_path) as db:
-            # حذف التهديدات القديمة المحلولة
-            await db.execute('''
-                DELETE FROM threats 
-                WHERE timestamp < ? AND status = 'resolved'
-            ''', (cutoff_date,))
+        async with self._writer() as db:
+            # حذف أقسام التهديدات الأقدم من فترة الاحتفاظ بالكامل (DROP بدل DELETE)
+            dropped = await self.threat_partitions.drop_before(db, cutoff_date)
+            if dropped:
+                logger.info(f"🗑️ تم حذف أقسام التهديدات: {', '.join(dropped)}")
             
             # حذف الروابط المفحوصة القديمة
-            await db.execute('''
+            cursor = await db.execute('''
                 DELETE FROM scanned_links 
                 WHERE scan_date < ?
             ''', (cutoff_date,))
             
+            # إعادة بناء المرشح إذا أصبحت معظم مفاتيحه محذوفة
+            if cursor.rowcount and self.scanned_links_filter is not None:
+                async with db.execute('SELECT COUNT(*) FROM scanned_links') as count_cursor:
+                    remaining = (await count_cursor.fetchone())[0]
+                if len(self.scanned_links_filter) > 2 * remaining + Config.LINK_FILTER_CAPACITY:
+                    await self.rebuild_scanned_links_filter(db)
+            
+            # حذف تجميعات الساعة القديمة (التجميع اليومي يبقى للإحصائيات الإجمالية)
+            old_bucket = hour_bucket(cutoff_date)
+            await db.execute('DELETE FROM threat_rollup_hourly WHERE bucket < ?', (old_bucket,))
+            await db.execute('DELETE FROM scan_rollup_hourly WHERE bucket < ?', (old_bucket,))
+            
             # حذف الإحصائيات القديمة
             old_stats_date = datetime.now().date() - timedelta(days=days)
             await db.execute('''
@@ -447,9 +1337,10 @@ class DatabaseManager:
             await db.commit()
             logger.info(f"🧹 تم تنظيف البيانات الأقدم من {days} يوم")
     
+    @instrumented
     async def get_database_stats(self) -> Dict[str, int]:
         """الحصول على إحصائيات قاعدة البيانات"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._reader() as db:
             stats = {}
             
             # عدد السيرفرات
@@ -457,8 +1348,9 @@ class DatabaseManager:
                 stats['guilds'] = (await cursor.fetchone())[0]
             
             # عدد التهديدات
-            async with db.execute('SELECT COUNT(*) FROM threats') as cursor:
-                stats['threats'] = (await cursor.fetchone())[0]
+            async with db.execute('SELECT COUNT(*), COALESCE(SUM(occurrences), 0) FROM threats') as cursor:
+                stats['threats'], stats['threat_occurrences'] = await cursor.fetchone()
+            stats['incidents_merged'] = self.incidents_merged
             
             # عدد الروابط المفحوصة
             async with db.execute('SELECT COUNT(*) FROM scanned_links') as cursor:
@@ -473,20 +1365,21 @@ class DatabaseManager:
                 stats['monitored_users'] = (await cursor.fetchone())[0]
             
             return stats
-
+    
+    @instrumented
+    async def get_all_whitelisted_domains(self) -> Dict[int, List[str]]:
+        """المجالات الآمنة لجميع السيرفرات (guild_id 0 للقائمة العامة)"""
+        whitelists: Dict[int, List[str]] = {}
+        async with self._reader() as db:
+            async with db.execute('SELECT guild_id, domain FROM whitelisted_domains') as cursor:
+                for guild_id, domain in await cursor.fetchall():
+                    whitelists.setdefault(guild_id, []).append(domain)
+        return whitelists
+    
+    @instrumented
     async def get_whitelisted_domains(self, guild_id: int) -> List[str]:
         """الحصول على قائمة المجالات الآمنة للسيرفر"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # إنشاء الجدول إذا لم يكن موجوداً
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS whitelisted_domains (
-                    guild_id INTEGER,
-                    domain TEXT,
-                    added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (guild_id, domain)
-                )
-            ''')
-            
+        async with self._reader() as db:
             # جلب المجالات الآمنة
             async with db.execute('''
                 SELECT domain FROM whitelisted_domains
@@ -496,10 +1389,44 @@ class DatabaseManager:
                 return [row[0] for row in rows]
     
     async def close(self):
-        """إغلاق الاتصال بقاعدة البيانات"""
-        if hasattr(self, 'db') and self.db:
-            await self.db.close()
+        """إغلاق جميع الاتصالات بقاعدة البيانات"""
+        # إيقاف مهمة التفريغ ثم كتابة ما تبقى في الطابور قبل الإغلاق
+        if self._flush_task:
+            task, self._flush_task = self._flush_task, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        
+        if self.db and self.get_pending_writes_count():
+            try:
+                await self.flush_pending_writes()
+            except Exception as e:
+                logger.error(f"❌ فشل تفريغ طابور الكتابة عند الإغلاق: {e}")
+        
+        if self.db and self._pending_stats:
+            try:
+                await self.flush_stats()
+            except Exception as e:
+                logger.error(f"❌ فشل كتابة الإحصائيات عند الإغلاق: {e}")
+        
+        await self.save_scanned_links_filter()
+        
+        readers, self._readers = self._readers, []
+        self._read_pool = None
+        for reader in readers:
+            try:
+                await reader.close()
+            except Exception as e:
+                logger.error(f"خطأ في إغلاق اتصال القراءة: {e}")
+        
+        if self.db:
+            db, self.db = self.db, None
+            await db.close()
             logger.info("🔒 تم إغلاق الاتصال بقاعدة البيانات")
+        
+        self.initialized = False
 
 # إنشاء مثيل وحيد من مدير قاعدة البيانات
 db_manager = DatabaseManager()
@@ -0,0 +1,168 @@
+"""
+Expiry Scheduler - جدولة انتهاء الصلاحية بكومة مواعيد (heap)
+كل عنصر يُسجل موعد انتهائه عند الإضافة، والتنظيف يمر على العناصر المنتهية فقط
+بدل المسح الكامل لكل المفاتيح، ويُوزع على دفعات صغيرة مع إفساح المجال لحلقة الأحداث
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+import weakref
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from core.logger import get_security_logger
+
+logger = get_security_logger()
+
+# إعادة بناء الكومة عندما تتجاوز المواعيد الملغاة هذا الهامش
+COMPACT_SLACK = 1024
+
+# أقل تأجيل عند إعادة الجدولة لتجنب الدوران في نفس الدفعة
+MIN_RESCHEDULE_DELAY = 0.5
+
+class ExpiryGroup:
+    """مجموعة مفاتيح بمعالج انتهاء واحد وكومة مواعيد خاصة بها
+
+    المعالج يستقبل المفتاح ويعيد None عند انتهائه، أو عدد الثواني لإعادة جدولته.
+    إعادة الجدولة أو الإلغاء لا تحذف من الكومة، بل يُتجاهل الموعد القديم عند وصوله.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Hashable], Optional[float]]):
+        self.name = name
+        self.handler = handler
+        self._heap: List[Tuple[float, int, Hashable]] = []  # (الموعد، تسلسل، المفتاح)
+        self._deadlines: Dict[Hashable, float] = {}  # الموعد الحالي لكل مفتاح
+        self._sequence = itertools.count()
+        self.expired = 0
+
+    def schedule(self, key: Hashable, delay: float):
+        """جدولة المفتاح بعد delay ثانية (يستبدل أي موعد سابق)"""
+        self.schedule_at(key, time.monotonic() + delay)
+
+    def schedule_at(self, key: Hashable, deadline: float):
+        """جدولة المفتاح في وقت time.monotonic محدد"""
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._sequence), key))
+
+        if len(self._heap) > 2 * len(self._deadlines) + COMPACT_SLACK:
+            self._compact()
+
+    def cancel(self, key: Hashable):
+        self._deadlines.pop(key, None)
+
+    def clear(self):
+        self._deadlines.clear()
+        self._heap.clear()
+
+    def _compact(self):
+        """إزالة المواعيد الملغاة أو المستبدلة من الكومة"""
+        self._heap = [(deadline, next(self._sequence), key) for key, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def next_deadline(self) -> Optional[float]:
+        """أقرب موعد فعّال أو None"""
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> int:
+        """تنفيذ المعالج للمفاتيح التي حان موعدها، بحد أقصى limit مفتاح"""
+        now = time.monotonic() if now is None else now
+        processed = 0
+
+        while self._heap and (limit is None or processed < limit):
+            deadline, _, key = self._heap[0]
+            if deadline > now:
+                break
+
+            heapq.heappop(self._heap)
+            if self._deadlines.get(key) != deadline:
+                continue  # أُعيدت جدولته أو أُلغي
+
+            del self._deadlines[key]
+            processed += 1
+            try:
+                delay = self.handler(key)
+            except Exception as e:
+                logger.error(f"❌ خطأ في معالج انتهاء الصلاحية {self.name}: {e}")
+                continue
+
+            if delay is not None and key not in self._deadlines:
+                self.schedule(key, max(delay, MIN_RESCHEDULE_DELAY))
+
+        self.expired += processed
+        return processed
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'scheduled': len(self._deadlines),
+            'heap_size': len(self._heap),
+            'expired': self.expired
+        }
+
+class ExpiryScheduler:
+    """مجدول مشترك يمر على مجموعات الانتهاء في الخلفية بدفعات محدودة"""
+
+    def __init__(self, tick: float = 1.0, batch_size: int = 500):
+        self.tick = tick
+        self.batch_size = batch_size
+        self._groups: weakref.WeakSet = weakref.WeakSet()  # المجموعة تعيش ما دام مالكها
+        self._task: Optional[asyncio.Task] = None
+
+    def group(self, name: str, handler: Callable[[Hashable], Optional[float]]) -> ExpiryGroup:
+        """إنشاء مجموعة جديدة مسجلة في المجدول"""
+        group = ExpiryGroup(name, handler)
+        self._groups.add(group)
+        return group
+
+    def run_due(self, limit: Optional[int] = None) -> int:
+        """تنفيذ المواعيد المستحقة في جميع المجموعات"""
+        now = time.monotonic()
+        processed = 0
+        for group in list(self._groups):
+            remaining = None if limit is None else limit - processed
+            if remaining is not None and remaining <= 0:
+                break
+            processed += group.run_due(now, remaining)
+        return processed
+
+    async def _run(self):
+        while True:
+            try:
+                processed = self.run_due(self.batch_size)
+            except Exception as e:
+                logger.error(f"❌ خطأ في مجدول انتهاء الصلاحية: {e}")
+                processed = 0
+
+            # دفعة ممتلئة: متابعة فوراً بعد إفساح المجال للمهام الأخرى
+            await asyncio.sleep(0 if processed >= self.batch_size else self.tick)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("⏲️ تم بدء مجدول انتهاء الصلاحية")
+
+    async def stop(self):
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """عدادات كل مجموعة (تُجمع المجموعات المتشابهة في الاسم)"""
+        stats: Dict[str, Dict[str, Any]] = {}
+        for group in list(self._groups):
+            totals = stats.setdefault(group.name, {'scheduled': 0, 'heap_size': 0, 'expired': 0})
+            for field, value in group.get_stats().items():
+                totals[field] += value
+        return stats
+
+# إنشاء مثيل عام
+expiry_scheduler = ExpiryScheduler()
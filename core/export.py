@@ -0,0 +1,169 @@
+"""
+Streaming Export - تصدير البيانات الأمنية بشكل متدفق
+قراءة الصفوف على دفعات وكتابتها مضغوطة (gzip) بصيغة NDJSON أو CSV خارج حلقة الأحداث
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import json
+import tempfile
+from contextlib import aclosing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from config import Config
+from core.database import DatabaseManager, db_manager
+from core.logger import get_database_logger
+
+logger = get_database_logger()
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+class GzipTextWriter:
+    """ملف نصي مضغوط تُجمع أسطره في الذاكرة ثم تُكتب دفعة واحدة في خيط منفصل"""
+
+    def __init__(self, path: Path, buffer_lines: int = 500):
+        self.path = path
+        self.buffer_lines = buffer_lines
+        self._buffer: List[str] = []
+        self._file = None
+
+    async def open(self):
+        self._file = await asyncio.to_thread(gzip.open, self.path, 'wt', encoding='utf-8', newline='')
+
+    async def write(self, text: str):
+        self._buffer.append(text)
+        if len(self._buffer) >= self.buffer_lines:
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+
+        chunk = ''.join(self._buffer)
+        self._buffer = []
+        await asyncio.to_thread(self._file.write, chunk)
+
+    async def close(self):
+        if self._file is None:
+            return
+
+        try:
+            await self.flush()
+        finally:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+class StreamingExporter:
+    """تصدير بيانات سيرفر لفترة زمنية دون تحميلها كاملة في الذاكرة"""
+
+    def __init__(self, guild_id: int, start_date: datetime, end_date: datetime,
+                 export_format: str = 'ndjson', output_dir: Optional[Path] = None,
+                 database: Optional[DatabaseManager] = None):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"صيغة تصدير غير مدعومة: {export_format}")
+
+        self.guild_id = guild_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.export_format = export_format
+        self.output_dir = Path(output_dir) if output_dir else Path(tempfile.mkdtemp(prefix='security_export_'))
+        self.db = database or db_manager
+
+        self.statistics = {
+            'total_threats': 0,
+            'total_scanned_links': 0,
+            'high_risk_users': 0
+        }
+
+    def _sources(self) -> Dict[str, AsyncIterator[Dict[str, Any]]]:
+        # scanned_links كاش أحكام مشترك بين السيرفرات بلا guild_id، فلا يدخل في تصدير سيرفر
+        return {
+            'threats': self.db.iter_threats_in_period(self.guild_id, self.start_date, self.end_date),
+            'user_danger_scores': self.db.iter_user_scores(self.guild_id)
+        }
+
+    def _count(self, section: str, row: Dict[str, Any]):
+        if section == 'threats':
+            self.statistics['total_threats'] += 1
+        elif row.get('danger_points', 0) >= Config.MAX_DANGER_POINTS * 0.8:
+            self.statistics['high_risk_users'] += 1
+
+    async def export(self, metadata: Optional[Dict[str, Any]] = None) -> List[Path]:
+        """تنفيذ التصدير وإرجاع مسارات الملفات الناتجة"""
+        # التهديدات المنتظرة في الطابور جزء من الفترة المطلوبة
+        await self.db.flush_pending_writes()
+        # عدد روابط السيرفر من تجميع الفحوص الخاص به
+        self.statistics['total_scanned_links'] = await self.db.get_scanned_links_count(
+            self.guild_id, self.start_date, self.end_date
+        )
+
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        prefix = f"security_data_{self.guild_id}_{stamp}"
+
+        if self.export_format == 'ndjson':
+            return [await self._export_ndjson(prefix, metadata or {})]
+        return await self._export_csv(prefix)
+
+    async def _export_ndjson(self, prefix: str, metadata: Dict[str, Any]) -> Path:
+        writer = GzipTextWriter(self.output_dir / f"{prefix}.ndjson.gz", Config.EXPORT_BATCH_SIZE)
+        await writer.open()
+
+        try:
+            header = {
+                'record': 'export',
+                'guild_id': self.guild_id,
+                'export_date': datetime.now().isoformat(),
+                'start_date': self.start_date.isoformat(),
+                'end_date': self.end_date.isoformat(),
+                **metadata
+            }
+            await writer.write(json.dumps(header, ensure_ascii=False) + '\n')
+
+            for section, rows in self._sources().items():
+                async with aclosing(rows):
+                    async for row in rows:
+                        self._count(section, row)
+                        record = {'record': section, **row}
+                        await writer.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+            footer = {'record': 'statistics', **self.statistics}
+            await writer.write(json.dumps(footer, ensure_ascii=False) + '\n')
+        finally:
+            await writer.close()
+
+        return writer.path
+
+    async def _export_csv(self, prefix: str) -> List[Path]:
+        # لكل جدول أعمدته، فيُكتب كل جدول في ملف CSV مستقل
+        paths = []
+
+        for section, rows in self._sources().items():
+            writer = GzipTextWriter(self.output_dir / f"{prefix}_{section}.csv.gz", Config.EXPORT_BATCH_SIZE)
+            await writer.open()
+
+            try:
+                line = io.StringIO()
+                csv_writer = None
+
+                async with aclosing(rows):
+                    async for row in rows:
+                        self._count(section, row)
+
+                        if csv_writer is None:
+                            csv_writer = csv.DictWriter(line, fieldnames=list(row.keys()))
+                            csv_writer.writeheader()
+                        csv_writer.writerow(row)
+
+                        await writer.write(line.getvalue())
+                        line.seek(0)
+                        line.truncate()
+            finally:
+                await writer.close()
+
+            paths.append(writer.path)
+
+        return paths
@@ -0,0 +1,179 @@
+"""
+HTTP Client Hub - عميل HTTP مشترك لجميع التكاملات
+موصل TCP واحد (حدود لكل مضيف، keep-alive، كاش DNS) تتشاركه جلسات بأسماء لكل تكامل
+لكل ملف تعريف مهلته وإحصائياته: الطلبات والأخطاء والزمن وإعادة استخدام الاتصالات
+"""
+
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from config import Config
+from core.logger import get_security_logger
+from core.metrics import Histogram
+
+logger = get_security_logger()
+
+# ترويسات موحدة لكل الجلسات: aiohttp 3.8 يُدخل ترويسات الجلسة في مفتاح مجمع الاتصالات
+# فاختلافها بين الملفات يمنع إعادة استخدام الاتصال نفسه
+DEFAULT_HEADERS = {'User-Agent': 'CyberSentinel-Bot/1.0 Security Scanner'}
+
+class ClientProfile:
+    """إعدادات جلسة تكامل واحد وعداداتها"""
+
+    def __init__(self, name: str, total_timeout: float, connect_timeout: Optional[float] = None):
+        self.name = name
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout)
+
+        self.requests = 0
+        self.errors = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.queued = 0  # طلبات انتظرت اتصالاً فارغاً في المجمع
+        self.dns_hits = 0
+        self.dns_misses = 0
+        self.latency = Histogram()
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """ربط إشارات aiohttp بعدادات هذا الملف"""
+        trace = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+
+        async def on_request_start(session, ctx, params):
+            ctx.started = time.perf_counter()
+
+        async def on_request_end(session, ctx, params):
+            self.requests += 1
+            self.latency.record((time.perf_counter() - ctx.started) * 1000)
+
+        async def on_request_exception(session, ctx, params):
+            self.requests += 1
+            self.errors += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.connections_reused += 1
+
+        async def on_connection_queued_start(session, ctx, params):
+            self.queued += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            self.dns_hits += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            self.dns_misses += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_exception)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_connection_queued_start.append(on_connection_queued_start)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'connections_created': self.connections_created,
+            'connections_reused': self.connections_reused,
+            'queued': self.queued,
+            'dns_hits': self.dns_hits,
+            'dns_misses': self.dns_misses,
+            'timeout': self.timeout.total,
+            'latency_ms': self.latency.snapshot()
+        }
+
+class HttpClientHub:
+    """موصل مشترك وجلسة لكل ملف تعريف، تُنشأ عند أول استخدام"""
+
+    def __init__(self, limit: Optional[int] = None, limit_per_host: Optional[int] = None,
+                 dns_ttl: Optional[int] = None, keepalive: Optional[float] = None):
+        self.limit = Config.HTTP_POOL_LIMIT if limit is None else limit
+        self.limit_per_host = Config.HTTP_LIMIT_PER_HOST if limit_per_host is None else limit_per_host
+        self.dns_ttl = Config.HTTP_DNS_TTL if dns_ttl is None else dns_ttl
+        self.keepalive = Config.HTTP_KEEPALIVE if keepalive is None else keepalive
+
+        self.profiles: Dict[str, ClientProfile] = {}
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    def register(self, name: str, total_timeout: float, connect_timeout: Optional[float] = None) -> ClientProfile:
+        """تعريف ملف تكامل (الجلسة الحالية تُستبدل عند تغيير إعداداته)"""
+        profile = ClientProfile(name, total_timeout, connect_timeout)
+        self.profiles[name] = profile
+        self._sessions.pop(name, None)
+        return profile
+
+    @property
+    def started(self) -> bool:
+        return self._connector is not None and not self._connector.closed
+
+    def start(self):
+        """إنشاء الموصل المشترك (يجب استدعاؤه داخل حلقة asyncio)"""
+        if self.started:
+            return
+
+        self._connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive,
+            enable_cleanup_closed=True
+        )
+        self._sessions = {}
+        logger.info(
+            f"🌐 تم تشغيل عميل HTTP المشترك (حد {self.limit}، {self.limit_per_host} لكل مضيف، DNS {self.dns_ttl}s)"
+        )
+
+    def session(self, name: str) -> aiohttp.ClientSession:
+        """جلسة ملف التعريف على الموصل المشترك"""
+        if not self.started:
+            self.start()
+
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            profile = self.profiles.get(name) or self.register(name, Config.HTTP_DEFAULT_TIMEOUT)
+            session = aiohttp.ClientSession(
+                connector=self._connector,
+                connector_owner=False,
+                timeout=profile.timeout,
+                headers=DEFAULT_HEADERS,
+                trace_configs=[profile.trace_config()]
+            )
+            self._sessions[name] = session
+        return session
+
+    async def close(self):
+        """إغلاق جميع الجلسات ثم الموصل"""
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            await session.close()
+
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+            logger.info("🌐 تم إغلاق عميل HTTP المشترك")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'started': self.started,
+            'limit': self.limit,
+            'limit_per_host': self.limit_per_host,
+            'dns_ttl': self.dns_ttl,
+            'keepalive': self.keepalive,
+            'profiles': {name: profile.get_stats() for name, profile in self.profiles.items()}
+        }
+
+# ملفات التكاملات: المهلة الكلية لكل منها كما كانت في جلساتها المستقلة
+http_hub = HttpClientHub()
+http_hub.register('virustotal', total_timeout=30)
+http_hub.register('threat_intel', total_timeout=30)
+http_hub.register('link_probe', total_timeout=10, connect_timeout=5)
+http_hub.register('downloads', total_timeout=30)
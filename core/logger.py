@@ -101,6 +101,14 @@ def log_security_event(event_type: str, details: dict, level: str = 'WARNING'):
     """دالة مساعدة لتسجيل الأحداث الأمنية"""
     logger.log_security_event(event_type, details, level)
 
+def log_threat_detected(threat_type: str, user_id: int, guild_id: int, details: str = ''):
+    """دالة مساعدة لتسجيل تهديد مكتشف"""
+    logger.log_security_event(threat_type, {
+        'user_id': user_id,
+        'guild_id': guild_id,
+        'details': details
+    })
+
 def setup_logging():
     """إعداد نظام التسجيل العام - للتوافق مع main.py"""
     # إعداد نظام التسجيل الأساسي
@@ -0,0 +1,94 @@
+"""
+Metrics - قياس زمن العمليات باستخدام هيستوجرام محدود الحجم
+دلاء أسية ثابتة: الذاكرة ثابتة مهما زاد عدد القياسات، والنسب المئوية تقريبية بدقة الدلو
+"""
+
+import bisect
+from typing import Any, Dict, List, Optional
+
+def exponential_bounds(start: float, factor: float, count: int) -> List[float]:
+    """حدود دلاء متزايدة أسياً"""
+    bounds = []
+    value = start
+    for _ in range(count):
+        bounds.append(value)
+        value *= factor
+    return bounds
+
+# من 0.01ms حتى ~75 ثانية بزيادة 25% لكل دلو
+LATENCY_BOUNDS_MS = exponential_bounds(0.01, 1.25, 72)
+
+class Histogram:
+    """هيستوجرام بدلاء ثابتة مع العدد والمجموع والحد الأقصى"""
+
+    def __init__(self, bounds: Optional[List[float]] = None):
+        self.bounds = bounds or LATENCY_BOUNDS_MS
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> float:
+        """الحد الأعلى للدلو الذي يبلغ النسبة المطلوبة"""
+        if not self.count:
+            return 0.0
+
+        target = self.count * percent / 100
+        cumulative = 0
+        for index, bucket_count in enumerate(self.buckets):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean': round(self.mean, 3),
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'p99': round(self.percentile(99), 3),
+            'max': round(self.max, 3)
+        }
+
+    def reset(self):
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+class OperationStats:
+    """إحصائيات عملية واحدة: الاستدعاءات والأخطاء والزمن والصفوف وانتظار القفل"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.latency = Histogram()
+        self.lock_wait = Histogram()
+
+    def snapshot(self) -> Dict[str, Any]:
+        latency = self.latency.snapshot()
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'rows': self.rows,
+            'p50_ms': latency['p50'],
+            'p95_ms': latency['p95'],
+            'p99_ms': latency['p99'],
+            'max_ms': latency['max'],
+            'total_ms': round(self.latency.total, 3),
+            'lock_wait_p95_ms': round(self.lock_wait.percentile(95), 3),
+            'lock_wait_total_ms': round(self.lock_wait.total, 3)
+        }
@@ -0,0 +1,261 @@
+"""
+Schema Migrations - ترحيلات مخطط قاعدة البيانات
+تطبيق تغييرات المخطط بالترتيب مع تسجيل الإصدار الحالي في جدول schema_version
+"""
+
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+import aiosqlite
+
+from core.logger import get_database_logger
+from core.partitions import add_incident_columns, partition_existing_threats
+
+logger = get_database_logger()
+
+class Migration:
+    """خطوة ترحيل واحدة: أوامر SQL و/أو دالة غير متزامنة"""
+
+    def __init__(self, version: int, description: str,
+                 statements: Sequence[str] = (),
+                 handler: Optional[Callable[[aiosqlite.Connection], Awaitable[None]]] = None):
+        self.version = version
+        self.description = description
+        self.statements = list(statements)
+        self.handler = handler
+
+    async def apply(self, db: aiosqlite.Connection):
+        """تنفيذ الترحيل على الاتصال المعطى"""
+        for statement in self.statements:
+            await db.execute(statement)
+
+        if self.handler:
+            await self.handler(db)
+
+# الإصدار 1: المخطط الأساسي (آمن على القواعد الموجودة مسبقاً)
+BASE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS guild_settings (
+        guild_id INTEGER PRIMARY KEY,
+        admin_channel_id INTEGER,
+        protection_level INTEGER DEFAULT 2,
+        auto_ban_threshold INTEGER DEFAULT 10,
+        link_scan_enabled BOOLEAN DEFAULT 1,
+        anti_raid_enabled BOOLEAN DEFAULT 1,
+        behavior_monitoring BOOLEAN DEFAULT 1,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS threats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        threat_type TEXT NOT NULL,
+        content TEXT,
+        severity TEXT DEFAULT 'medium',
+        status TEXT DEFAULT 'detected',
+        action_taken TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        resolved_at DATETIME,
+        resolved_by INTEGER
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS scanned_links (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        url_hash TEXT UNIQUE NOT NULL,
+        original_url TEXT NOT NULL,
+        is_malicious BOOLEAN NOT NULL,
+        scan_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+        virustotal_score INTEGER DEFAULT 0,
+        scan_engines TEXT,
+        threat_names TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_danger_scores (
+        user_id INTEGER,
+        guild_id INTEGER,
+        danger_points INTEGER DEFAULT 0,
+        total_warnings INTEGER DEFAULT 0,
+        last_warning DATETIME,
+        last_violation DATETIME,
+        status TEXT DEFAULT 'active',
+        PRIMARY KEY (user_id, guild_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS reports (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        reporter_id INTEGER NOT NULL,
+        reported_user_id INTEGER NOT NULL,
+        reason TEXT NOT NULL,
+        evidence TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        handled_by INTEGER,
+        handled_at DATETIME,
+        action_taken TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS security_stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        stat_date DATE NOT NULL,
+        threats_detected INTEGER DEFAULT 0,
+        links_scanned INTEGER DEFAULT 0,
+        malicious_links_blocked INTEGER DEFAULT 0,
+        users_warned INTEGER DEFAULT 0,
+        users_banned INTEGER DEFAULT 0,
+        raids_prevented INTEGER DEFAULT 0,
+        UNIQUE(guild_id, stat_date)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS whitelisted_domains (
+        guild_id INTEGER,
+        domain TEXT,
+        added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (guild_id, domain)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_threats_guild_user ON threats(guild_id, user_id)',
+    'CREATE INDEX IF NOT EXISTS idx_threats_timestamp ON threats(timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_scanned_links_hash ON scanned_links(url_hash)',
+    'CREATE INDEX IF NOT EXISTS idx_user_scores_guild ON user_danger_scores(guild_id)',
+]
+
+# الإصدار 2: فهارس تغطي استعلامات سجل التهديدات والتقارير وترتيب الخطورة
+HOT_PATH_INDEXES = [
+    # سجل التهديدات والتقارير حسب الفترة: (guild_id, timestamp) مع نوع التهديد لتجنب قراءة الجدول
+    'CREATE INDEX IF NOT EXISTS idx_threats_guild_time ON threats(guild_id, timestamp, threat_type)',
+    # إحصائيات الحالة والخطورة
+    'CREATE INDEX IF NOT EXISTS idx_threats_guild_status ON threats(guild_id, status, severity)',
+    # تهديدات مستخدم محدد مرتبة زمنياً (يغني عن idx_threats_guild_user)
+    'CREATE INDEX IF NOT EXISTS idx_threats_guild_user_time ON threats(guild_id, user_id, timestamp)',
+    'DROP INDEX IF EXISTS idx_threats_guild_user',
+    # ترتيب المستخدمين حسب نقاط الخطر (يغني عن idx_user_scores_guild)
+    'CREATE INDEX IF NOT EXISTS idx_user_scores_risk ON user_danger_scores(guild_id, danger_points DESC, user_id, total_warnings)',
+    'DROP INDEX IF EXISTS idx_user_scores_guild',
+    # البلاغات المعلقة
+    'CREATE INDEX IF NOT EXISTS idx_reports_guild_status ON reports(guild_id, status, created_at)',
+    # مكرر مع فهرس UNIQUE التلقائي على url_hash
+    'DROP INDEX IF EXISTS idx_scanned_links_hash',
+]
+
+# الإصدار 3: ترقيم صفحات سجل التهديدات بالمفتاح (timestamp, id)
+# الفهرس يحمل rowid ضمنياً فيغطي الترتيب دون فرز مؤقت
+KEYSET_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_threats_guild_page ON threats(guild_id, timestamp)',
+]
+
+# الإصدار 5: جداول تجميع بالساعة واليوم للتقارير، مع تعبئتها من التهديدات الحالية
+ROLLUP_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS threat_rollup_hourly (
+        guild_id INTEGER NOT NULL,
+        bucket TEXT NOT NULL,
+        threat_type TEXT NOT NULL,
+        threat_count INTEGER DEFAULT 0,
+        high_count INTEGER DEFAULT 0,
+        PRIMARY KEY (guild_id, bucket, threat_type)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS threat_rollup_daily (
+        guild_id INTEGER NOT NULL,
+        bucket TEXT NOT NULL,
+        threat_type TEXT NOT NULL,
+        threat_count INTEGER DEFAULT 0,
+        high_count INTEGER DEFAULT 0,
+        PRIMARY KEY (guild_id, bucket, threat_type)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS scan_rollup_hourly (
+        guild_id INTEGER NOT NULL,
+        bucket TEXT NOT NULL,
+        links_scanned INTEGER DEFAULT 0,
+        malicious_links INTEGER DEFAULT 0,
+        PRIMARY KEY (guild_id, bucket)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    INSERT OR IGNORE INTO threat_rollup_hourly (guild_id, bucket, threat_type, threat_count, high_count)
+    SELECT guild_id, substr(timestamp, 1, 13) || ':00:00', threat_type,
+           COUNT(*), SUM(CASE WHEN severity = 'high' THEN 1 ELSE 0 END)
+    FROM threats
+    GROUP BY 1, 2, 3
+    ''',
+    '''
+    INSERT OR IGNORE INTO threat_rollup_daily (guild_id, bucket, threat_type, threat_count, high_count)
+    SELECT guild_id, substr(timestamp, 1, 10), threat_type,
+           COUNT(*), SUM(CASE WHEN severity = 'high' THEN 1 ELSE 0 END)
+    FROM threats
+    GROUP BY 1, 2, 3
+    ''',
+]
+
+# الإصدار 6: أحدث الروابط المفحوصة لتسخين الكاش عند البدء، وحذف القديم منها في التنظيف
+SCANNED_LINKS_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_scanned_links_date ON scanned_links(scan_date)',
+]
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'base schema', BASE_SCHEMA),
+    Migration(2, 'hot-path covering indexes', HOT_PATH_INDEXES),
+    Migration(3, 'threat log keyset pagination index', KEYSET_INDEXES),
+    # الإصدار 4: جدول threats يصبح أقساماً شهرية خلف عرض بنفس الاسم
+    Migration(4, 'monthly threat partitions', handler=partition_existing_threats),
+    Migration(5, 'hourly and daily rollup tables', ROLLUP_TABLES),
+    Migration(6, 'scanned links recency index', SCANNED_LINKS_INDEXES),
+    # الإصدار 7: التهديدات المتكررة تُدمج في صف حادثة واحد مع عدد التكرارات
+    Migration(7, 'threat incident counters', handler=add_incident_columns),
+]
+
+async def get_schema_version(db: aiosqlite.Connection) -> int:
+    """الحصول على إصدار المخطط الحالي"""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    async with db.execute('SELECT MAX(version) FROM schema_version') as cursor:
+        row = await cursor.fetchone()
+    return row[0] or 0
+
+async def run_migrations(db: aiosqlite.Connection,
+                         migrations: Optional[List[Migration]] = None) -> int:
+    """تطبيق الترحيلات المتبقية بالترتيب، كل ترحيل في معاملة مستقلة"""
+    migrations = sorted(migrations if migrations is not None else MIGRATIONS, key=lambda m: m.version)
+    current_version = await get_schema_version(db)
+    await db.commit()
+
+    applied = 0
+    for migration in migrations:
+        if migration.version <= current_version:
+            continue
+
+        try:
+            # بدء معاملة صريحة لأن أوامر DDL لا تفتح معاملة تلقائياً
+            await db.execute('BEGIN')
+            await migration.apply(db)
+            await db.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (migration.version, migration.description)
+            )
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"❌ فشل ترحيل المخطط إلى الإصدار {migration.version}: {e}")
+            raise
+
+        applied += 1
+        logger.info(f"🧱 تم ترحيل المخطط إلى الإصدار {migration.version}: {migration.description}")
+
+    return applied
@@ -0,0 +1,164 @@
+"""
+Threat Partitions - تقسيم جدول التهديدات حسب الشهر
+كل شهر في جدول threats_YYYYMM مستقل، و threats عرض (VIEW) يجمعها للاستعلامات العامة
+الحذف القديم يصبح DROP TABLE لشهر كامل بدل DELETE على ملايين الصفوف
+"""
+
+from datetime import datetime
+from typing import List, Optional, Union
+
+import aiosqlite
+
+from core.logger import get_database_logger
+
+logger = get_database_logger()
+
+PARTITION_PREFIX = 'threats_'
+
+THREAT_COLUMNS = '''
+    id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    threat_type TEXT NOT NULL,
+    content TEXT,
+    severity TEXT DEFAULT 'medium',
+    status TEXT DEFAULT 'detected',
+    action_taken TEXT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    resolved_at DATETIME,
+    resolved_by INTEGER,
+    occurrences INTEGER DEFAULT 1,
+    last_seen DATETIME
+'''
+
+# أعمدة جدول threats الموحد قبل التقسيم
+LEGACY_THREAT_COLUMNS = ('id, guild_id, user_id, threat_type, content, severity, status, '
+                         'action_taken, timestamp, resolved_at, resolved_by')
+
+# أعمدة عدّ الحوادث المضافة في الإصدار 7
+INCIDENT_COLUMNS = {
+    'occurrences': 'INTEGER DEFAULT 1',
+    'last_seen': 'DATETIME',
+}
+
+# نفس فهارس جدول threats القديم لكل قسم
+PARTITION_INDEXES = {
+    'time': '(guild_id, timestamp)',
+    'user_time': '(guild_id, user_id, timestamp)',
+    'status': '(guild_id, status, severity)',
+}
+
+def partition_key(value: Union[datetime, str]) -> str:
+    """مفتاح القسم YYYYMM لتاريخ أو نص بتنسيق SQLite"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y%m')
+    return str(value)[:7].replace('-', '')
+
+def partition_name(key: str) -> str:
+    return f"{PARTITION_PREFIX}{key}"
+
+class ThreatPartitions:
+    """إدارة أقسام التهديدات الشهرية على اتصال الكتابة"""
+
+    def __init__(self):
+        self.keys: List[str] = []  # مرتبة تصاعدياً
+
+    async def load(self, db: aiosqlite.Connection):
+        """قراءة الأقسام الموجودة من sqlite_master"""
+        async with db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'threats_[0-9][0-9][0-9][0-9][0-9][0-9]'"
+        ) as cursor:
+            rows = await cursor.fetchall()
+
+        self.keys = sorted(row[0][len(PARTITION_PREFIX):] for row in rows)
+
+    async def create(self, db: aiosqlite.Connection, key: str) -> bool:
+        """إنشاء قسم وفهارسه دون تحديث العرض، True إذا كان جديداً"""
+        if key in self.keys:
+            return False
+
+        name = partition_name(key)
+        await db.execute(f'CREATE TABLE IF NOT EXISTS {name} ({THREAT_COLUMNS})')
+        for suffix, columns in PARTITION_INDEXES.items():
+            await db.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_{suffix} ON {name}{columns}')
+
+        self.keys = sorted(self.keys + [key])
+        logger.info(f"🗂️ تم إنشاء قسم التهديدات {name}")
+        return True
+
+    async def ensure(self, db: aiosqlite.Connection, key: str):
+        """التأكد من وجود القسم وتحديث العرض عند إنشائه"""
+        if await self.create(db, key):
+            await self.rebuild_view(db)
+
+    async def rebuild_view(self, db: aiosqlite.Connection):
+        """إعادة إنشاء عرض threats فوق جميع الأقسام"""
+        if not self.keys:
+            await self.create(db, partition_key(datetime.utcnow()))
+
+        union = ' UNION ALL '.join(f'SELECT * FROM {partition_name(key)}' for key in self.keys)
+        await db.execute('DROP VIEW IF EXISTS threats')
+        await db.execute(f'CREATE VIEW threats AS {union}')
+
+    def names_between(self, start: Optional[Union[datetime, str]] = None,
+                      end: Optional[Union[datetime, str]] = None) -> List[str]:
+        """الأقسام التي تتقاطع مع الفترة، من الأحدث للأقدم (تقليم الأقسام)"""
+        start_key = partition_key(start) if start is not None else None
+        end_key = partition_key(end) if end is not None else None
+
+        return [
+            partition_name(key) for key in reversed(self.keys)
+            if (start_key is None or key >= start_key) and (end_key is None or key <= end_key)
+        ]
+
+    async def drop_before(self, db: aiosqlite.Connection, cutoff: Union[datetime, str]) -> List[str]:
+        """حذف الأقسام التي تقع بالكامل قبل تاريخ القطع"""
+        cutoff_key = partition_key(cutoff)
+        expired = [key for key in self.keys if key < cutoff_key]
+        if not expired:
+            return []
+
+        self.keys = [key for key in self.keys if key >= cutoff_key]
+        await self.rebuild_view(db)
+        for key in expired:
+            await db.execute(f'DROP TABLE IF EXISTS {partition_name(key)}')
+
+        return [partition_name(key) for key in expired]
+
+async def partition_existing_threats(db: aiosqlite.Connection):
+    """ترحيل جدول threats الموحد إلى أقسام شهرية ثم استبداله بالعرض"""
+    partitions = ThreatPartitions()
+
+    async with db.execute(
+        "SELECT DISTINCT substr(timestamp, 1, 7) FROM threats WHERE timestamp IS NOT NULL"
+    ) as cursor:
+        months = [row[0] for row in await cursor.fetchall()]
+
+    for month in months:
+        key = partition_key(month)
+        await partitions.create(db, key)
+        await db.execute(
+            f'INSERT INTO {partition_name(key)} ({LEGACY_THREAT_COLUMNS}) '
+            f'SELECT {LEGACY_THREAT_COLUMNS} FROM threats WHERE substr(timestamp, 1, 7) = ?',
+            (month,)
+        )
+
+    await db.execute('DROP TABLE threats')
+    await partitions.create(db, partition_key(datetime.utcnow()))
+    await partitions.rebuild_view(db)
+
+async def add_incident_columns(db: aiosqlite.Connection):
+    """إضافة أعمدة عدّ الحوادث للأقسام القديمة ليبقى العرض موحد الأعمدة"""
+    partitions = ThreatPartitions()
+    await partitions.load(db)
+
+    for key in partitions.keys:
+        name = partition_name(key)
+        async with db.execute(f'PRAGMA table_info({name})') as cursor:
+            existing = {row[1] for row in await cursor.fetchall()}
+
+        for column, definition in INCIDENT_COLUMNS.items():
+            if column not in existing:
+                await db.execute(f'ALTER TABLE {name} ADD COLUMN {column} {definition}')
+
+    await partitions.rebuild_view(db)
@@ -0,0 +1,230 @@
+"""
+Query Metrics - قياس أداء استعلامات قاعدة البيانات (اختياري)
+يسجل لكل دالة في DatabaseManager ولكل أمر SQL: عدد الاستدعاءات، زمن p50/p95/p99،
+الصفوف المقروءة، وزمن انتظار القفل، مع سجل للاستعلامات البطيئة
+"""
+
+import functools
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import aiosqlite
+
+from core.logger import get_database_logger
+from core.metrics import OperationStats
+
+logger = get_database_logger()
+
+# اسم الدالة الجارية لنسب انتظار القفل إليها
+current_operation: ContextVar[Optional[str]] = ContextVar('current_operation', default=None)
+
+MAX_STATEMENTS = 200
+OTHER_STATEMENTS = '<other>'
+
+_WHITESPACE = re.compile(r'\s+')
+_PARTITION = re.compile(r'\bthreats_\d{6}\b')
+
+def normalize_sql(sql: str) -> str:
+    """توحيد نص الاستعلام: مسافات مفردة وأسماء الأقسام الشهرية كنمط واحد"""
+    return _PARTITION.sub('threats_*', _WHITESPACE.sub(' ', sql).strip())
+
+class DatabaseMetrics:
+    """مخزن القياسات لكل دالة ولكل أمر SQL"""
+
+    def __init__(self, enabled: bool = False, slow_query_ms: float = 100.0, slow_log_size: int = 50):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.methods: Dict[str, OperationStats] = {}
+        self.statements: Dict[str, OperationStats] = {}
+        self.slow_queries: deque = deque(maxlen=slow_log_size)
+        self.started_at = datetime.now()
+
+    def _method(self, name: str) -> OperationStats:
+        stats = self.methods.get(name)
+        if stats is None:
+            stats = self.methods[name] = OperationStats()
+        return stats
+
+    def _statement(self, sql: str) -> OperationStats:
+        key = normalize_sql(sql)
+        stats = self.statements.get(key)
+        if stats is None:
+            # عدد محدود من الأوامر المختلفة لتبقى الذاكرة ثابتة
+            if len(self.statements) >= MAX_STATEMENTS:
+                key = OTHER_STATEMENTS
+                stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = OperationStats()
+        return stats
+
+    def record_method(self, name: str, elapsed_ms: float, rows: Optional[int], failed: bool):
+        stats = self._method(name)
+        stats.calls += 1
+        stats.latency.record(elapsed_ms)
+        if rows:
+            stats.rows += rows
+        if failed:
+            stats.errors += 1
+
+        if elapsed_ms >= self.slow_query_ms:
+            self._log_slow('method', name, elapsed_ms)
+
+    def record_statement(self, sql: str, elapsed_ms: float, failed: bool = False):
+        stats = self._statement(sql)
+        stats.calls += 1
+        stats.latency.record(elapsed_ms)
+        if failed:
+            stats.errors += 1
+
+        if elapsed_ms >= self.slow_query_ms:
+            self._log_slow('statement', normalize_sql(sql)[:200], elapsed_ms)
+
+    def record_statement_rows(self, sql: str, rows: int):
+        self._statement(sql).rows += rows
+
+    def record_lock_wait(self, elapsed_ms: float):
+        name = current_operation.get()
+        if name:
+            self._method(name).lock_wait.record(elapsed_ms)
+
+    def _log_slow(self, kind: str, name: str, elapsed_ms: float):
+        operation = current_operation.get()
+        self.slow_queries.append({
+            'kind': kind,
+            'name': name,
+            'operation': operation,
+            'elapsed_ms': round(elapsed_ms, 3),
+            'at': datetime.now().isoformat()
+        })
+        logger.warning(f"🐢 استعلام بطيء ({kind}) {name} [{operation}]: {elapsed_ms:.1f}ms")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """نسخة من جميع القياسات الحالية"""
+        return {
+            'enabled': self.enabled,
+            'since': self.started_at.isoformat(),
+            'slow_query_ms': self.slow_query_ms,
+            'methods': {name: stats.snapshot() for name, stats in self.methods.items()},
+            'statements': {sql: stats.snapshot() for sql, stats in self.statements.items()},
+            'slow_queries': list(self.slow_queries)
+        }
+
+    def reset(self):
+        self.methods.clear()
+        self.statements.clear()
+        self.slow_queries.clear()
+        self.started_at = datetime.now()
+
+def _count_rows(result: Any) -> Optional[int]:
+    """عدد الصفوف في نتيجة دالة (قائمة، أو صفحة (صفوف، مؤشر)، أو صف واحد)"""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    if isinstance(result, dict):
+        return 1
+    return None
+
+def instrumented(func):
+    """قياس زمن دالة DatabaseManager غير متزامنة عند تفعيل القياس"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if not metrics.enabled:
+            return await func(self, *args, **kwargs)
+
+        token = current_operation.set(name)
+        start = time.perf_counter()
+        result = None
+        failed = False
+        try:
+            result = await func(self, *args, **kwargs)
+            return result
+        except Exception:
+            failed = True
+            raise
+        finally:
+            current_operation.reset(token)
+            metrics.record_method(name, (time.perf_counter() - start) * 1000, _count_rows(result), failed)
+
+    return wrapper
+
+class _CountingCursor:
+    """مؤشر يحسب الصفوف المقروءة لأمر SQL"""
+
+    def __init__(self, cursor: aiosqlite.Cursor, sql: str, metrics: DatabaseMetrics):
+        self._cursor = cursor
+        self._sql = sql
+        self._metrics = metrics
+
+    async def fetchone(self):
+        row = await self._cursor.fetchone()
+        if row is not None:
+            self._metrics.record_statement_rows(self._sql, 1)
+        return row
+
+    async def fetchmany(self, size: Optional[int] = None):
+        rows = await (self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany())
+        self._metrics.record_statement_rows(self._sql, len(rows))
+        return rows
+
+    async def fetchall(self):
+        rows = await self._cursor.fetchall()
+        self._metrics.record_statement_rows(self._sql, len(rows))
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class _TimedStatement:
+    """نتيجة execute قابلة للانتظار أو الاستخدام مع async with مثل aiosqlite"""
+
+    def __init__(self, pending, sql: str, metrics: DatabaseMetrics):
+        self._pending = pending
+        self._sql = sql
+        self._metrics = metrics
+        self._cursor: Optional[_CountingCursor] = None
+
+    async def _run(self) -> _CountingCursor:
+        start = time.perf_counter()
+        try:
+            cursor = await self._pending
+        except Exception:
+            self._metrics.record_statement(self._sql, (time.perf_counter() - start) * 1000, failed=True)
+            raise
+
+        self._metrics.record_statement(self._sql, (time.perf_counter() - start) * 1000)
+        return _CountingCursor(cursor, self._sql, self._metrics)
+
+    def __await__(self):
+        return self._run().__await__()
+
+    async def __aenter__(self) -> _CountingCursor:
+        self._cursor = await self._run()
+        return self._cursor
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._cursor.close()
+
+class InstrumentedConnection:
+    """غلاف لاتصال aiosqlite يقيس execute و executemany ويمرر الباقي كما هو"""
+
+    def __init__(self, db: aiosqlite.Connection, metrics: DatabaseMetrics):
+        self._db = db
+        self._metrics = metrics
+
+    def execute(self, sql: str, parameters=None) -> _TimedStatement:
+        pending = self._db.execute(sql) if parameters is None else self._db.execute(sql, parameters)
+        return _TimedStatement(pending, sql, self._metrics)
+
+    def executemany(self, sql: str, parameters) -> _TimedStatement:
+        return _TimedStatement(self._db.executemany(sql, parameters), sql, self._metrics)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
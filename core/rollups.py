@@ -0,0 +1,42 @@
+"""
+Rollups - أدوات جداول التجميع بالساعة واليوم
+تقسيم الفترات الزمنية إلى دلاء ساعية على الأطراف ودلاء يومية في المنتصف
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple, Union
+
+HOUR_FORMAT = '%Y-%m-%d %H:00:00'
+
+def hour_bucket(value: Union[datetime, str]) -> str:
+    """دلو الساعة لتاريخ أو نص بتنسيق SQLite"""
+    if isinstance(value, datetime):
+        return value.strftime(HOUR_FORMAT)
+    return f"{str(value)[:13]}:00:00"
+
+def day_bucket(hour: str) -> str:
+    """دلو اليوم من دلو الساعة"""
+    return hour[:10]
+
+def split_range(start: datetime, end: datetime) -> Tuple[List[Tuple[str, str]], Optional[Tuple[str, str]]]:
+    """تقسيم الفترة إلى نطاقات ساعية (للأيام الجزئية) ونطاق يومي (للأيام الكاملة)
+
+    جميع النطاقات شاملة الطرفين، والساعة التي تحتوي بداية الفترة تُحسب كاملة.
+    """
+    start_hour = start.replace(minute=0, second=0, microsecond=0)
+    end_hour = end.replace(minute=0, second=0, microsecond=0)
+
+    first_day = start_hour if start_hour.hour == 0 else start_hour.replace(hour=0) + timedelta(days=1)
+    days_end = (end_hour + timedelta(hours=1)).replace(hour=0)  # منتصف الليل الأول بعد آخر يوم كامل
+
+    if first_day >= days_end:
+        return [(hour_bucket(start_hour), hour_bucket(end_hour))], None
+
+    hourly = []
+    if start_hour < first_day:
+        hourly.append((hour_bucket(start_hour), hour_bucket(first_day - timedelta(hours=1))))
+    if days_end <= end_hour:
+        hourly.append((hour_bucket(days_end), hour_bucket(end_hour)))
+
+    daily = (first_day.date().isoformat(), (days_end - timedelta(days=1)).date().isoformat())
+    return hourly, daily
@@ -12,6 +12,7 @@ import aiohttp
 import validators
 
 from config import Config
+from core.http import http_hub
 from core.logger import get_api_logger
 
 logger = get_api_logger()
@@ -101,11 +102,11 @@ class NetworkUtils:
     async def download_file(url: str, timeout: int = 30) -> Optional[bytes]:
         """تحميل ملف من الإنترنت"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=timeout) as response:
-                    if response.status == 200:
-                        return await response.read()
-                    return None
+            session = http_hub.session('downloads')
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status == 200:
+                    return await response.read()
+                return None
         except Exception as e:
             logger.error(f"خطأ في تحميل الملف: {e}")
             return None
@@ -5,6 +5,7 @@ Behavior Watchdog - نظام مراقبة السلوك المشبوه
 
 import asyncio
 import re
+import time
 from datetime import datetime, timedelta
 from collections import defaultdict, deque
 from typing import Dict, List, Optional, Tuple
@@ -13,9 +14,13 @@ import discord
 from config import Config
 from core.logger import get_security_logger
 from core.database import db_manager
+from core.expiry import expiry_scheduler
 
 logger = get_security_logger()
 
+# مدة الاحتفاظ بنشاط المستخدمين والرسائل المكررة في الذاكرة
+DATA_RETENTION_SECONDS = 24 * 3600
+
 class BehaviorWatchdog:
     """نظام مراقبة السلوك المشبوه"""
     
@@ -30,7 +35,11 @@ class BehaviorWatchdog:
         })
         
         # تتبع الرسائل المتطابقة
-        self.duplicate_messages = defaultdict(list)
+        self.duplicate_messages = defaultdict(deque)
+        
+        # انتهاء البيانات بعد DATA_RETENTION_SECONDS عبر المجدول المشترك بدل المسح الكامل
+        self._activity_expiry = expiry_scheduler.group('watchdog:activity', self._expire_activity)
+        self._duplicate_expiry = expiry_scheduler.group('watchdog:duplicates', self._expire_duplicates)
         
         # تتبع الكلمات المفتاحية المشبوهة
         self.suspicious_patterns = [
@@ -136,6 +145,9 @@ class BehaviorWatchdog:
         })
         
         activity['channels'].add(message.channel.id)
+        
+        # النشاط يُحذف بعد مدة الاحتفاظ من آخر رسالة
+        self._activity_expiry.schedule(user_id, DATA_RETENTION_SECONDS)
     
     async def _check_suspicious_keywords(self, message: discord.Message) -> List[Dict]:
         """فحص الكلمات المفتاحية المشبوهة"""
@@ -171,10 +183,14 @@ class BehaviorWatchdog:
         user_id = message.author.id
         
         # إضافة الرسالة للتتبع
-        self.duplicate_messages[content_hash].append({
+        entries = self.duplicate_messages[content_hash]
+        if not entries:
+            self._duplicate_expiry.schedule(content_hash, DATA_RETENTION_SECONDS)
+        entries.append({
             'user_id': user_id,
             'timestamp': message.created_at,
-            'channel_id': message.channel.id
+            'channel_id': message.channel.id,
+            'seen_at': time.monotonic()
         })
         
         # فحص الرسائل المكررة في آخر 10 دقائق
@@ -298,9 +314,9 @@ class BehaviorWatchdog:
         guild_id = message.guild.id if message.guild else None
         user_id = message.author.id
         
-        # تسجيل التهديد
+        # تسجيل التهديد (عبر طابور الكتابة المؤجلة)
         violation_summary = ', '.join([v['type'] for v in violations])
-        await db_manager.add_threat(
+        await db_manager.queue_threat(
             guild_id=guild_id,
             user_id=user_id,
             threat_type='behavior_violation',
@@ -309,7 +325,7 @@ class BehaviorWatchdog:
         )
         
         # إضافة نقاط الخطر
-        await db_manager.add_danger_points(guild_id, user_id, total_points)
+        await db_manager.queue_danger_points(guild_id, user_id, total_points)
         
         logger.warning(
             f"🚨 سلوك مشبوه من المستخدم {user_id} في السيرفر {guild_id}: "
@@ -330,7 +346,7 @@ class BehaviorWatchdog:
             'guild_id': guild_id,
             'danger_points': danger_score.get('danger_points', 0),
             'total_warnings': danger_score.get('total_warnings', 0),
-            'recent_threats': len(recent_threats),
+            'recent_threats': sum(threat.get('occurrences') or 1 for threat in recent_threats),
             'active_channels': len(activity.get('channels', set())),
             'recent_messages': len(activity.get('messages', [])),
             'last_violation': danger_score.get('last_violation'),
@@ -339,39 +355,36 @@ class BehaviorWatchdog:
     
     async def reset_user_score(self, user_id: int, guild_id: int):
         """إعادة تعيين نقاط المستخدم"""
-        await db_manager.add_danger_points(guild_id, user_id, -999)  # إعادة تعيين
+        await db_manager.reset_danger_points(guild_id, user_id)
         
         # مسح النشاط المحلي
         if user_id in self.user_activity:
             del self.user_activity[user_id]
+            self._activity_expiry.cancel(user_id)
         
         logger.info(f"تم إعادة تعيين نقاط المستخدم {user_id} في السيرفر {guild_id}")
     
-    def cleanup_old_data(self):
-        """تنظيف البيانات القديمة من الذاكرة"""
-        cutoff_time = datetime.now() - timedelta(hours=24)
-        
-        # تنظيف الرسائل المكررة
-        for content_hash in list(self.duplicate_messages.keys()):
-            self.duplicate_messages[content_hash] = [
-                msg for msg in self.duplicate_messages[content_hash]
-                if msg['timestamp'] > cutoff_time
-            ]
-            
-            if not self.duplicate_messages[content_hash]:
-                del self.duplicate_messages[content_hash]
-        
-        # تنظيف نشاط المستخدمين
-        for user_id in list(self.user_activity.keys()):
-            activity = self.user_activity[user_id]
-            old_messages = activity['messages']
-            activity['messages'] = deque(
-                [msg for msg in old_messages if msg['timestamp'] > cutoff_time],
-                maxlen=50
-            )
-            
-            if not activity['messages']:
-                del self.user_activity[user_id]
+    def _expire_activity(self, user_id: int) -> None:
+        """معالج المجدول: مرت مدة الاحتفاظ على آخر رسالة للمستخدم"""
+        self.user_activity.pop(user_id, None)
+    
+    def _expire_duplicates(self, content_hash: int) -> Optional[float]:
+        """معالج المجدول: حذف الرسائل المنتهية من بداية القائمة فقط"""
+        entries = self.duplicate_messages.get(content_hash)
+        now = time.monotonic()
+        while entries and entries[0]['seen_at'] + DATA_RETENTION_SECONDS <= now:
+            entries.popleft()
+        
+        if not entries:
+            self.duplicate_messages.pop(content_hash, None)
+            return None
+        
+        # الموعد التالي عند انتهاء أقدم رسالة متبقية
+        return entries[0]['seen_at'] + DATA_RETENTION_SECONDS - now
+    
+    def cleanup_old_data(self) -> int:
+        """تنظيف البيانات القديمة من الذاكرة (المستحقة فقط، والمجدول يتولاها في الخلفية)"""
+        return self._activity_expiry.run_due() + self._duplicate_expiry.run_due()
 
     async def initialize(self):
         """تهيئة نظام مراقبة السلوك"""
@@ -379,6 +392,8 @@ class BehaviorWatchdog:
             # تحميل الإعدادات من قاعدة البيانات
             self.user_activity.clear()
             self.duplicate_messages.clear()
+            self._activity_expiry.clear()
+            self._duplicate_expiry.clear()
             
             # تحميل الأنماط المشبوهة من الملف
             await self._load_suspicious_patterns()
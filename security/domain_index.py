@@ -0,0 +1,143 @@
+"""
+Domain Index - فهرس المجالات بشجرة لاحقات مقلوبة
+يجيب عن "هل هذا المضيف أو أي مجال أب له مدرج؟" بعدد خطوات يساوي عدد أجزاء المضيف
+(cdn.discordapp.com آمن لأن discordapp.com آمن، و evil.malware.com محظور لأن malware.com محظور)
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+
+GLOBAL_GUILD = 0  # نفس اصطلاح whitelisted_domains للقائمة العامة
+
+_END = ''  # علامة نهاية المجال (الأجزاء لا تكون فارغة بعد التطبيع)
+
+def normalize_host(host: str) -> str:
+    """المضيف من netloc: بدون بيانات الدخول والمنفذ والنقطة الأخيرة، وبأحرف صغيرة"""
+    host = host.rsplit('@', 1)[-1].lower()
+    if host.startswith('['):
+        # عنوان IPv6 بين أقواس
+        return host[1:host.find(']')] if ']' in host else host[1:]
+    return host.split(':', 1)[0].strip('.')
+
+class DomainTrie:
+    """مجموعة مجالات مع مطابقة اللواحق، مفتاح كل مستوى جزء من المجال من اليمين"""
+
+    def __init__(self, domains: Iterable[str] = ()):
+        self._root: Dict[str, Dict] = {}
+        self._count = 0
+        for domain in domains:
+            self.add(domain)
+
+    @staticmethod
+    def _labels(domain: str):
+        return reversed([label for label in normalize_host(domain).split('.') if label])
+
+    def add(self, domain: str) -> bool:
+        """إضافة مجال، و False إذا كان موجوداً أو فارغاً"""
+        node = self._root
+        empty = True
+        for label in self._labels(domain):
+            node = node.setdefault(label, {})
+            empty = False
+
+        if empty or _END in node:
+            return False
+        node[_END] = normalize_host(domain)
+        self._count += 1
+        return True
+
+    def discard(self, domain: str) -> bool:
+        """حذف مجال وتقليم الفروع الفارغة"""
+        path = [self._root]
+        for label in self._labels(domain):
+            node = path[-1].get(label)
+            if node is None:
+                return False
+            path.append(node)
+
+        if len(path) == 1 or _END not in path[-1]:
+            return False
+        del path[-1][_END]
+        self._count -= 1
+
+        labels = list(self._labels(domain))
+        for depth in range(len(labels), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][labels[depth - 1]]
+        return True
+
+    def match(self, host: str) -> Optional[str]:
+        """أعم مجال مدرج يطابق المضيف أو أحد آبائه، أو None"""
+        node = self._root
+        for label in self._labels(host):
+            node = node.get(label)
+            if node is None:
+                return None
+            if _END in node:
+                return node[_END]
+        return None
+
+    def __contains__(self, domain: str) -> bool:
+        node = self._root
+        for label in self._labels(domain):
+            node = node.get(label)
+            if node is None:
+                return False
+        return node is not self._root and _END in node
+
+    def __len__(self) -> int:
+        return self._count
+
+class DomainIndex:
+    """قوائم المجالات (safe, whitelist, blacklist) العامة وطبقات كل سيرفر فوقها"""
+
+    def __init__(self):
+        self._tries: Dict[Tuple[str, int], DomainTrie] = {}
+
+    def _trie(self, kind: str, guild_id: int) -> DomainTrie:
+        key = (kind, guild_id)
+        if key not in self._tries:
+            self._tries[key] = DomainTrie()
+        return self._tries[key]
+
+    def add(self, kind: str, domain: str, guild_id: int = GLOBAL_GUILD) -> bool:
+        return self._trie(kind, guild_id).add(domain)
+
+    def discard(self, kind: str, domain: str, guild_id: int = GLOBAL_GUILD) -> bool:
+        trie = self._tries.get((kind, guild_id))
+        return trie is not None and trie.discard(domain)
+
+    def replace(self, kind: str, domains: Iterable[str], guild_id: int = GLOBAL_GUILD):
+        """استبدال قائمة كاملة (عند التحميل من القاعدة)"""
+        self._tries[(kind, guild_id)] = DomainTrie(domains)
+
+    def match(self, kind: str, host: str, guild_id: Optional[int] = None) -> Optional[str]:
+        """المجال المدرج المطابق في القائمة العامة ثم في طبقة السيرفر"""
+        trie = self._tries.get((kind, GLOBAL_GUILD))
+        matched = trie.match(host) if trie is not None else None
+        if matched is None and guild_id not in (None, GLOBAL_GUILD):
+            overlay = self._tries.get((kind, guild_id))
+            matched = overlay.match(host) if overlay is not None else None
+        return matched
+
+    def match_overlay(self, kind: str, host: str, guild_id: Optional[int]) -> Optional[str]:
+        """المطابقة في طبقة السيرفر فقط، و None إذا طابقت القائمة العامة (قرار خاص بالسيرفر لا يُعمم)"""
+        if guild_id in (None, GLOBAL_GUILD) or self.match(kind, host) is not None:
+            return None
+        overlay = self._tries.get((kind, guild_id))
+        return overlay.match(host) if overlay is not None else None
+
+    def count(self, kind: str, guild_id: Optional[int] = None) -> int:
+        """عدد المجالات في قائمة (أو في جميع طبقاتها إذا لم يُحدد السيرفر)"""
+        return sum(
+            len(trie) for (trie_kind, trie_guild), trie in self._tries.items()
+            if trie_kind == kind and (guild_id is None or trie_guild == guild_id)
+        )
+
+    def get_stats(self) -> Dict[str, int]:
+        stats: Dict[str, int] = {}
+        for (kind, guild_id), trie in self._tries.items():
+            stats[kind] = stats.get(kind, 0) + len(trie)
+            if guild_id != GLOBAL_GUILD:
+                stats[f'{kind}_overlays'] = stats.get(f'{kind}_overlays', 0) + 1
+        return stats
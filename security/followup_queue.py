@@ -0,0 +1,109 @@
+"""
+Follow-up Queue - طابور الأحكام البعيدة للروابط بعد الحكم السريع
+الرسالة تُعالج فوراً بالحكم المحلي، ثم يُفحص الرابط هنا عبر الشبكة (VirusTotal ومحتوى الرابط)
+ويُبلّغ كل من ينتظره بالنتيجة النهائية ليحذف الرسالة أو يعاقب المستخدم إن لزم
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core.logger import get_security_logger
+
+logger = get_security_logger()
+
+Waiter = Callable[[Dict], Awaitable[Any]]
+
+class FollowUpQueue:
+    """طابور محدود: الرابط نفسه يُفحص مرة واحدة ويُبلّغ جميع منتظريه"""
+
+    def __init__(self, resolve: Callable[[str, str], Awaitable[Dict]], max_size: int = 100,
+                 workers: int = 2, max_waiters: int = 20):
+        self._resolve = resolve
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._waiters: Dict[str, List[Waiter]] = {}
+        self._worker_count = workers
+        self._workers: List[asyncio.Task] = []
+        self.max_waiters = max_waiters
+
+        self.enqueued = 0
+        self.attached = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, url_hash: str, url: str, waiter: Waiter) -> bool:
+        """جدولة حكم بعيد للرابط، و False إذا لم يُقبل (الطابور أو المنتظرون ممتلئون)"""
+        waiters = self._waiters.get(url_hash)
+        if waiters is not None:
+            # الرابط في الطابور أو قيد الفحص: يكفي انتظار النتيجة نفسها
+            if len(waiters) >= self.max_waiters:
+                self.dropped += 1
+                return False
+            waiters.append(waiter)
+            self.attached += 1
+            return True
+
+        try:
+            self._queue.put_nowait((url_hash, url))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+        self._waiters[url_hash] = [waiter]
+        self.enqueued += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            url_hash, url = await self._queue.get()
+            try:
+                try:
+                    result = await self._resolve(url_hash, url)
+                    self.completed += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning(f"⚠️ فشل الحكم البعيد على الرابط {url[:50]}: {e}")
+                    continue
+
+                # المنتظرون الذين وصلوا أثناء الفحص يُبلّغون بالنتيجة نفسها
+                for waiter in self._waiters.pop(url_hash, []):
+                    try:
+                        await waiter(result)
+                    except Exception as e:
+                        logger.error(f"❌ خطأ في معالجة الحكم البعيد للرابط {url[:50]}: {e}")
+            finally:
+                self._waiters.pop(url_hash, None)
+                self._queue.task_done()
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self._worker_count)]
+
+    async def join(self):
+        """انتظار انتهاء جميع العناصر الحالية"""
+        await self._queue.join()
+
+    async def stop(self):
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        for worker in workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def get_stats(self) -> Dict[str, Optional[int]]:
+        return {
+            'queued': self._queue.qsize(),
+            'pending': len(self._waiters),
+            'waiters': sum(len(waiters) for waiters in self._waiters.values()),
+            'enqueued': self.enqueued,
+            'attached': self.attached,
+            'completed': self.completed,
+            'failed': self.failed,
+            'dropped': self.dropped
+        }
@@ -6,38 +6,81 @@ Link Guardian System
 import asyncio
 import hashlib
 import re
-from typing import Dict, List, Optional, Tuple
+from contextlib import aclosing
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from urllib.parse import urlparse
-import aiohttp
 import validators
 
 from config import Config
 from core.logger import get_security_logger
 from core.database import db_manager
+from core.cache import cache_manager
+from core.http import http_hub
 from api.virustotal import VirusTotalAPI
+from security.followup_queue import FollowUpQueue
+from security.rescan_queue import RescanQueue
+from security.domain_index import GLOBAL_GUILD, DomainIndex, normalize_host
+from security.url_rules import UrlRuleEngine
 
 logger = get_security_logger()
 
+URL_SCAN_CACHE = 'url_scan'
+
+# مدة صلاحية النتيجة حسب الحكم: "آمن" قد يتغير قريباً، و"خبيث" نادراً ما يصبح آمناً
+VERDICT_TTLS = {
+    'safe': Config.LINK_TTL_SAFE,
+    'malicious': Config.LINK_TTL_MALICIOUS,
+    'unknown': Config.LINK_TTL_UNKNOWN
+}
+
+# وزن كل مرحلة فحص في الثقة: نسبة الأدلة التي اكتملت من مجموع الأدلة الممكنة
+STAGE_WEIGHTS = {
+    'basic': 0.15,
+    'patterns': 0.1,
+    'virustotal': 0.5,
+    'content': 0.25
+}
+
 class LinkGuardian:
     """نظام حماية الروابط المتقدم"""
     
     def __init__(self, api_key=None):
         self.vt_api = VirusTotalAPI(api_key) if api_key else VirusTotalAPI()
-        self.url_cache = {}  # كاش للروابط المفحوصة
-        self.whitelist = set()  # قائمة الروابط الآمنة
-        self.blacklist = set()  # قائمة الروابط الخطيرة
-        
-        # أنماط الروابط المشبوهة
-        self.suspicious_patterns = [
-            r'bit\.ly',
-            r'tinyurl\.com',
-            r'discord\.gift',
-            r'discordapp\.gift',
-            r'free.*nitro',
-            r'steam.*community.*gift',
-            r'[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+',  # IP addresses
-            r'[a-z0-9]{8,}\.tk|ml|ga|cf',  # Suspicious TLDs
-        ]
+        # القوائم البيضاء والسوداء والمجالات الآمنة مع طبقة لكل سيرفر (مطابقة المجالات الأب)
+        self.domains = DomainIndex()
+        self._loaded_guilds: Set[int] = set()  # سيرفرات حُملت قوائمها البيضاء من القاعدة
+        
+        # إعادة فحص الروابط الشائعة قبل انتهاء صلاحية نتيجتها
+        self.rescan_queue = RescanQueue(self._rescan, Config.LINK_RESCAN_QUEUE_SIZE)
+        self._refresh_hits: Dict[str, int] = {}  # طلبات كل رابط داخل نافذة التحديث
+        
+        # الأحكام البعيدة للروابط التي صدر لها حكم سريع مؤقت
+        self.followups = FollowUpQueue(
+            self._resolve_followup,
+            max_size=Config.LINK_FOLLOWUP_QUEUE_SIZE,
+            workers=Config.LINK_FOLLOWUP_WORKERS,
+            max_waiters=Config.LINK_FOLLOWUP_MAX_WAITERS
+        )
+        self.followup_fallbacks = 0  # روابط فُحصت مباشرة لأن الطابور رفضها
+        
+        # تسخين الكاش عند البدء
+        self.warmup_task: Optional[asyncio.Task] = None
+        self.warmup_progress = {'state': 'pending', 'loaded': 0, 'skipped': 0, 'total': 0,
+                                'started_at': None, 'finished_at': None}
+        
+        # أنماط الروابط المشبوهة (الاسم -> النمط)، تُترجم في محرك واحد عند التهيئة
+        self.suspicious_patterns = {
+            'bit.ly': r'bit\.ly',
+            'tinyurl.com': r'tinyurl\.com',
+            'discord.gift': r'discord\.gift',
+            'discordapp.gift': r'discordapp\.gift',
+            'free_nitro': r'free.*nitro',
+            'steam_gift': r'steam.*community.*gift',
+            'ip_address': r'[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+',  # IP addresses
+            'suspicious_tld': r'//(?:[^/@]*@)?(?:[a-z0-9-]+\.)*[a-z0-9]{8,}\.(?:tk|ml|ga|cf)(?:[/:?#]|$)',  # Suspicious TLDs
+        }
+        self.url_rules = UrlRuleEngine()
         
         # مجالات آمنة معروفة
         self.safe_domains = {
@@ -46,6 +89,7 @@ class LinkGuardian:
             'google.com', 'stackoverflow.com',
             'wikipedia.org', 'reddit.com'
         }
+        self.domains.replace('safe', self.safe_domains)
     
     async def scan_url(self, url: str, guild_id: int) -> Dict:
         """فحص رابط شامل"""
@@ -54,61 +98,212 @@ class LinkGuardian:
             cleaned_url = self._clean_url(url)
             url_hash = self._hash_url(cleaned_url)
             
-            # التحقق من الكاش أولاً
-            cached_result = await self._check_cache(url_hash)
-            if cached_result:
-                logger.info(f"🔍 استخدام نتيجة محفوظة للرابط: {cleaned_url[:50]}...")
-                return cached_result
+            known_result = await self._lookup_known(cleaned_url, url_hash, guild_id)
+            if known_result:
+                return known_result
             
-            # بدء الفحص
-            scan_result = {
-                'url': cleaned_url,
-                'is_safe': True,
-                'threat_level': 'safe',
-                'threats': [],
-                'scan_engines': [],
-                'confidence': 0.0,
-                'details': {}
-            }
+            return await self._scan_fresh(cleaned_url, url_hash)
             
-            # 1. فحص أساسي للرابط
-            basic_check = await self._basic_url_check(cleaned_url)
-            scan_result.update(basic_check)
+        except Exception as e:
+            logger.error(f"❌ خطأ في فحص الرابط {url}: {e}")
+            return {
+                'url': url,
+                'is_safe': False,
+                'threat_level': 'unknown',
+                'threats': ['scan_error'],
+                'is_malicious': False,
+                'error': str(e)
+            }
+    
+    async def quick_verdict(self, url: str, guild_id: int,
+                            on_final: Optional[Callable[[Dict], Awaitable]] = None) -> Dict:
+        """حكم سريع دون الشبكة: القائمة البيضاء والكاش والفحوص المحلية
+        
+        إذا لم يكن الحكم المحلي نهائياً تُعاد نتيجة مؤقتة (provisional) ويُجدول الفحص
+        البعيد في طابور المتابعة، ثم يُستدعى on_final بالنتيجة النهائية. إذا رفض الطابور
+        الرابط يُفحص مباشرة بمهلة LINK_FOLLOWUP_FALLBACK_TIMEOUT وتُعاد النتيجة النهائية.
+        """
+        try:
+            cleaned_url = self._clean_url(url)
+            url_hash = self._hash_url(cleaned_url)
             
-            # 2. فحص الأنماط المشبوهة
-            pattern_check = self._check_suspicious_patterns(cleaned_url)
-            if pattern_check['is_suspicious']:
-                scan_result['is_safe'] = False
-                scan_result['threat_level'] = 'medium'
-                scan_result['threats'].extend(pattern_check['threats'])
+            known_result = await self._lookup_known(cleaned_url, url_hash, guild_id)
+            if known_result:
+                return known_result
             
-            # 3. فحص VirusTotal (إذا كان متاح)
-            if Config.VIRUSTOTAL_API_KEY:
-                vt_result = await self.vt_api.scan_url(cleaned_url)
-                if vt_result:
-                    scan_result = self._merge_vt_results(scan_result, vt_result)
+            scan_result, definitive = await self._local_stage(cleaned_url)
+            if definitive:
+                await self._save_scan_result(url_hash, scan_result)
+                return scan_result
             
-            # 4. فحص إضافي للمحتوى
-            content_check = await self._check_url_content(cleaned_url)
-            if content_check:
-                scan_result = self._merge_content_results(scan_result, content_check)
+            if on_final is None or self.followups.submit(url_hash, cleaned_url, on_final):
+                scan_result['provisional'] = True
+                scan_result['followup'] = on_final is not None
+                return scan_result
             
-            # حفظ النتيجة في قاعدة البيانات
+            # الطابور ممتلئ: فحص بعيد مباشر بمهلة قصيرة بدل أن يصبح الحكم المؤقت نهائياً
+            self.followup_fallbacks += 1
+            logger.warning(
+                f"⚠️ طابور المتابعة ممتلئ ({self.followups.dropped} مرفوض) - "
+                f"فحص مباشر للرابط {cleaned_url[:50]}"
+            )
+            scan_result = await self._network_stage(scan_result, Config.LINK_FOLLOWUP_FALLBACK_TIMEOUT)
             await self._save_scan_result(url_hash, scan_result)
-            
-            logger.info(f"🔍 تم فحص الرابط: {cleaned_url[:50]}... - النتيجة: {scan_result['threat_level']}")
+            scan_result['followup'] = False
             return scan_result
             
         except Exception as e:
-            logger.error(f"❌ خطأ في فحص الرابط {url}: {e}")
+            logger.error(f"❌ خطأ في الحكم السريع على الرابط {url}: {e}")
             return {
                 'url': url,
                 'is_safe': False,
                 'threat_level': 'unknown',
                 'threats': ['scan_error'],
+                'is_malicious': False,
                 'error': str(e)
             }
     
+    async def _lookup_known(self, cleaned_url: str, url_hash: str, guild_id: Optional[int]) -> Optional[Dict]:
+        """نتيجة معروفة دون فحص: مجال موثوق في السيرفر أو محظور فيه أو نتيجة محفوظة"""
+        await self._ensure_guild_lists(guild_id)
+        
+        # المجالات الموثوقة في هذا السيرفر لا تُفحص
+        domain = normalize_host(urlparse(cleaned_url).netloc)
+        if self.is_whitelisted(domain, guild_id):
+            return {
+                'url': cleaned_url,
+                'is_safe': True,
+                'threat_level': 'safe',
+                'threats': [],
+                'is_malicious': False,
+                'whitelisted': True
+            }
+        
+        # حظر خاص بالسيرفر يسبق الكاش العام ولا يُحفظ فيه
+        if self.domains.match_overlay('blacklist', domain, guild_id):
+            scan_result, _ = await self._local_stage(cleaned_url, guild_id)
+            return scan_result
+        
+        # التحقق من الكاش أولاً
+        cached_result = await self._check_cache(url_hash)
+        if cached_result:
+            logger.info(f"🔍 استخدام نتيجة محفوظة للرابط: {cleaned_url[:50]}...")
+        return cached_result
+    
+    async def _scan_fresh(self, cleaned_url: str, url_hash: str, deadline: Optional[float] = None) -> Dict:
+        """فحص كامل دون الكاش وحفظ النتيجة
+        
+        المرحلة 1 محلية وتنتهي فوراً عند قائمة سوداء أو مجال آمن، والمرحلة 2 تشغّل
+        فحوص الشبكة معاً تحت مهلة واحدة وتدمج ما اكتمل منها.
+        """
+        scan_result, definitive = await self._local_stage(cleaned_url)
+        if not definitive:
+            scan_result = await self._network_stage(scan_result, deadline)
+        
+        # حفظ النتيجة في قاعدة البيانات
+        await self._save_scan_result(url_hash, scan_result)
+        
+        logger.info(
+            f"🔍 تم فحص الرابط: {cleaned_url[:50]}... - النتيجة: {scan_result['threat_level']} "
+            f"(ثقة {scan_result['confidence']:.2f})"
+        )
+        return scan_result
+    
+    async def _local_stage(self, cleaned_url: str, guild_id: Optional[int] = None) -> Tuple[Dict, bool]:
+        """الفحوص المحلية الرخيصة، و True إذا كان الحكم نهائياً دون الشبكة"""
+        # بدء الفحص
+        scan_result = {
+            'url': cleaned_url,
+            'is_safe': True,
+            'threat_level': 'safe',
+            'threats': [],
+            'scan_engines': [],
+            'confidence': 0.0,
+            'details': {'stages': {}}
+        }
+        stages = scan_result['details']['stages']
+        
+        # 1. فحص أساسي للرابط
+        basic_check = await self._basic_url_check(cleaned_url, guild_id)
+        listed = basic_check.pop('listed', None)
+        scan_result.update(basic_check)
+        stages['basic'] = 'ok'
+        
+        # 2. فحص الأنماط المشبوهة
+        pattern_check = self._check_suspicious_patterns(cleaned_url)
+        if pattern_check['is_suspicious']:
+            scan_result['is_safe'] = False
+            scan_result['threat_level'] = 'medium'
+            scan_result['threats'].extend(pattern_check['threats'])
+        stages['patterns'] = 'ok'
+        
+        # حكم نهائي محلياً: لا حاجة للشبكة
+        definitive = (
+            listed == 'blacklist'
+            or 'invalid_url' in scan_result['threats']
+            or (listed == 'safe' and not pattern_check['is_suspicious'])
+        )
+        scan_result['confidence'] = 1.0 if definitive else self._confidence(stages)
+        scan_result['is_malicious'] = self.is_confirmed_threat(scan_result)
+        return scan_result, definitive
+    
+    async def _network_stage(self, scan_result: Dict, deadline: Optional[float] = None) -> Dict:
+        """فحوص الشبكة بالتوازي: VirusTotal (إذا كان متاح) ومحتوى الرابط"""
+        cleaned_url = scan_result['url']
+        stages = scan_result['details']['stages']
+        
+        deadline = Config.LINK_SCAN_TIMEOUT if deadline is None else deadline
+        network = {'content': self._check_url_content(cleaned_url)}
+        if Config.VIRUSTOTAL_API_KEY:
+            # انتظار تقرير VirusTotal لا يتجاوز مهلة المراحل
+            network['virustotal'] = self.vt_api.scan_url(cleaned_url, budget=deadline)
+        
+        results = await self._run_network_stages(network, deadline)
+        for name, (status, value) in results.items():
+            stages[name] = status
+        if stages.get('virustotal') == 'ok' and not results['virustotal'][1].get('scan_engines'):
+            # الفحص أُرسل ولم تكتمل نتيجته قبل المهلة
+            stages['virustotal'] = 'pending'
+        
+        if results.get('virustotal', (None, None))[1]:
+            scan_result = self._merge_vt_results(scan_result, results['virustotal'][1])
+        if results['content'][1]:
+            scan_result = self._merge_content_results(scan_result, results['content'][1])
+        
+        scan_result['confidence'] = max(scan_result['confidence'], self._confidence(stages))
+        scan_result['details']['partial'] = any(status != 'ok' for status in stages.values())
+        scan_result['is_malicious'] = self.is_confirmed_threat(scan_result)
+        return scan_result
+    
+    async def _run_network_stages(self, stages: Dict[str, Awaitable], deadline: Optional[float] = None
+                                  ) -> Dict[str, Tuple[str, Optional[Dict]]]:
+        """تشغيل مراحل الشبكة معاً وإلغاء ما لم ينتهِ قبل المهلة: الاسم -> (الحالة، النتيجة)"""
+        deadline = Config.LINK_SCAN_TIMEOUT if deadline is None else deadline
+        tasks = {name: asyncio.ensure_future(stage) for name, stage in stages.items()}
+        
+        done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        
+        results: Dict[str, Tuple[str, Optional[Dict]]] = {}
+        for name, task in tasks.items():
+            if task in pending:
+                results[name] = ('timeout', None)
+            elif task.exception() is not None:
+                logger.debug(f"فشل مرحلة الفحص {name}: {task.exception()}")
+                results[name] = ('error', None)
+            else:
+                value = task.result()
+                results[name] = ('ok' if value is not None else 'unavailable', value)
+        return results
+    
+    @staticmethod
+    def _confidence(stages: Dict[str, str]) -> float:
+        """نسبة أوزان المراحل المكتملة من مجموع الأوزان"""
+        completed = sum(STAGE_WEIGHTS.get(name, 0) for name, status in stages.items() if status == 'ok')
+        return round(completed / sum(STAGE_WEIGHTS.values()), 2)
+    
     def _clean_url(self, url: str) -> str:
         """تنظيف وتطبيع الرابط"""
         # إزالة المسافات والأحرف الخاصة
@@ -130,29 +325,111 @@ class LinkGuardian:
     
     async def _check_cache(self, url_hash: str) -> Optional[Dict]:
         """التحقق من الكاش"""
-        # التحقق من الكاش المحلي
-        if url_hash in self.url_cache:
-            return self.url_cache[url_hash]
+        # التحقق من الكاش المحلي (لا يعيد نتيجة منتهية الصلاحية)
+        cached = await cache_manager.get(URL_SCAN_CACHE, url_hash)
+        if cached is not None:
+            self._note_hit(url_hash, cached)
+            return cached
         
         # التحقق من قاعدة البيانات
         db_result = await db_manager.get_scanned_link(url_hash)
         if db_result:
-            # تحويل نتيجة قاعدة البيانات إلى تنسيق مناسب
-            result = {
-                'url': db_result['original_url'],
-                'is_safe': not db_result['is_malicious'],
-                'threat_level': 'high' if db_result['is_malicious'] else 'safe',
-                'virustotal_score': db_result['virustotal_score'],
-                'cached': True
-            }
+            result, remaining = self._result_from_row(db_result)
             
-            # حفظ في الكاش المحلي
-            self.url_cache[url_hash] = result
+            # النتيجة الأقدم من مدة صلاحية حكمها تُعامل كغير موجودة ويُعاد الفحص
+            if remaining <= 0:
+                return None
+            
+            # حفظ في الكاش المحلي للمدة المتبقية فقط
+            await cache_manager.set(URL_SCAN_CACHE, url_hash, result, ttl=remaining)
             return result
         
         return None
     
-    async def _basic_url_check(self, url: str) -> Dict:
+    def _result_from_row(self, db_result: Dict) -> Tuple[Dict, float]:
+        """تحويل صف scanned_links إلى نتيجة فحص مع الثواني المتبقية من صلاحيتها"""
+        threats = [name for name in (db_result.get('threat_names') or '').split(',') if name]
+        result = {
+            'url': db_result['original_url'],
+            'is_safe': not db_result['is_malicious'],
+            'threat_level': 'medium' if db_result['is_malicious'] else 'safe',
+            'threats': threats,
+            'virustotal_score': db_result['virustotal_score'] or 0,
+            'cached': True
+        }
+        # الصفوف القديمة سجلت أي نتيجة مشبوهة كخبيثة: الدليل وحده يجعلها مؤكدة
+        if db_result['is_malicious'] and self.is_confirmed_threat(result):
+            result['threat_level'] = 'high'
+        result['is_malicious'] = self.is_confirmed_threat(result)
+        return result, self._verdict_ttl(result) - self._scan_age(db_result.get('scan_date'))
+    
+    @staticmethod
+    def is_confirmed_threat(scan_result: Dict) -> bool:
+        """تهديد مؤكد يبرر حذف الرسالة: قائمة سوداء أو كشف VirusTotal أو مستوى high
+        
+        النتائج المشبوهة بالأنماط أو بفحص المحتوى (إعادة توجيه، مهلة) تُسجل فقط.
+        """
+        if scan_result.get('threat_level') == 'high':
+            return True
+        if 'blacklisted_domain' in scan_result.get('threats', []):
+            return True
+        virustotal = scan_result.get('details', {}).get('virustotal') or {}
+        positives = virustotal.get('positive_detections') or scan_result.get('virustotal_score') or 0
+        return positives > 0
+    
+    def _verdict(self, scan_result: Dict) -> str:
+        """تصنيف النتيجة لاختيار مدة صلاحيتها"""
+        if scan_result.get('threat_level') == 'unknown' or 'scan_error' in scan_result.get('threats', []):
+            return 'unknown'
+        # فحوص لم تكتمل (مهلة أو تقرير VirusTotal معلق): لا يُوثق بالرابط إلا بدليل مؤكد
+        if scan_result.get('details', {}).get('partial') and not scan_result.get('is_malicious'):
+            return 'unknown'
+        return 'safe' if scan_result.get('is_safe', False) else 'malicious'
+    
+    def _verdict_ttl(self, scan_result: Dict) -> float:
+        return VERDICT_TTLS[self._verdict(scan_result)]
+    
+    def _scan_age(self, scan_date: Optional[str]) -> float:
+        """عمر نتيجة scanned_links بالثواني (scan_date بتوقيت UTC من SQLite)"""
+        if not scan_date:
+            return float('inf')
+        try:
+            scanned_at = datetime.strptime(str(scan_date)[:19], '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return float('inf')
+        return (datetime.utcnow() - scanned_at).total_seconds()
+    
+    def _note_hit(self, url_hash: str, result: Dict):
+        """جدولة إعادة فحص الرابط إذا طُلب عدة مرات قرب انتهاء صلاحية نتيجته"""
+        remaining = cache_manager.remaining_ttl(URL_SCAN_CACHE, url_hash)
+        if remaining is None or remaining > self._verdict_ttl(result) * Config.LINK_RESCAN_WINDOW:
+            return
+        
+        hits = self._refresh_hits.get(url_hash, 0) + 1
+        if hits < Config.LINK_RESCAN_MIN_HITS:
+            if len(self._refresh_hits) >= Config.LINK_RESCAN_QUEUE_SIZE * 50:
+                # روابط لم تُطلب مجدداً - لا داعي لتتبعها
+                self._refresh_hits.clear()
+            self._refresh_hits[url_hash] = hits
+            return
+        
+        self._refresh_hits.pop(url_hash, None)
+        if result.get('url'):
+            self.rescan_queue.submit(url_hash, result['url'])
+    
+    async def _resolve_followup(self, url_hash: str, url: str) -> Dict:
+        """عامل طابور المتابعة: الكاش أولاً (ربما فُحص الرابط للتو) ثم فحص كامل"""
+        cached_result = await self._check_cache(url_hash)
+        if cached_result:
+            return cached_result
+        return await self._scan_fresh(url, url_hash)
+    
+    async def _rescan(self, url_hash: str, url: str):
+        """عامل طابور إعادة الفحص: فحص كامل يستبدل النتيجة في الكاش والقاعدة"""
+        result = await self._scan_fresh(url, url_hash)
+        logger.debug(f"🔄 أُعيد فحص الرابط الشائع {url[:50]}: {result['threat_level']}")
+    
+    async def _basic_url_check(self, url: str, guild_id: Optional[int] = None) -> Dict:
         """فحص أساسي للرابط"""
         result = {
             'is_safe': True,
@@ -163,23 +440,26 @@ class LinkGuardian:
         try:
             # التحقق من صحة الرابط
             if not validators.url(url):
+                # رابط لا يمكن تحليله مشبوه لكنه ليس دليلاً على تهديد
                 result['is_safe'] = False
-                result['threat_level'] = 'high'
+                result['threat_level'] = 'medium'
                 result['threats'].append('invalid_url')
                 return result
             
             parsed = urlparse(url)
-            domain = parsed.netloc.lower()
+            domain = normalize_host(parsed.netloc)
             
-            # التحقق من القائمة السوداء
-            if domain in self.blacklist:
+            # التحقق من القائمة السوداء (المجال أو أي مجال أب له)
+            if self.domains.match('blacklist', domain, guild_id):
                 result['is_safe'] = False
                 result['threat_level'] = 'high'
                 result['threats'].append('blacklisted_domain')
+                result['listed'] = 'blacklist'
             
             # التحقق من القائمة البيضاء
-            elif domain in self.safe_domains:
+            elif self.domains.match('safe', domain):
                 result['threat_level'] = 'safe'
+                result['listed'] = 'safe'
             
             # فحص المجالات المشبوهة
             elif self._is_suspicious_domain(domain):
@@ -199,11 +479,10 @@ class LinkGuardian:
     
     def _check_suspicious_patterns(self, url: str) -> Dict:
         """فحص الأنماط المشبوهة"""
-        threats = []
+        if not self.url_rules.compiled:
+            self.url_rules.compile(self.suspicious_patterns)
         
-        for pattern in self.suspicious_patterns:
-            if re.search(pattern, url, re.IGNORECASE):
-                threats.append(f'suspicious_pattern_{pattern[:20]}')
+        threats = [f'suspicious_pattern_{name}' for name in self.url_rules.match(url)]
         
         return {
             'is_suspicious': len(threats) > 0,
@@ -229,23 +508,25 @@ class LinkGuardian:
     async def _check_url_content(self, url: str) -> Optional[Dict]:
         """فحص محتوى الرابط"""
         try:
-            timeout = aiohttp.ClientTimeout(total=10)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(url, allow_redirects=False) as response:
-                    # فحص رموز الاستجابة المشبوهة
-                    if response.status in [301, 302, 307, 308]:
-                        return {
-                            'threats': ['suspicious_redirect'],
-                            'details': {'redirect_status': response.status}
-                        }
-                    
-                    # فحص headers مشبوهة
-                    content_type = response.headers.get('content-type', '')
-                    if 'application/octet-stream' in content_type:
-                        return {
-                            'threats': ['suspicious_content_type'],
-                            'details': {'content_type': content_type}
-                        }
+            # ملف link_probe: مهلة 10 ثوانٍ على الموصل المشترك
+            async with http_hub.session('link_probe').get(url, allow_redirects=False) as response:
+                # فحص رموز الاستجابة المشبوهة
+                if response.status in [301, 302, 307, 308]:
+                    return {
+                        'threats': ['suspicious_redirect'],
+                        'details': {'redirect_status': response.status}
+                    }
+                
+                # فحص headers مشبوهة
+                content_type = response.headers.get('content-type', '')
+                if 'application/octet-stream' in content_type:
+                    return {
+                        'threats': ['suspicious_content_type'],
+                        'details': {'content_type': content_type}
+                    }
+                
+                # اكتمل الفحص دون ملاحظات (None يعني أن الفحص لم يكتمل)
+                return {'threats': [], 'details': {'status': response.status}}
         
         except asyncio.TimeoutError:
             return {
@@ -259,14 +540,16 @@ class LinkGuardian:
     
     def _merge_vt_results(self, scan_result: Dict, vt_result: Dict) -> Dict:
         """دمج نتائج VirusTotal"""
-        if vt_result.get('malicious_count', 0) > 0:
+        positives = vt_result.get('positive_detections', 0)
+        if positives > 0:
             scan_result['is_safe'] = False
             scan_result['threat_level'] = 'high'
             scan_result['threats'].extend(vt_result.get('threat_names', []))
+            # كل محرك إضافي يكشف الرابط يرفع الثقة في الحكم
+            scan_result['confidence'] = max(scan_result['confidence'], min(1.0, 0.6 + 0.1 * positives))
         
         scan_result['details']['virustotal'] = vt_result
-        scan_result['scan_engines'].extend(vt_result.get('engines', []))
-        scan_result['confidence'] = max(scan_result['confidence'], vt_result.get('confidence', 0))
+        scan_result['scan_engines'].append('virustotal')
         
         return scan_result
     
@@ -282,54 +565,142 @@ class LinkGuardian:
         return scan_result
     
     async def _save_scan_result(self, url_hash: str, scan_result: Dict):
-        """حفظ نتيجة الفحص"""
+        """حفظ نتيجة الفحص (النتيجة غير الحاسمة تبقى في الكاش لمدتها القصيرة فقط)"""
         try:
+            verdict = self._verdict(scan_result)
+            await cache_manager.set(URL_SCAN_CACHE, url_hash, scan_result, ttl=VERDICT_TTLS[verdict])
+            if verdict == 'unknown':
+                return
+            
             await db_manager.add_scanned_link(
                 url_hash=url_hash,
                 original_url=scan_result['url'],
                 is_malicious=not scan_result['is_safe'],
-                vt_score=scan_result.get('details', {}).get('virustotal', {}).get('malicious_count', 0),
+                vt_score=scan_result.get('details', {}).get('virustotal', {}).get('positive_detections', 0),
                 scan_engines=','.join(scan_result.get('scan_engines', [])),
                 threat_names=','.join(scan_result.get('threats', []))
             )
             
-            # حفظ في الكاش المحلي
-            self.url_cache[url_hash] = scan_result
-            
         except Exception as e:
             logger.error(f"خطأ في حفظ نتيجة الفحص: {e}")
     
-    def add_to_whitelist(self, domain: str):
-        """إضافة مجال للقائمة البيضاء"""
-        self.whitelist.add(domain.lower())
+    async def _ensure_guild_lists(self, guild_id: Optional[int]):
+        """تحميل القائمة البيضاء للسيرفر قبل أول فحص له (إذا لم يحملها التسخين بعد)"""
+        if guild_id in (None, GLOBAL_GUILD) or guild_id in self._loaded_guilds:
+            return
+        
+        try:
+            for domain in await db_manager.get_whitelisted_domains(guild_id):
+                self.domains.add('whitelist', domain, guild_id)
+            self._loaded_guilds.add(guild_id)
+        except Exception as e:
+            logger.error(f"❌ خطأ في تحميل القائمة البيضاء للسيرفر {guild_id}: {e}")
+    
+    def is_whitelisted(self, domain: str, guild_id: Optional[int] = None) -> bool:
+        """المجال أو أحد آبائه في القائمة العامة أو في قائمة السيرفر"""
+        return self.domains.match('whitelist', domain, guild_id) is not None
+    
+    async def warm_up(self, limit: Optional[int] = None):
+        """تحميل القوائم البيضاء وأحدث نتائج الفحص الصالحة إلى الذاكرة"""
+        limit = Config.LINK_WARMUP_LIMIT if limit is None else limit
+        progress = self.warmup_progress
+        progress.update(state='running', loaded=0, skipped=0, total=0,
+                        started_at=datetime.now().isoformat(), finished_at=None)
+        
+        try:
+            # القوائم البيضاء لجميع السيرفرات (إعدادات السيرفرات محملة مسبقاً في db_manager)
+            whitelists = await db_manager.get_all_whitelisted_domains()
+            for guild_id, domains in whitelists.items():
+                for domain in domains:
+                    self.domains.add('whitelist', domain, guild_id)
+            self._loaded_guilds.update(whitelists)
+            
+            stats = await db_manager.get_database_stats()
+            progress['total'] = min(limit, stats.get('scanned_links', 0))
+            async with aclosing(db_manager.iter_recent_scanned_links(limit)) as rows:
+                async for row in rows:
+                    result, remaining = self._result_from_row(row)
+                    if remaining > 0:
+                        await cache_manager.set(URL_SCAN_CACHE, row['url_hash'], result, ttl=remaining)
+                        progress['loaded'] += 1
+                    else:
+                        progress['skipped'] += 1
+            
+            progress['state'] = 'done'
+            logger.info(
+                f"🔥 تم تسخين كاش الروابط: {progress['loaded']} نتيجة "
+                f"({progress['skipped']} منتهية) و {len(whitelists)} قائمة بيضاء"
+            )
+        
+        except asyncio.CancelledError:
+            progress['state'] = 'cancelled'
+            raise
+        except Exception as e:
+            progress['state'] = 'failed'
+            logger.error(f"❌ خطأ في تسخين كاش الروابط: {e}")
+        finally:
+            progress['finished_at'] = datetime.now().isoformat()
+    
+    def add_to_whitelist(self, domain: str, guild_id: int = GLOBAL_GUILD):
+        """إضافة مجال للقائمة البيضاء (العامة أو لسيرفر واحد)"""
+        self.domains.add('whitelist', domain, guild_id)
         logger.info(f"✅ تم إضافة {domain} للقائمة البيضاء")
     
-    def add_to_blacklist(self, domain: str):
-        """إضافة مجال للقائمة السوداء"""
-        self.blacklist.add(domain.lower())
+    def add_to_blacklist(self, domain: str, guild_id: int = GLOBAL_GUILD):
+        """إضافة مجال للقائمة السوداء (العامة أو لسيرفر واحد)"""
+        self.domains.add('blacklist', domain, guild_id)
         logger.info(f"❌ تم إضافة {domain} للقائمة السوداء")
     
     def get_stats(self) -> Dict:
         """إحصائيات النظام"""
+        cache_stats = cache_manager.namespace_stats(URL_SCAN_CACHE)
         return {
-            'cached_urls': len(self.url_cache),
-            'whitelisted_domains': len(self.whitelist),
-            'blacklisted_domains': len(self.blacklist)
+            'cached_urls': cache_stats['entries'],
+            'cache_bytes': cache_stats['bytes'],
+            'cache_hit_rate': cache_stats['hit_rate'],
+            'rescan_queue': self.rescan_queue.get_stats(),
+            'followups': dict(self.followups.get_stats(), fallbacks=self.followup_fallbacks),
+            'url_rules': self.url_rules.get_stats(),
+            'warmup': dict(self.warmup_progress),
+            'whitelisted_domains': self.domains.count('whitelist'),
+            'blacklisted_domains': self.domains.count('blacklist')
         }
     
     async def initialize(self):
         """تهيئة نظام حماية الروابط"""
         try:
             # تحميل القوائم البيضاء والسوداء من قاعدة البيانات
-            self.whitelist = set(await db_manager.get_whitelisted_domains(0))  # 0 للقائمة العامة
-            self.blacklist = set()  # يمكن إضافة تحميل القائمة السوداء لاحقاً
+            self.domains.replace('whitelist', await db_manager.get_whitelisted_domains(GLOBAL_GUILD))
+            self.domains.replace('blacklist', ())  # يمكن إضافة تحميل القائمة السوداء لاحقاً
+            
+            # ترجمة أنماط الروابط المشبوهة مرة واحدة
+            self.url_rules.compile(self.suspicious_patterns)
+            
+            # تسخين الكاش في الخلفية: البوت يخدم الرسائل فوراً أثناء التحميل
+            self.warmup_task = asyncio.create_task(self.warm_up())
             
             # تهيئة الـ API الخارجية
             if Config.VIRUSTOTAL_API_KEY:
                 await self.vt_api.initialize()
             
+            self.rescan_queue.start()
+            self.followups.start()
+            
             logger.info("✅ تم تهيئة نظام حماية الروابط بنجاح")
             return True
             
         except Exception as e:
-            logger.error(f"❌ خطأ في تهيئة نظام حماية الروابط: {e}")
\ No newline at end of file
+            logger.error(f"❌ خطأ في تهيئة نظام حماية الروابط: {e}")
+    
+    async def close(self):
+        """إيقاف التسخين وطوابير المتابعة وإعادة الفحص وإغلاق الـ API"""
+        if self.warmup_task is not None and not self.warmup_task.done():
+            self.warmup_task.cancel()
+            try:
+                await self.warmup_task
+            except asyncio.CancelledError:
+                pass
+        
+        await self.followups.stop()
+        await self.rescan_queue.stop()
+        await self.vt_api.close()
@@ -0,0 +1,84 @@
+"""
+Rescan Queue - طابور إعادة فحص الروابط الشائعة في الخلفية
+يُحدّث نتيجة الرابط قبل انتهاء صلاحيتها فيبقى في الكاش دون تقديم حكم "آمن" قديم
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from core.logger import get_security_logger
+
+logger = get_security_logger()
+
+class RescanQueue:
+    """طابور محدود بدون تكرار للمفتاح نفسه، مع عدد ثابت من العمال"""
+
+    def __init__(self, rescan: Callable[[str, str], Awaitable[Any]], max_size: int = 200, workers: int = 1):
+        self._rescan = rescan
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._queued: Set[str] = set()
+        self._worker_count = workers
+        self._workers: List[asyncio.Task] = []
+
+        self.enqueued = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, url_hash: str, url: str) -> bool:
+        """إضافة رابط للطابور، و False إذا كان موجوداً أو الطابور ممتلئاً"""
+        if url_hash in self._queued:
+            return False
+
+        try:
+            self._queue.put_nowait((url_hash, url))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+        self._queued.add(url_hash)
+        self.enqueued += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            url_hash, url = await self._queue.get()
+            try:
+                await self._rescan(url_hash, url)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"⚠️ فشل إعادة فحص الرابط {url[:50]}: {e}")
+            finally:
+                self._queued.discard(url_hash)
+                self._queue.task_done()
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self._worker_count)]
+
+    async def join(self):
+        """انتظار انتهاء جميع العناصر الحالية"""
+        await self._queue.join()
+
+    async def stop(self):
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        for worker in workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def get_stats(self) -> Dict[str, Optional[int]]:
+        return {
+            'queued': self._queue.qsize(),
+            'enqueued': self.enqueued,
+            'completed': self.completed,
+            'failed': self.failed,
+            'dropped': self.dropped
+        }
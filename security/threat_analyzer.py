@@ -5,12 +5,13 @@ Threat Analyzer - نظام تحليل التهديدات
 
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Union
-from collections import defaultdict
+from collections import defaultdict, deque
 import json
 
 from config import Config
 from core.logger import get_security_logger
 from core.database import db_manager
+from core.expiry import expiry_scheduler
 
 logger = get_security_logger()
 
@@ -47,8 +48,9 @@ class ThreatAnalyzer:
             }
         }
         
-        # ذاكرة التهديدات المؤقتة
-        self.threat_memory = defaultdict(list)
+        # ذاكرة التهديدات المؤقتة (مرتبة زمنياً، تُنظف من بدايتها عند انتهاء أقدم تهديد)
+        self.threat_memory = defaultdict(deque)
+        self._memory_expiry = expiry_scheduler.group('analyzer:threats', self._cleanup_old_threats)
         
         # قائمة التهديدات المعروفة
         self.known_threats = self._load_known_threats()
@@ -142,25 +144,40 @@ class ThreatAnalyzer:
     
     def _update_threat_memory(self, threat_data: Dict, threat_type: str, severity: str):
         """تحديث ذاكرة التهديدات المؤقتة"""
+        # تنظيف كسول لبداية الطابور حتى لا تنمو الذاكرة إذا لم يعمل المجدول
+        threats = self.threat_memory[threat_type]
+        current_time = datetime.utcnow()
+        self._prune_expired(threat_type, threats, current_time)
+        if not threats:
+            # تنظيف التهديدات القديمة عند انتهاء أقدمها عبر المجدول
+            self._memory_expiry.schedule(threat_type, self.threat_categories[threat_type]['decay_time'].total_seconds())
+        
         # إضافة التهديد الجديد
-        self.threat_memory[threat_type].append({
+        threats.append({
             'data': threat_data,
             'severity': severity,
-            'timestamp': datetime.utcnow()
+            'timestamp': current_time
         })
-        
-        # تنظيف التهديدات القديمة
-        self._cleanup_old_threats(threat_type)
     
-    def _cleanup_old_threats(self, threat_type: str):
-        """تنظيف التهديدات القديمة من الذاكرة"""
-        current_time = datetime.utcnow()
+    def _prune_expired(self, threat_type: str, threats: deque, current_time: datetime):
+        """حذف التهديدات المنتهية من بداية الطابور (الأقدم أولاً)"""
         decay_time = self.threat_categories[threat_type]['decay_time']
+        while threats and current_time - threats[0]['timestamp'] >= decay_time:
+            threats.popleft()
+    
+    def _cleanup_old_threats(self, threat_type: str) -> Optional[float]:
+        """تنظيف التهديدات القديمة من الذاكرة، ويعيد الثواني حتى انتهاء أقدم تهديد متبقٍ"""
+        current_time = datetime.utcnow()
+        threats = self.threat_memory.get(threat_type)
+        if threats:
+            self._prune_expired(threat_type, threats, current_time)
+        
+        if not threats:
+            self.threat_memory.pop(threat_type, None)
+            return None
         
-        self.threat_memory[threat_type] = [
-            threat for threat in self.threat_memory[threat_type]
-            if current_time - threat['timestamp'] < decay_time
-        ]
+        decay_time = self.threat_categories[threat_type]['decay_time']
+        return (threats[0]['timestamp'] + decay_time - current_time).total_seconds()
     
     async def _find_related_threats(self, threat_data: Dict) -> List[Dict]:
         """البحث عن التهديدات المرتبطة"""
@@ -172,8 +189,10 @@ class ThreatAnalyzer:
             db_threats = await db_manager.get_threats_by_source(source_id)
             related.extend(db_threats)
         
-        # البحث في الذاكرة المؤقتة
+        # البحث في الذاكرة المؤقتة (دون التهديدات المنتهية التي لم ينظفها المجدول بعد)
+        current_time = datetime.utcnow()
         for threat_type, threats in self.threat_memory.items():
+            self._prune_expired(threat_type, threats, current_time)
             for threat in threats:
                 if self._is_related(threat_data, threat['data']):
                     related.append({
@@ -0,0 +1,201 @@
+"""
+URL Rules - محرك قواعد الروابط المترجم مسبقاً
+كل قاعدة تُختصر إلى نص ثابت لازم في أي تطابق لها (المرساة)، وتُدمج المراسي في تعبير
+واحد على شكل شجرة بادئات يمر على الرابط مرة واحدة. القواعد التي ظهرت مرساتها فقط
+تُتحقق بتعبيرها الكامل، فتبقى تكلفة الرابط شبه ثابتة مهما زاد عدد القواعد
+"""
+
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Pattern, Set
+
+# أقصر مرساة مفيدة: المراسي القصيرة تظهر في كل رابط تقريباً
+MIN_ANCHOR_LENGTH = 3
+
+_QUANTIFIERS = '*+?{'
+_META = '.^$|()[]' + _QUANTIFIERS
+
+def extract_anchor(pattern: str) -> Optional[str]:
+    """أطول نص ثابت يجب أن يظهر في كل تطابق للنمط، أو None"""
+    runs: List[str] = []
+    current = ''
+    i = 0
+
+    while i < len(pattern):
+        char = pattern[i]
+
+        if char == '|':
+            # بديل في المستوى الأعلى: لا يوجد نص مشترك مضمون
+            return None
+
+        if char == '\\' and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if escaped.isalnum():
+                # \d و \w و \b ... فئات وليست نصوصاً
+                runs.append(current)
+                current = ''
+                continue
+            atom = escaped
+        elif char == '[':
+            end = pattern.find(']', i + 2)
+            i = len(pattern) if end == -1 else end + 1
+            runs.append(current)
+            current = ''
+            continue
+        elif char == '(':
+            # تخطي المجموعة كاملة (قد تحتوي بدائل)
+            depth = 0
+            while i < len(pattern):
+                if pattern[i] == '\\':
+                    i += 2
+                    continue
+                depth += {'(': 1, ')': -1}.get(pattern[i], 0)
+                i += 1
+                if depth == 0:
+                    break
+            runs.append(current)
+            current = ''
+            continue
+        elif char in _META:
+            if char in '?*' or (char == '{' and pattern[i + 1:i + 2] == '0'):
+                # المحرف السابق اختياري
+                current = current[:-1]
+            runs.append(current)
+            current = ''
+            i += 1
+            if char == '{':
+                end = pattern.find('}', i)
+                i = len(pattern) if end == -1 else end + 1
+            continue
+        else:
+            atom = char
+            i += 1
+
+        # محرف يتبعه مكمم اختياري لا يدخل في المرساة
+        if i < len(pattern) and (pattern[i] in '?*' or pattern[i:i + 2] == '{0'):
+            runs.append(current)
+            current = ''
+            continue
+        current += atom.lower()
+
+    runs.append(current)
+    anchor = max(runs, key=len)
+    return anchor if len(anchor) >= MIN_ANCHOR_LENGTH else None
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """تعبير شجرة بادئات: عند كل موضع يتبع المحرك فرعاً واحداً بدل تجربة كل كلمة"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def render(node: Dict) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return render(trie)
+
+class UrlRuleEngine:
+    """مطابقة جميع القواعد على رابط في مرور واحد مع تحقق القواعد المرشحة فقط"""
+
+    def __init__(self, rules: Optional[Dict[str, str]] = None):
+        self.rules: Dict[str, Pattern] = {}
+        self._order: Dict[str, int] = {}
+        self._by_anchor: Dict[str, List[str]] = {}
+        self._anchor_lengths: List[int] = []
+        self._anchor_scan: Optional[Pattern] = None
+        self._unanchored: List[str] = []
+        if rules is not None:
+            self.compile(rules)
+
+    @property
+    def compiled(self) -> bool:
+        return self._anchor_scan is not None
+
+    def compile(self, rules: Dict[str, str]):
+        """ترجمة القواعد (الاسم -> النمط) وبناء تعبير المراسي"""
+        compiled = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in rules.items()}
+
+        by_anchor: Dict[str, List[str]] = {}
+        unanchored: List[str] = []
+        for name, pattern in rules.items():
+            anchor = extract_anchor(pattern)
+            if anchor is None:
+                unanchored.append(name)
+            else:
+                by_anchor.setdefault(anchor, []).append(name)
+
+        # البحث المسبق (lookahead) يعطي تطابقاً عند كل موضع حتى لو تداخلت المراسي
+        trie = _trie_pattern(by_anchor)
+        self._anchor_scan = re.compile(f'(?=({trie}))' if trie else r'(?!)')
+        self.rules = compiled
+        self._order = {name: index for index, name in enumerate(compiled)}
+        self._by_anchor = by_anchor
+        self._anchor_lengths = sorted({len(anchor) for anchor in by_anchor})
+        self._unanchored = unanchored
+
+    def _candidates(self, lowered: str) -> Set[str]:
+        candidates: Set[str] = set()
+        for match in self._anchor_scan.finditer(lowered):
+            text = match.group(1)
+            if not text:
+                continue
+            # الشجرة تطابق أطول مرساة، والمراسي الأقصر التي هي بادئات لها تُضاف هنا
+            for length in self._anchor_lengths:
+                if length > len(text):
+                    break
+                candidates.update(self._by_anchor.get(text[:length], ()))
+        return candidates
+
+    def match(self, url: str) -> List[str]:
+        """أسماء جميع القواعد المطابقة للرابط بترتيب تعريفها"""
+        if not self.compiled:
+            return []
+
+        candidates = self._candidates(url.lower())
+        candidates.update(self._unanchored)
+        return [name for name in sorted(candidates, key=self._order.__getitem__) if self.rules[name].search(url)]
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'rules': len(self.rules),
+            'anchors': len(self._by_anchor),
+            'unanchored': len(self._unanchored)
+        }
+
+def benchmark(rule_counts: Iterable[int] = (10, 100, 500), urls: Optional[List[str]] = None,
+              rounds: int = 5) -> Dict[int, float]:
+    """متوسط زمن مطابقة الرابط الواحد (ميكروثانية) لكل عدد من القواعد"""
+    urls = urls or [
+        'https://example.com/some/long/path?query=value&other=1',
+        'https://discord.gift/abcdef123456',
+        'http://192.168.1.20/login',
+        'https://free-nitro-giveaway.xyz/claim',
+        'https://github.com/user/repository/pulls',
+    ] * 20
+
+    results: Dict[int, float] = {}
+    for count in rule_counts:
+        rules = {f'scam_domain_{i}': rf'scam-site-{i}\.com' for i in range(count // 2)}
+        rules.update({f'phish_path_{i}': rf'login.*verify-{i}' for i in range(count - count // 2)})
+        engine = UrlRuleEngine(rules)
+
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for url in urls:
+                engine.match(url)
+            best = min(best, time.perf_counter() - start)
+        results[count] = best / len(urls) * 1_000_000
+
+    return results
+
+if __name__ == '__main__':
+    for count, micros in benchmark().items():
+        print(f'{count:>5} قاعدة: {micros:.2f} ميكروثانية لكل رابط')
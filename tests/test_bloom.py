@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import aiosqlite
+
+from core.bloom import ScalableBloomFilter
+from core.cache import CacheManager
+from core.database import DatabaseManager
+from security.link_guardian import LinkGuardian
+
+class TestScalableBloomFilter(unittest.TestCase):
+    def test_no_false_negatives_while_growing(self):
+        bloom = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+        keys = [f'hash-{i}' for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        self.assertGreater(len(bloom.stages), 1)
+        self.assertTrue(all(key in bloom for key in keys))
+
+        false_positives = sum(f'other-{i}' in bloom for i in range(2000))
+        self.assertLess(false_positives / 2000, 0.03)
+
+    def test_save_and_load_round_trip(self):
+        bloom = ScalableBloomFilter(initial_capacity=10, error_rate=0.01)
+        for i in range(50):
+            bloom.add(f'k{i}')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / 'links.bloom'
+            bloom.save(path, {'max_id': 50})
+            loaded, metadata = ScalableBloomFilter.load(path)
+
+            self.assertEqual(metadata, {'max_id': 50})
+            self.assertEqual(len(loaded), len(bloom))
+            self.assertTrue(all(f'k{i}' in loaded for i in range(50)))
+
+            # ملف مبتور لا يُحمّل
+            path.write_bytes(path.read_bytes()[:-5])
+            self.assertIsNone(ScalableBloomFilter.load(path))
+
+class TestScannedLinksFilter(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'test.db')
+        self.db = DatabaseManager(self.db_path)
+        await self.db.initialize()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def test_definite_miss_skips_database(self):
+        await self.db.add_scanned_link('known', 'https://example.com', False)
+
+        self.assertIsNone(await self.db.get_scanned_link('unknown'))
+        self.assertEqual(self.db.filter_skips, 1)
+        self.assertEqual((await self.db.get_scanned_link('known'))['original_url'], 'https://example.com')
+
+    async def test_new_url_costs_no_disk_query(self):
+        cache = CacheManager(os.path.join(self.tmp_dir.name, 'cache'))
+        cache.disk.get = AsyncMock(return_value=None)
+        guardian = LinkGuardian('test_api_key')
+
+        with patch('security.link_guardian.cache_manager', cache), \
+                patch('security.link_guardian.db_manager', self.db):
+            self.assertIsNone(await guardian._check_cache('never-seen'))
+
+        # الذاكرة ثم المرشح فقط: لا كاش على القرص ولا استعلام على القاعدة
+        cache.disk.get.assert_not_called()
+        self.assertEqual(self.db.filter_skips, 1)
+        await cache.close()
+
+    async def test_warm_start_catches_up_rows_written_after_save(self):
+        await self.db.add_scanned_link('first', 'https://a.example', False)
+        await self.db.close()
+        self.assertTrue(os.path.exists(f'{self.db_path}.bloom'))
+
+        # صف كُتب بعد حفظ المرشح (مثلاً قبل انقطاع مفاجئ)
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(
+                "INSERT INTO scanned_links (url_hash, original_url, is_malicious) VALUES ('second', 'https://b.example', 1)"
+            )
+            await db.commit()
+
+        self.db = DatabaseManager(self.db_path)
+        await self.db.initialize()
+
+        self.assertEqual(len(self.db.scanned_links_filter), 2)
+        self.assertIsNotNone(await self.db.get_scanned_link('first'))
+        self.assertIsNotNone(await self.db.get_scanned_link('second'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from core.cache import CacheManager, LRUNamespace
+
+class TestLRUNamespace(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        namespace = LRUNamespace(ttl=60, max_entries=2, max_bytes=1024)
+        namespace.set('a', 1)
+        namespace.set('b', 2)
+        namespace.get('a')
+        namespace.set('c', 3)
+
+        self.assertIn('a', namespace)
+        self.assertNotIn('b', namespace)
+        self.assertEqual(namespace.evictions, 1)
+
+    def test_byte_budget(self):
+        namespace = LRUNamespace(ttl=60, max_entries=100, max_bytes=20)
+        namespace.set('a', 'x' * 10)
+        namespace.set('b', 'y' * 10)
+
+        self.assertEqual(len(namespace), 1)
+        self.assertLessEqual(namespace.bytes, 20)
+
+        # قيمة أكبر من المساحة كاملة لا تُخزن
+        namespace.set('big', 'z' * 100)
+        self.assertNotIn('big', namespace)
+
+    def test_lazy_ttl_expiry(self):
+        namespace = LRUNamespace(ttl=10, max_entries=10, max_bytes=1024)
+        namespace.set('a', 1)
+
+        with patch('core.cache.time.monotonic', return_value=time.monotonic() + 11):
+            self.assertIsNone(namespace.get('a'))
+
+        stats = namespace.get_stats()
+        self.assertEqual((stats['entries'], stats['expirations'], stats['misses']), (0, 1, 1))
+
+class TestCacheManager(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = CacheManager(self.tmp_dir.name, {'url_scan': {'ttl': 60, 'max_entries': 2, 'max_bytes': 1024}})
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+        self.tmp_dir.cleanup()
+
+    async def test_namespace_capacity_and_stats(self):
+        for key in ('a', 'b', 'c'):
+            await self.cache.set('url_scan', key, {'is_safe': True})
+
+        self.assertEqual(await self.cache.get('url_scan', 'c'), {'is_safe': True})
+        stats = self.cache.get_stats()['url_scan']
+        self.assertEqual((stats['entries'], stats['evictions'], stats['hits']), (2, 1, 1))
+
+    async def test_disk_tier_survives_restart(self):
+        await self.cache.set('domain_info', 'example.com', {'is_safe': False})
+        await self.cache.close()
+
+        self.cache = CacheManager(self.tmp_dir.name)
+        self.assertEqual(await self.cache.get('domain_info', 'example.com'), {'is_safe': False})
+        # ملف واحد فقط بدل ملف لكل مفتاح
+        self.assertEqual(list(self.cache.cache_dir.glob('*.json')), [])
+
+    async def test_cleanup_bulk_deletes_expired(self):
+        await self.cache.set('url_scan', 'a', 1)
+        await self.cache.disk.set('url_scan', 'old', 2, time.time() - 1)
+
+        self.assertEqual(await self.cache.cleanup(), 1)
+        self.assertIsNone(await self.cache.disk.get('url_scan', 'old'))
+        self.assertEqual(await self.cache.get('url_scan', 'a'), 1)
+
+class TestSharedNamespaces(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = CacheManager(self.tmp_dir.name, {
+            'url_scan': {'ttl': 60, 'max_entries': 100, 'max_bytes': 100},
+            'domain_info': {'ttl': 60, 'max_entries': 100, 'max_bytes': 400},
+            'ip_geolocation': {'ttl': 60, 'max_entries': 100, 'max_bytes': 400, 'persist': False}
+        }, memory_budget=100)
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+        self.tmp_dir.cleanup()
+
+    async def test_shared_memory_budget(self):
+        await self.cache.set('url_scan', 'a', 'x' * 28)
+        for key in ('d1', 'd2', 'd3'):
+            await self.cache.set('domain_info', key, 'y' * 28)
+
+        # المساحة الأكثر امتلاءً نسبةً لحدها تُخلى أولاً
+        usage = self.cache.get_memory_usage()
+        self.assertLessEqual(usage['bytes'], 100)
+        self.assertEqual(usage['budget_evictions'], 1)
+        self.assertEqual(self.cache.namespace_stats('url_scan')['entries'], 0)
+        self.assertEqual(self.cache.namespace_stats('domain_info')['entries'], 3)
+
+    async def test_clear_namespace(self):
+        await self.cache.set('url_scan', 'a', 1)
+        await self.cache.set('domain_info', 'example.com', {'is_suspicious': False})
+
+        self.assertEqual(await self.cache.clear('domain_info'), 1)
+        self.assertIsNone(await self.cache.get('domain_info', 'example.com'))
+        self.assertEqual(await self.cache.get('url_scan', 'a'), 1)
+
+        await self.cache.clear()
+        self.assertIsNone(await self.cache.get('url_scan', 'a'))
+
+    async def test_memory_only_namespace(self):
+        await self.cache.set('ip_geolocation', 'example.com', {'ip': '93.184.216.34'})
+
+        self.assertIsNone(await self.cache.disk.get('ip_geolocation', 'example.com'))
+        self.assertEqual(await self.cache.get('ip_geolocation', 'example.com'), {'ip': '93.184.216.34'})
+
+class TestGetOrCompute(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = CacheManager(self.tmp_dir.name, {
+            'url_scan': {'ttl': 60, 'stale_ttl': 30, 'max_entries': 10, 'max_bytes': 1024}
+        })
+        self.calls = 0
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+        self.tmp_dir.cleanup()
+
+    async def _loader(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {'scan': self.calls}
+
+    async def test_concurrent_misses_share_one_load(self):
+        results = await asyncio.gather(*(
+            self.cache.get_or_compute('url_scan', 'scam', self._loader) for _ in range(30)
+        ))
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(result == {'scan': 1} for result in results))
+        self.assertEqual(self.cache._inflight, {})
+
+    async def test_stale_value_served_while_refreshing(self):
+        await self.cache.get_or_compute('url_scan', 'scam', self._loader)
+
+        # انتهت الصلاحية قبل 10 ثوانٍ (ضمن نافذة القِدم)
+        namespace = self.cache.memory_cache['url_scan']
+        value, _, size, stored_at = namespace._entries['scam']
+        namespace._entries['scam'] = (value, time.monotonic() - 10, size, stored_at)
+
+        self.assertEqual(await self.cache.get_or_compute('url_scan', 'scam', self._loader), {'scan': 1})
+        await asyncio.gather(*self.cache._inflight.values())
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(await self.cache.get('url_scan', 'scam'), {'scan': 2})
+        self.assertEqual(self.cache.get_stats()['url_scan']['stale_hits'], 1)
+
+    async def test_loader_errors_propagate_and_are_not_cached(self):
+        async def failing():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            await self.cache.get_or_compute('url_scan', 'x', failing)
+
+        self.assertEqual(await self.cache.get_or_compute('url_scan', 'x', self._loader), {'scan': 1})
+
+class TestCacheMetrics(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = CacheManager(self.tmp_dir.name, {
+            'url_scan': {'ttl': 60, 'max_entries': 10, 'max_bytes': 1024},
+            'domain_info': {'ttl': 60, 'max_entries': 10, 'max_bytes': 1024}
+        })
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+        self.tmp_dir.cleanup()
+
+    async def test_snapshot_records_loads_sizes_and_hit_ages(self):
+        async def loader():
+            return {'is_safe': True}
+
+        await self.cache.get_or_compute('url_scan', 'a', loader)
+        await self.cache.get_or_compute('url_scan', 'a', loader)
+        await self.cache.get('url_scan', 'missing')
+
+        stats = self.cache.snapshot()['namespaces']['url_scan']
+        self.assertEqual((stats['hits'], stats['misses'], stats['loads']), (1, 2, 1))
+        self.assertEqual(stats['loader_latency_ms']['count'], 1)
+        self.assertEqual(stats['entry_size_bytes']['count'], 1)
+        self.assertEqual(stats['hit_age_seconds']['count'], 1)
+        self.assertEqual(stats['ttl'], 60)
+
+    async def test_disk_hits_and_combined_hit_rate(self):
+        await self.cache.set('domain_info', 'example.com', {'age_days': 10})
+        self.cache.memory_cache['domain_info'].clear()
+
+        self.assertEqual(await self.cache.get('domain_info', 'example.com'), {'age_days': 10})
+        await self.cache.get('domain_info', 'example.com')
+        await self.cache.set('url_scan', 'a', 1)
+        await self.cache.get('url_scan', 'a')
+
+        self.assertEqual(self.cache.snapshot()['namespaces']['domain_info']['disk_hits'], 1)
+        self.assertEqual(self.cache.hit_rate('domain_info'), 0.5)
+        self.assertEqual(self.cache.hit_rate('domain_info', 'url_scan'), round(2 / 3, 4))
+
+        self.cache.reset_metrics()
+        self.assertEqual(self.cache.hit_rate(), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
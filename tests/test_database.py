@@ -0,0 +1,494 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from contextlib import asynccontextmanager
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import aiosqlite
+
+from core.database import DatabaseManager
+from core.migrations import MIGRATIONS, run_migrations
+from core.rollups import split_range
+
+class TestGuildSettingsCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp_dir.name, 'test.db'))
+        await self.db.initialize()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def test_cached_settings_default_without_io(self):
+        settings = self.db.get_cached_guild_settings(1)
+        self.assertEqual(settings['guild_id'], 1)
+        self.assertEqual(settings['protection_level'], 2)
+
+    async def test_update_writes_through(self):
+        await self.db.create_default_guild_settings(1)
+        version = self.db.guild_settings_cache.get_version(1)
+
+        await self.db.update_guild_settings(1, protection_level=4)
+
+        self.assertEqual(self.db.get_cached_guild_settings(1)['protection_level'], 4)
+        self.assertFalse(self.db.guild_settings_cache.is_current(1, version))
+
+    async def test_read_overlapping_update_is_not_cached(self):
+        await self.db.create_default_guild_settings(1)
+        self.db.guild_settings_cache.invalidate(1)
+
+        read_done, release = asyncio.Event(), asyncio.Event()
+        real_reader = self.db._reader
+
+        @asynccontextmanager
+        async def slow_reader():
+            async with real_reader() as db:
+                yield db
+            # الصف قُرئ ولم يُحفظ في الكاش بعد
+            read_done.set()
+            await release.wait()
+
+        with patch.object(self.db, '_reader', slow_reader):
+            read = asyncio.create_task(self.db.get_guild_settings(1))
+            await read_done.wait()
+            await self.db.update_guild_settings(1, protection_level=4)
+            release.set()
+            await read
+
+        self.assertEqual((await self.db.get_guild_settings(1))['protection_level'], 4)
+
+    async def test_initialize_loads_existing_guilds(self):
+        await self.db.create_default_guild_settings(7)
+        await self.db.update_guild_settings(7, auto_ban_threshold=25)
+
+        reloaded = DatabaseManager(self.db.db_path)
+        await reloaded.initialize()
+        try:
+            self.assertEqual(reloaded.get_cached_guild_settings(7)['auto_ban_threshold'], 25)
+        finally:
+            await reloaded.close()
+
+class TestConnectionPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp_dir.name, 'test.db'), read_pool_size=2)
+        await self.db.initialize()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def test_persistent_connections_use_wal(self):
+        async with self.db.db.execute('PRAGMA journal_mode') as cursor:
+            self.assertEqual((await cursor.fetchone())[0].lower(), 'wal')
+        self.assertEqual(len(self.db._readers), 2)
+
+    async def test_readers_see_committed_writes(self):
+        await self.db.add_danger_points(1, 42, 3)
+        score = await self.db.get_user_danger_score(1, 42)
+        self.assertEqual(score['danger_points'], 3)
+
+    async def test_close_is_idempotent(self):
+        await self.db.close()
+        await self.db.close()
+        self.assertIsNone(self.db.db)
+        self.assertFalse(self.db.initialized)
+
+class TestWriteBehindQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp_dir.name, 'test.db'), incident_window=0)
+        self.db.write_flush_interval = 60
+        await self.db.initialize()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def test_pending_entries_are_readable_before_flush(self):
+        await self.db.queue_threat(1, 2, 'spam', 'hello')
+        await self.db.queue_danger_points(1, 2, 3)
+        await self.db.queue_danger_points(1, 2, 4)
+
+        self.assertEqual(len(self.db.get_pending_threats(guild_id=1, user_id=2)), 1)
+        self.assertEqual(len(await self.db.get_user_threats(1, 2)), 1)
+        score = await self.db.get_user_danger_score(1, 2)
+        self.assertEqual(score['danger_points'], 7)
+        self.assertEqual(score['total_warnings'], 2)
+
+    async def test_flush_writes_in_one_batch(self):
+        for _ in range(5):
+            await self.db.queue_threat(1, 2, 'spam')
+            await self.db.queue_danger_points(1, 2, 1)
+
+        self.assertEqual(await self.db.flush_pending_writes(), 6)
+        self.assertEqual(self.db.get_pending_writes_count(), 0)
+        self.assertEqual(len(await self.db.get_user_threats(1, 2)), 5)
+        self.assertEqual((await self.db.get_user_danger_score(1, 2))['danger_points'], 5)
+
+    async def test_reset_drops_pending_points(self):
+        await self.db.add_danger_points(1, 2, 6)
+        await self.db.queue_danger_points(1, 2, 4)
+        await self.db.queue_danger_points(1, 3, 1)
+
+        await self.db.reset_danger_points(1, 2)
+        await self.db.flush_pending_writes()
+
+        score = await self.db.get_user_danger_score(1, 2)
+        self.assertEqual((score['danger_points'], score['total_warnings']), (0, 1))
+        self.assertEqual((await self.db.get_user_danger_score(1, 3))['danger_points'], 1)
+
+    async def test_add_danger_points_keeps_other_columns(self):
+        await self.db.add_danger_points(1, 2, 3)
+        await self.db.db.execute("UPDATE user_danger_scores SET status = 'banned' WHERE user_id = 2")
+        await self.db.add_danger_points(1, 2, 2)
+
+        score = await self.db.get_user_danger_score(1, 2)
+        self.assertEqual((score['danger_points'], score['total_warnings'], score['status']), (5, 2, 'banned'))
+
+    async def test_close_flushes_pending_writes(self):
+        await self.db.queue_threat(1, 2, 'spam')
+        await self.db.close()
+
+        reopened = DatabaseManager(self.db.db_path)
+        await reopened.initialize()
+        try:
+            self.assertEqual(len(await reopened.get_user_threats(1, 2)), 1)
+        finally:
+            await reopened.close()
+
+class TestDailyStatsAggregator(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp_dir.name, 'test.db'))
+        await self.db.initialize()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def test_flush_adds_to_existing_counters(self):
+        for _ in range(10):
+            self.db.increment_stat(1, 'links_scanned')
+        self.db.increment_stat(1, 'users_warned', 2)
+        self.assertEqual(await self.db.flush_stats(), 1)
+
+        # الدفعة الثانية لا تصفّر الأعمدة الأخرى
+        self.db.increment_stat(1, 'threats_detected')
+        await self.db.flush_stats()
+
+        totals = await self.db.get_total_stats(1)
+        self.assertEqual(totals['total_links_scanned'], 10)
+        self.assertEqual(totals['total_users_warned'], 2)
+        self.assertEqual(totals['total_threats'], 1)
+
+    async def test_pending_counters_are_reported(self):
+        self.db.increment_stat(1, 'raids_prevented')
+        self.assertEqual((await self.db.get_total_stats(1))['total_raids_prevented'], 1)
+
+    async def test_unknown_counter_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.db.increment_stat(1, 'guild_id')
+
+class TestMigrations(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp_dir.name, 'test.db'))
+        await self.db.initialize()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def test_schema_version_is_latest(self):
+        async with self.db.db.execute('SELECT MAX(version) FROM schema_version') as cursor:
+            self.assertEqual((await cursor.fetchone())[0], MIGRATIONS[-1].version)
+
+    async def test_high_risk_query_uses_risk_index(self):
+        async with self.db.db.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT user_id, danger_points, total_warnings FROM user_danger_scores
+            WHERE guild_id = ? AND danger_points >= ?
+            ORDER BY danger_points DESC LIMIT ?
+        ''', (1, 8, 10)) as cursor:
+            plan = ' '.join(row[-1] for row in await cursor.fetchall())
+        self.assertIn('COVERING INDEX idx_user_scores_risk', plan)
+
+    async def test_high_risk_users_ordered(self):
+        await self.db.add_danger_points(1, 10, 9)
+        await self.db.add_danger_points(1, 11, 20)
+        await self.db.add_danger_points(1, 12, 1)
+
+        users = await self.db.get_high_risk_users(1)
+        self.assertEqual([u['user_id'] for u in users], [11, 10])
+
+class TestKeysetPagination(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp_dir.name, 'test.db'), incident_window=0)
+        self.db.write_flush_interval = 60
+        await self.db.initialize()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def test_pages_cover_all_rows_once(self):
+        # نفس الطابع الزمني لعدة صفوف يختبر الترتيب الثانوي بالمعرف
+        for i in range(12):
+            await self.db.queue_threat(1, i % 3, 'spam', f'threat {i}')
+        await self.db.queue_threat(2, 1, 'spam')
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = await self.db.get_threats_page(1, before=cursor, limit=5)
+            seen.extend(row['id'] for row in rows)
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    async def test_user_filter(self):
+        for i in range(6):
+            await self.db.queue_threat(1, i % 2, 'spam')
+
+        rows, cursor = await self.db.get_threats_page(1, user_id=1, limit=3)
+        self.assertEqual(len(rows), 3)
+        self.assertIsNone(cursor)
+        self.assertTrue(all(row['user_id'] == 1 for row in rows))
+
+    async def test_next_page_uses_index_without_sort(self):
+        await self.db.add_threat(1, 2, 'spam')
+        partition = self.db.threat_partitions.names_between()[0]
+
+        async with self.db.db.execute(f'''
+            EXPLAIN QUERY PLAN
+            SELECT * FROM {partition}
+            WHERE guild_id = ? AND (timestamp, id) < (?, ?)
+            ORDER BY timestamp DESC, id DESC LIMIT ?
+        ''', (1, '2024-01-01 00:00:00', 10, 6)) as cursor:
+            plan = ' '.join(row[-1] for row in await cursor.fetchall())
+        self.assertIn(f'idx_{partition}_time', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+class TestThreatPartitions(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'test.db')
+        self.db = DatabaseManager(self.db_path, incident_window=0)
+        self.db.write_flush_interval = 60
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def _queue_at(self, timestamp, user_id=2):
+        await self.db.queue_threat(1, user_id, 'spam')
+        self.db._pending_threats[-1]['timestamp'] = timestamp
+
+    async def test_threats_split_by_month_and_pruned(self):
+        await self.db.initialize()
+        await self._queue_at('2024-01-15 10:00:00')
+        await self._queue_at('2024-03-02 10:00:00')
+        await self.db.flush_pending_writes()
+
+        self.assertIn('threats_202401', self.db.threat_partitions.names_between())
+        self.assertEqual(
+            self.db.threat_partitions.names_between(datetime(2024, 2, 1), datetime(2024, 3, 31)),
+            ['threats_202403']
+        )
+
+        rows = await self.db.get_threats_in_period(1, datetime(2024, 1, 1), datetime(2024, 12, 31))
+        self.assertEqual([row['timestamp'][:7] for row in rows], ['2024-03', '2024-01'])
+        self.assertEqual(await self.db.get_total_threats_count(1), 2)
+
+    async def test_retention_drops_whole_partitions(self):
+        await self.db.initialize()
+        await self._queue_at('2020-01-15 10:00:00')
+        await self.db.add_threat(1, 2, 'spam')
+        await self.db.flush_pending_writes()
+
+        await self.db.cleanup_old_data(90)
+
+        self.assertNotIn('threats_202001', self.db.threat_partitions.names_between())
+        async with self.db.db.execute('SELECT COUNT(*) FROM threats') as cursor:
+            self.assertEqual((await cursor.fetchone())[0], 1)
+
+    async def test_rolled_back_partition_is_recreated(self):
+        await self.db.initialize()
+        await self._queue_at('2024-01-15 10:00:00')
+        await self._queue_at('2031-05-02 10:00:00')
+
+        # فشل الالتزام بعد إنشاء القسمين داخل المعاملة
+        with patch.object(self.db.db, 'commit', AsyncMock(side_effect=RuntimeError('boom'))):
+            with self.assertRaises(RuntimeError):
+                await self.db.flush_pending_writes()
+
+        async with self.db.db.execute("SELECT name FROM sqlite_master WHERE name = 'threats_203105'") as cursor:
+            exists = await cursor.fetchone() is not None
+        self.assertEqual('threats_203105' in self.db.threat_partitions.names_between(), exists)
+
+        self.assertEqual(await self.db.flush_pending_writes(), 2)
+        rows = await self.db.get_threats_in_period(1, datetime(2031, 5, 1), datetime(2031, 5, 31))
+        self.assertEqual(len(rows), 1)
+
+    async def test_legacy_table_is_migrated(self):
+        async with aiosqlite.connect(self.db_path) as legacy:
+            await run_migrations(legacy, MIGRATIONS[:3])
+            await legacy.executemany(
+                'INSERT INTO threats (guild_id, user_id, threat_type, timestamp) VALUES (?, ?, ?, ?)',
+                [(1, 2, 'spam', '2024-01-15 10:00:00'), (1, 3, 'raid', '2024-02-01 00:00:00')]
+            )
+            await legacy.commit()
+
+        await self.db.initialize()
+
+        self.assertIn('threats_202402', self.db.threat_partitions.names_between())
+        self.assertEqual(await self.db.get_total_threats_count(1), 2)
+        # المعرفات الجديدة تستمر بعد أكبر معرف قديم
+        self.assertEqual(await self.db.add_threat(1, 2, 'spam'), 3)
+
+class TestRollups(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp_dir.name, 'test.db'), incident_window=0)
+        self.db.write_flush_interval = 60
+        await self.db.initialize()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    def test_split_range_uses_days_for_whole_days(self):
+        hourly, daily = split_range(datetime(2024, 1, 1, 22, 30), datetime(2024, 1, 4, 1, 15))
+        self.assertEqual(daily, ('2024-01-02', '2024-01-03'))
+        self.assertEqual(hourly, [('2024-01-01 22:00:00', '2024-01-01 23:00:00'),
+                                  ('2024-01-04 00:00:00', '2024-01-04 01:00:00')])
+
+        hourly, daily = split_range(datetime(2024, 1, 1, 3), datetime(2024, 1, 1, 5))
+        self.assertIsNone(daily)
+        self.assertEqual(hourly, [('2024-01-01 03:00:00', '2024-01-01 05:00:00')])
+
+    async def test_threat_summary_from_rollups(self):
+        for timestamp, severity in (('2024-01-01 22:10:00', 'high'), ('2024-01-02 12:00:00', 'medium'),
+                                    ('2024-01-05 09:00:00', 'medium')):
+            await self.db.queue_threat(1, 2, 'spam', severity=severity)
+            self.db._pending_threats[-1]['timestamp'] = timestamp
+        await self.db.queue_threat(1, 2, 'raid')
+        self.db._pending_threats[-1]['timestamp'] = '2024-01-02 13:00:00'
+
+        # قبل الكتابة تُقرأ من الطابور، وبعدها من جداول التجميع
+        for flush in (False, True):
+            if flush:
+                await self.db.flush_pending_writes()
+                await self.db.flush_stats()
+
+            summary = await self.db.get_threat_summary(1, datetime(2024, 1, 1, 22), datetime(2024, 1, 3))
+            self.assertEqual(summary, {'total': 3, 'high': 1, 'by_type': {'spam': 2, 'raid': 1}})
+
+        self.assertEqual(await self.db.get_total_threats_count(1), 4)
+
+    async def test_failed_flush_does_not_double_count(self):
+        await self.db.queue_threat(1, 2, 'spam', severity='high')
+        await self.db.queue_threat(1, 3, 'spam')
+
+        with patch.object(self.db.db, 'commit', AsyncMock(side_effect=RuntimeError('boom'))):
+            with self.assertRaises(RuntimeError):
+                await self.db.flush_pending_writes()
+        self.assertEqual(self.db.get_pending_stats(1)['threats_detected'], 0)
+        self.assertFalse(self.db._pending_threat_rollups)
+
+        self.assertEqual(await self.db.flush_pending_writes(), 2)
+        self.assertEqual(self.db.get_pending_stats(1)['threats_detected'], 2)
+        await self.db.flush_stats()
+
+        summary = await self.db.get_threat_summary(1, datetime(2000, 1, 1), datetime(2100, 1, 1))
+        self.assertEqual(summary, {'total': 2, 'high': 1, 'by_type': {'spam': 2}})
+
+    async def test_scan_rollup_feeds_guild_stats(self):
+        self.db.record_link_scan(1, False)
+        self.db.record_link_scan(1, True)
+        await self.db.flush_stats()
+        self.db.record_link_scan(1, True)
+
+        now = datetime.utcnow()
+        self.assertEqual(await self.db.get_scan_summary(1, now, now), {'scanned': 3, 'malicious': 2})
+
+        stats = await self.db.get_guild_security_stats(1)
+        self.assertEqual((stats['scanned_links'], stats['malicious_links']), (3, 2))
+
+class TestIncidentAggregation(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp_dir.name, 'test.db'), incident_window=60)
+        self.db.write_flush_interval = 60
+        await self.db.initialize()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def _incidents(self):
+        async with self.db.db.execute(
+            'SELECT user_id, threat_type, occurrences FROM threats ORDER BY user_id, threat_type'
+        ) as cursor:
+            return [tuple(row) for row in await cursor.fetchall()]
+
+    async def test_repeats_collapse_before_and_after_flush(self):
+        for count in range(3):
+            await self.db.queue_threat(1, 2, 'spam', f'تكرار الرسالة {count + 3} مرات')
+        await self.db.queue_threat(1, 2, 'raid')
+        await self.db.queue_threat(1, 3, 'spam', 'تكرار الرسالة 3 مرات')
+
+        self.assertEqual(self.db.get_pending_threats(1, 2)[0]['occurrences'], 3)
+        await self.db.flush_pending_writes()
+
+        # تكرار بعد كتابة الصف يصبح تحديثاً وليس إدراجاً
+        await self.db.queue_threat(1, 2, 'spam', 'تكرار الرسالة 9 مرات')
+        self.assertEqual(self.db.get_pending_writes_count(), 1)
+        await self.db.flush_pending_writes()
+
+        self.assertEqual(await self._incidents(), [(2, 'raid', 1), (2, 'spam', 4), (3, 'spam', 1)])
+        self.assertEqual(self.db.incidents_merged, 3)
+        self.assertEqual(self.db.get_pending_stats(1)['threats_detected'], 6)
+
+    async def test_window_closes_incident(self):
+        await self.db.queue_threat(1, 2, 'spam')
+        for incident in self.db._open_incidents.values():
+            incident['opened_at'] -= 61
+        self.assertEqual(self.db._incident_expiry.run_due(time.monotonic() + 61), 1)
+
+        await self.db.queue_threat(1, 2, 'spam')
+        await self.db.flush_pending_writes()
+
+        self.assertEqual(await self._incidents(), [(2, 'spam', 1), (2, 'spam', 1)])
+        self.assertEqual(self.db._open_incidents.keys(), {(1, 2, 'spam', self.db._content_fingerprint(None))})
+
+    async def test_continuous_spam_starts_new_incident_each_window(self):
+        # التكرار كل 31 ثانية لا يمدد النافذة: بعد 60 ثانية من أول ظهور يبدأ صف جديد
+        for _ in range(3):
+            await self.db.queue_threat(1, 2, 'spam')
+            for incident in self.db._open_incidents.values():
+                incident['opened_at'] -= 31
+        await self.db.flush_pending_writes()
+
+        self.assertCountEqual(await self._incidents(), [(2, 'spam', 2), (2, 'spam', 1)])
+        self.assertEqual(self.db.get_pending_stats(1)['threats_detected'], 3)
+
+    async def test_partitions_gain_incident_columns(self):
+        async with aiosqlite.connect(os.path.join(self.tmp_dir.name, 'legacy.db')) as legacy:
+            await run_migrations(legacy, MIGRATIONS[:6])
+            partition = f"threats_{datetime.utcnow():%Y%m}"
+            await legacy.execute(f"INSERT INTO {partition} (guild_id, user_id, threat_type) VALUES (1, 2, 'spam')")
+            await legacy.commit()
+            await run_migrations(legacy)
+            async with legacy.execute('SELECT occurrences FROM threats') as cursor:
+                self.assertEqual(await cursor.fetchall(), [(1,)])
+
+if __name__ == '__main__':
+    unittest.main()
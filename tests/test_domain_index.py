@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from security.domain_index import DomainIndex, DomainTrie, normalize_host
+from security.link_guardian import LinkGuardian
+
+class TestDomainTrie(unittest.TestCase):
+    def test_matches_host_and_parent_domains_only(self):
+        trie = DomainTrie(['malware.com', 'Bad.Example.org.'])
+
+        self.assertEqual(trie.match('evil.malware.com'), 'malware.com')
+        self.assertEqual(trie.match('malware.com'), 'malware.com')
+        self.assertEqual(trie.match('x.bad.example.org'), 'bad.example.org')
+        self.assertIsNone(trie.match('notmalware.com'))
+        self.assertIsNone(trie.match('example.org'))
+        self.assertEqual(len(trie), 2)
+
+    def test_discard_prunes_without_touching_siblings(self):
+        trie = DomainTrie(['a.example.com', 'b.example.com'])
+
+        self.assertTrue(trie.discard('a.example.com'))
+        self.assertFalse(trie.discard('a.example.com'))
+        self.assertIsNone(trie.match('x.a.example.com'))
+        self.assertEqual(trie.match('b.example.com'), 'b.example.com')
+        self.assertNotIn('example.com', trie)
+
+    def test_normalize_host(self):
+        self.assertEqual(normalize_host('User:pw@CDN.Discord.com:443'), 'cdn.discord.com')
+        self.assertEqual(normalize_host('[::1]:8080'), '::1')
+
+class TestDomainIndex(unittest.TestCase):
+    def test_guild_overlay_applies_only_to_its_guild(self):
+        index = DomainIndex()
+        index.add('whitelist', 'global.example')
+        index.add('whitelist', 'partner.example', guild_id=42)
+
+        self.assertEqual(index.match('whitelist', 'cdn.partner.example', 42), 'partner.example')
+        self.assertIsNone(index.match('whitelist', 'cdn.partner.example', 7))
+        self.assertEqual(index.match('whitelist', 'www.global.example', 7), 'global.example')
+        self.assertEqual(index.count('whitelist'), 2)
+
+class TestLinkGuardianDomains(unittest.IsolatedAsyncioTestCase):
+    async def test_basic_check_uses_parent_domains(self):
+        guardian = LinkGuardian('test_api_key')
+        guardian.add_to_blacklist('malware.com')
+
+        blocked = await guardian._basic_url_check('https://evil.malware.com/x')
+        safe = await guardian._basic_url_check('https://cdn.discordapp.com/attachments/1')
+
+        self.assertEqual(blocked['threats'], ['blacklisted_domain'])
+        self.assertEqual((safe['threat_level'], safe['threats']), ('safe', []))
+
+    async def test_guild_blacklist_overlay_blocks_without_caching(self):
+        guardian = LinkGuardian('test_api_key')
+        guardian._check_cache = AsyncMock(return_value=None)
+        guardian._save_scan_result = AsyncMock()
+        guardian.add_to_blacklist('rival.example', guild_id=42)
+
+        with patch('security.link_guardian.db_manager.get_whitelisted_domains', AsyncMock(return_value=[])):
+            blocked = await guardian.quick_verdict('https://cdn.rival.example/x', 42)
+            other = await guardian._basic_url_check('https://cdn.rival.example/x', 7)
+
+        self.assertTrue(blocked['is_malicious'])
+        self.assertEqual(blocked['threats'], ['blacklisted_domain'])
+        # حكم خاص بالسيرفر لا يدخل الكاش العام
+        guardian._save_scan_result.assert_not_called()
+        self.assertNotIn('blacklisted_domain', other['threats'])
+
+    async def test_guild_whitelist_loaded_before_first_scan(self):
+        guardian = LinkGuardian('test_api_key')
+        guardian._check_cache = AsyncMock(return_value=None)
+        lists = AsyncMock(return_value=['partner.example'])
+
+        with patch('security.link_guardian.db_manager.get_whitelisted_domains', lists):
+            first = await guardian.quick_verdict('https://www.partner.example/', 42)
+            await guardian.quick_verdict('https://partner.example/again', 42)
+
+        self.assertTrue(first['whitelisted'])
+        lists.assert_awaited_once_with(42)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import time
+import unittest
+from collections import deque
+from datetime import datetime, timedelta
+
+from core.expiry import ExpiryGroup, ExpiryScheduler
+from core.cache import LRUNamespace
+from security.threat_analyzer import ThreatAnalyzer
+
+class TestExpiryGroup(unittest.TestCase):
+    def setUp(self):
+        self.expired = []
+        self.group = ExpiryGroup('test', self.expired.append)
+
+    def test_runs_only_due_keys_in_order(self):
+        now = time.monotonic()
+        self.group.schedule_at('late', now + 60)
+        self.group.schedule_at('b', now - 1)
+        self.group.schedule_at('a', now - 2)
+
+        self.assertEqual(self.group.run_due(now), 2)
+        self.assertEqual(self.expired, ['a', 'b'])
+        self.assertEqual(len(self.group), 1)
+
+    def test_reschedule_and_cancel_skip_old_deadlines(self):
+        now = time.monotonic()
+        self.group.schedule_at('moved', now - 1)
+        self.group.schedule_at('moved', now + 60)
+        self.group.schedule_at('cancelled', now - 1)
+        self.group.cancel('cancelled')
+
+        self.assertEqual(self.group.run_due(now), 0)
+        self.assertEqual(self.expired, [])
+        self.assertEqual(self.group.next_deadline(), now + 60)
+
+    def test_limit_spreads_work(self):
+        now = time.monotonic()
+        for key in range(10):
+            self.group.schedule_at(key, now - 1)
+
+        self.assertEqual(self.group.run_due(now, limit=4), 4)
+        self.assertEqual(self.group.run_due(now, limit=4), 4)
+        self.assertEqual(self.group.run_due(now), 2)
+
+    def test_handler_delay_reschedules(self):
+        group = ExpiryGroup('retry', lambda key: 30)
+        group.schedule('a', 0)
+
+        self.assertEqual(group.run_due(), 1)
+        self.assertEqual(len(group), 1)
+        self.assertGreater(group.next_deadline(), time.monotonic() + 29)
+
+    def test_heap_compacts_replaced_deadlines(self):
+        for _ in range(3000):
+            self.group.schedule('hot', 60)
+
+        self.assertLessEqual(self.group.get_stats()['heap_size'], 1026)
+
+class TestSchedulerIntegration(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = ExpiryScheduler()
+
+    def test_cache_namespace_expires_through_scheduler(self):
+        namespace = LRUNamespace(ttl=60, max_entries=10, max_bytes=1024)
+        namespace.expiry = self.scheduler.group('cache:test', namespace.expire)
+        namespace.set('old', 1, ttl=-1)
+        namespace.set('fresh', 2)
+        namespace.set('gone', 3, ttl=-1)
+        namespace.delete('gone')
+
+        self.assertEqual(self.scheduler.run_due(), 1)
+        self.assertNotIn('old', namespace)
+        self.assertIn('fresh', namespace)
+        self.assertEqual(namespace.expirations, 1)
+        self.assertEqual(self.scheduler.get_stats()['cache:test']['scheduled'], 1)
+
+    def test_threat_memory_trims_oldest_and_reschedules(self):
+        analyzer = ThreatAnalyzer()
+        decay = analyzer.threat_categories['spam']['decay_time']
+        now = datetime.utcnow()
+        analyzer.threat_memory['spam'] = deque([
+            {'data': {}, 'severity': 'low', 'timestamp': now - decay - timedelta(seconds=1)},
+            {'data': {}, 'severity': 'low', 'timestamp': now - decay + timedelta(seconds=60)}
+        ])
+
+        delay = analyzer._cleanup_old_threats('spam')
+
+        self.assertEqual(len(analyzer.threat_memory['spam']), 1)
+        self.assertAlmostEqual(delay, 60, delta=5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from core.database import DatabaseManager
+from core.export import StreamingExporter
+
+class TestStreamingExporter(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp_dir.name, 'test.db'))
+        self.db.write_flush_interval = 60
+        await self.db.initialize()
+
+        for i in range(7):
+            await self.db.queue_threat(1, i, 'spam', f'رسالة {i}')
+        await self.db.queue_threat(2, 1, 'spam')
+        await self.db.add_danger_points(1, 3, 50)
+
+        self.end_date = datetime.utcnow() + timedelta(minutes=1)
+        self.start_date = self.end_date - timedelta(days=1)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    def _exporter(self, export_format):
+        return StreamingExporter(1, self.start_date, self.end_date, export_format,
+                                 output_dir=Path(self.tmp_dir.name), database=self.db)
+
+    async def test_ndjson_export(self):
+        exporter = self._exporter('ndjson')
+        paths = await exporter.export({'period_days': 1})
+
+        with gzip.open(paths[0], 'rt', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual(records[0]['record'], 'export')
+        self.assertEqual(len([r for r in records if r['record'] == 'threats']), 7)
+        self.assertEqual(records[-1], {'record': 'statistics', 'total_threats': 7,
+                                       'total_scanned_links': 0, 'high_risk_users': 1})
+
+    async def test_csv_export_writes_file_per_table(self):
+        paths = await self._exporter('csv').export()
+        self.assertEqual(len(paths), 2)
+
+        with gzip.open(paths[0], 'rt', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[-1]['content'], 'رسالة 0')
+
+    async def test_export_excludes_other_guilds_data(self):
+        await self.db.add_scanned_link('other', 'https://guild-two.example/secret', True)
+        await self.db.add_danger_points(2, 9, 40)
+        self.db.record_link_scan(1, False)
+        self.db.record_link_scan(2, True)
+
+        paths = await self._exporter('ndjson').export()
+        with gzip.open(paths[0], 'rt', encoding='utf-8') as f:
+            content = f.read()
+        records = [json.loads(line) for line in content.splitlines()]
+
+        self.assertNotIn('guild-two.example', content)
+        self.assertEqual({r['guild_id'] for r in records if 'guild_id' in r}, {1})
+        self.assertEqual(records[-1]['total_scanned_links'], 1)
+
+    async def test_iter_rows_streams_in_batches(self):
+        await self.db.flush_pending_writes()
+        rows = [row async for row in self.db.iter_rows('SELECT id FROM threats', batch_size=2)]
+        self.assertEqual(len(rows), 8)
+
+    def test_unknown_format_rejected(self):
+        with self.assertRaises(ValueError):
+            StreamingExporter(1, self.start_date, self.end_date, 'xml', output_dir=Path('.'))
+
+if __name__ == '__main__':
+    unittest.main()
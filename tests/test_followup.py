@@ -0,0 +1,200 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import discord
+
+from bot.events import EventHandler
+from security.followup_queue import FollowUpQueue
+from security.link_guardian import LinkGuardian
+
+class TestFollowUpQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.resolved = []
+        self.release = asyncio.Event()
+
+        async def resolve(url_hash, url):
+            self.resolved.append(url_hash)
+            await self.release.wait()
+            return {'url': url, 'is_safe': False}
+
+        self.queue = FollowUpQueue(resolve, max_size=2, workers=1, max_waiters=2)
+
+    async def asyncTearDown(self):
+        await self.queue.stop()
+
+    async def test_same_url_resolved_once_for_all_waiters(self):
+        received = []
+
+        async def waiter(result):
+            received.append(result['url'])
+
+        self.assertTrue(self.queue.submit('h1', 'https://a.com', waiter))
+        self.assertTrue(self.queue.submit('h1', 'https://a.com', waiter))
+        self.assertFalse(self.queue.submit('h1', 'https://a.com', waiter))  # حد المنتظرين
+
+        self.queue.start()
+        self.release.set()
+        await self.queue.join()
+
+        self.assertEqual(self.resolved, ['h1'])
+        self.assertEqual(received, ['https://a.com', 'https://a.com'])
+        stats = self.queue.get_stats()
+        self.assertEqual((stats['enqueued'], stats['attached'], stats['dropped']), (1, 1, 1))
+        self.assertEqual(stats['pending'], 0)
+
+    async def test_full_queue_drops_and_failures_are_counted(self):
+        async def broken(result):
+            raise RuntimeError('boom')
+
+        self.assertTrue(self.queue.submit('h1', 'https://a.com', broken))
+        self.assertTrue(self.queue.submit('h2', 'https://b.com', broken))
+        self.assertFalse(self.queue.submit('h3', 'https://c.com', broken))
+
+        self.queue.start()
+        self.release.set()
+        await self.queue.join()
+
+        # خطأ المنتظر لا يوقف العامل
+        self.assertEqual(self.resolved, ['h1', 'h2'])
+        self.assertEqual(self.queue.get_stats()['completed'], 2)
+        self.assertEqual(self.queue.get_stats()['dropped'], 1)
+
+class TestQuickVerdict(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.guardian = LinkGuardian('test_api_key')
+        self.guardian._check_cache = AsyncMock(return_value=None)
+        self.guardian._save_scan_result = AsyncMock()
+        self.guardian.followups.start()
+        lists_patch = patch('security.link_guardian.db_manager.get_whitelisted_domains', AsyncMock(return_value=[]))
+        lists_patch.start()
+        self.addCleanup(lists_patch.stop)
+
+    async def asyncTearDown(self):
+        await self.guardian.followups.stop()
+
+    async def test_blacklisted_url_is_final_without_network(self):
+        self.guardian.add_to_blacklist('malware.com')
+        self.guardian._check_url_content = AsyncMock()
+        on_final = AsyncMock()
+
+        result = await self.guardian.quick_verdict('https://malware.com/x', 1, on_final=on_final)
+
+        self.assertFalse(result['is_safe'])
+        self.assertNotIn('provisional', result)
+        self.guardian._save_scan_result.assert_awaited_once()
+        self.guardian._check_url_content.assert_not_called()
+        on_final.assert_not_called()
+
+    async def test_remote_verdict_follows_provisional_result(self):
+        vt_result = {'positive_detections': 4, 'scan_engines': 70, 'threat_names': ['phishing']}
+        self.guardian.vt_api.scan_url = AsyncMock(return_value=vt_result)
+        self.guardian._check_url_content = AsyncMock(return_value={'threats': [], 'details': {}})
+        finals = []
+
+        async def on_final(result):
+            finals.append(result)
+
+        with patch('security.link_guardian.Config.VIRUSTOTAL_API_KEY', 'key'):
+            result = await self.guardian.quick_verdict('https://example.com/login', 1, on_final=on_final)
+            self.assertTrue(result['provisional'])
+            self.assertTrue(result['followup'])
+            self.assertTrue(result['is_safe'])
+            await self.guardian.followups.join()
+
+        self.assertEqual(len(finals), 1)
+        self.assertFalse(finals[0]['is_safe'])
+        self.assertIn('phishing', finals[0]['threats'])
+        # الحكم النهائي يُحفظ في الكاش والقاعدة
+        self.guardian._save_scan_result.assert_awaited_once()
+
+class TestLinkModeration(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.guardian = LinkGuardian('test_api_key')
+        self.guardian._check_cache = AsyncMock(return_value=None)
+        self.guardian._save_scan_result = AsyncMock()
+        self.guardian.followups.start()
+        lists_patch = patch('security.link_guardian.db_manager.get_whitelisted_domains', AsyncMock(return_value=[]))
+        lists_patch.start()
+        self.addCleanup(lists_patch.stop)
+
+        bot = MagicMock()
+        bot.link_guardian = self.guardian
+        bot.stats = {'threats_blocked': 0}
+        bot.send_security_alert = AsyncMock()
+        self.bot = bot
+        # التسجيل في discord ليس موضوع الاختبار
+        with patch.object(EventHandler, '_register_events'):
+            self.handler = EventHandler(bot)
+
+        self.db = MagicMock()
+        self.db.queue_threat = AsyncMock()
+        self.db.queue_danger_points = AsyncMock()
+        db_patch = patch('bot.events.db_manager', self.db)
+        db_patch.start()
+        self.addCleanup(db_patch.stop)
+
+    async def asyncTearDown(self):
+        await self.guardian.followups.stop()
+
+    def _message(self, content):
+        message = MagicMock()
+        message.content = content
+        message.guild.id = 1
+        message.author.id = 42
+        message.delete = AsyncMock()
+        message.channel.send = AsyncMock()
+        return message
+
+    async def _scan(self, message, vt_result=None):
+        self.guardian.vt_api.scan_url = AsyncMock(return_value=vt_result)
+        with patch('security.link_guardian.Config.VIRUSTOTAL_API_KEY', 'key' if vt_result else ''):
+            await self.handler._scan_message_links(message)
+            await self.guardian.followups.join()
+
+    async def test_heuristic_only_link_is_not_deleted(self):
+        self.guardian._check_url_content = AsyncMock(return_value={'threats': [], 'details': {}})
+        message = self._message('check https://bit.ly/abc')
+
+        await self._scan(message)
+
+        message.delete.assert_not_called()
+        self.db.queue_danger_points.assert_not_called()
+        self.db.record_link_scan.assert_called_once_with(1, False)
+
+    async def test_content_timeout_is_not_deleted(self):
+        self.guardian._check_url_content = AsyncMock(
+            return_value={'threats': ['connection_timeout'], 'details': {'timeout': True}}
+        )
+        message = self._message('https://example.com/page')
+
+        await self._scan(message, vt_result={'positive_detections': 0, 'scan_engines': 70})
+
+        message.delete.assert_not_called()
+        self.assertEqual(self.bot.stats['threats_blocked'], 0)
+
+    async def test_remote_detection_deletes_once_even_if_message_is_gone(self):
+        self.guardian._check_url_content = AsyncMock(return_value={'threats': [], 'details': {}})
+        message = self._message('https://example.com/login')
+        message.delete.side_effect = discord.NotFound(MagicMock(status=404, reason='Not Found'), 'gone')
+
+        await self._scan(message, vt_result={'positive_detections': 5, 'scan_engines': 70, 'threat_names': ['phishing']})
+
+        message.delete.assert_awaited_once()
+        self.db.queue_danger_points.assert_awaited_once_with(1, 42, 5)
+        self.assertEqual(self.bot.stats['threats_blocked'], 1)
+
+    async def test_full_queue_falls_back_to_bounded_scan(self):
+        self.guardian._check_url_content = AsyncMock(return_value={'threats': [], 'details': {}})
+        message = self._message('https://example.com/login')
+
+        with patch.object(self.guardian.followups, 'submit', return_value=False):
+            await self._scan(message, vt_result={'positive_detections': 5, 'scan_engines': 70})
+
+        message.delete.assert_awaited_once()
+        self.db.record_link_scan.assert_called_once_with(1, True)
+        self.guardian._save_scan_result.assert_awaited_once()
+        self.assertEqual(self.guardian.get_stats()['followups']['fallbacks'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from core.http import HttpClientHub
+
+async def ok(request):
+    return web.Response(text='ok')
+
+class TestHttpClientHub(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        app = web.Application()
+        app.router.add_get('/', ok)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+        self.hub = HttpClientHub(limit=10, limit_per_host=2, dns_ttl=60, keepalive=30)
+        self.hub.register('probe', total_timeout=5)
+        self.hub.register('intel', total_timeout=20)
+
+    async def asyncTearDown(self):
+        await self.hub.close()
+        await self.server.close()
+
+    async def test_profiles_share_pooled_connections(self):
+        url = str(self.server.make_url('/'))
+        for name in ('probe', 'probe', 'intel'):
+            async with self.hub.session(name).get(url) as response:
+                self.assertEqual(await response.text(), 'ok')
+
+        probe = self.hub.get_stats()['profiles']['probe']
+        intel = self.hub.get_stats()['profiles']['intel']
+        self.assertEqual((probe['requests'], probe['connections_created'], probe['connections_reused']), (2, 1, 1))
+        # الملف الثاني يعيد استخدام اتصال الأول عبر الموصل المشترك
+        self.assertEqual((intel['connections_created'], intel['connections_reused']), (0, 1))
+        self.assertEqual(probe['latency_ms']['count'], 2)
+
+    async def test_profile_settings_and_close(self):
+        session = self.hub.session('intel')
+        self.assertEqual(session.timeout.total, 20)
+        self.assertIs(self.hub.session('intel'), session)
+
+        await self.hub.close()
+        self.assertTrue(session.closed)
+        self.assertFalse(self.hub.started)
+
+if __name__ == '__main__':
+    unittest.main()
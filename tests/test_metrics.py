@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from core.database import DatabaseManager
+from core.metrics import Histogram
+from core.query_metrics import normalize_sql
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles_within_bucket_precision(self):
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.record(float(value))
+
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.percentile(50), 50, delta=50 * 0.25)
+        self.assertAlmostEqual(histogram.percentile(99), 99, delta=99 * 0.25)
+        self.assertEqual(histogram.percentile(100), 100)
+
+    def test_memory_is_bounded(self):
+        histogram = Histogram()
+        for value in range(10000):
+            histogram.record(value / 10)
+        self.assertEqual(len(histogram.buckets), len(histogram.bounds) + 1)
+
+    def test_normalize_sql_groups_partitions(self):
+        self.assertEqual(
+            normalize_sql('SELECT *\n   FROM threats_202401 WHERE  id = ?'),
+            'SELECT * FROM threats_* WHERE id = ?'
+        )
+
+class TestQueryMetrics(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp_dir.name, 'test.db'), read_pool_size=1)
+        await self.db.initialize()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def test_disabled_by_default(self):
+        await self.db.get_recent_threats(1)
+        self.assertEqual(self.db.metrics.snapshot()['methods'], {})
+
+    async def test_records_methods_and_statements(self):
+        self.db.metrics.enabled = True
+        await self.db.add_threat(1, 2, 'spam')
+        await self.db.add_threat(1, 2, 'spam')
+        rows = await self.db.get_recent_threats(1)
+
+        snapshot = self.db.metrics.snapshot()
+        self.assertEqual(snapshot['methods']['add_threat']['calls'], 2)
+        self.assertEqual(snapshot['methods']['get_recent_threats']['rows'], len(rows))
+
+        select = [sql for sql in snapshot['statements'] if sql.startswith('SELECT * FROM threats_*')]
+        self.assertEqual(snapshot['statements'][select[0]]['rows'], 2)
+
+    async def test_slow_query_log(self):
+        self.db.metrics.enabled = True
+        self.db.metrics.slow_query_ms = 0
+        await self.db.get_total_threats_count(1)
+
+        slow = self.db.metrics.snapshot()['slow_queries']
+        self.assertIn('get_total_threats_count', [entry['name'] for entry in slow])
+        self.assertTrue(any(entry['operation'] == 'get_total_threats_count'
+                            for entry in slow if entry['kind'] == 'statement'))
+
+if __name__ == '__main__':
+    unittest.main()
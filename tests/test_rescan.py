@@ -0,0 +1,112 @@
+import asyncio
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from config import Config
+from core.cache import CacheManager
+from security.link_guardian import LinkGuardian
+from security.rescan_queue import RescanQueue
+
+def scanned_row(is_malicious: bool, age: timedelta) -> dict:
+    return {
+        'original_url': 'https://example.com/',
+        'is_malicious': is_malicious,
+        'virustotal_score': 0,
+        'scan_date': (datetime.utcnow() - age).strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+class TestVerdictTTL(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = CacheManager(self.tmp_dir.name)
+        self.cache_patch = patch('security.link_guardian.cache_manager', self.cache)
+        self.cache_patch.start()
+        self.guardian = LinkGuardian('test_api_key')
+
+    async def asyncTearDown(self):
+        self.cache_patch.stop()
+        await self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_ttl_depends_on_verdict(self):
+        self.assertEqual(self.guardian._verdict_ttl({'is_safe': True}), Config.LINK_TTL_SAFE)
+        self.assertEqual(self.guardian._verdict_ttl({'is_safe': False}), Config.LINK_TTL_MALICIOUS)
+        self.assertEqual(
+            self.guardian._verdict_ttl({'is_safe': False, 'threat_level': 'unknown', 'threats': ['scan_error']}),
+            Config.LINK_TTL_UNKNOWN
+        )
+
+    async def test_expired_database_verdict_is_not_served(self):
+        old_safe = scanned_row(False, timedelta(seconds=Config.LINK_TTL_SAFE + 60))
+        with patch('security.link_guardian.db_manager.get_scanned_link', AsyncMock(return_value=old_safe)):
+            self.assertIsNone(await self.guardian._check_cache('hash'))
+
+        old_malicious = scanned_row(True, timedelta(seconds=Config.LINK_TTL_SAFE + 60))
+        with patch('security.link_guardian.db_manager.get_scanned_link', AsyncMock(return_value=old_malicious)):
+            result = await self.guardian._check_cache('hash')
+
+        self.assertFalse(result['is_safe'])
+        remaining = self.cache.remaining_ttl('url_scan', 'hash')
+        self.assertLess(remaining, Config.LINK_TTL_MALICIOUS - Config.LINK_TTL_SAFE)
+
+    async def test_hot_url_near_expiry_is_queued_once(self):
+        result = {'url': 'https://example.com/', 'is_safe': True}
+        await self.cache.set('url_scan', 'hot', result, ttl=Config.LINK_TTL_SAFE * 0.1)
+        await self.cache.set('url_scan', 'fresh', result, ttl=Config.LINK_TTL_SAFE)
+
+        for _ in range(Config.LINK_RESCAN_MIN_HITS * 2):
+            await self.guardian._check_cache('hot')
+            await self.guardian._check_cache('fresh')
+
+        self.assertEqual(len(self.guardian.rescan_queue), 1)
+        self.assertEqual(self.guardian.rescan_queue.get_stats()['enqueued'], 1)
+
+    async def test_warm_up_loads_live_verdicts_and_whitelists(self):
+        rows = [
+            dict(scanned_row(True, timedelta(hours=1)), url_hash='bad'),
+            dict(scanned_row(False, timedelta(seconds=Config.LINK_TTL_SAFE + 60)), url_hash='stale')
+        ]
+
+        async def iter_rows(limit):
+            for row in rows[:limit]:
+                yield row
+
+        with patch('security.link_guardian.db_manager') as db:
+            db.get_all_whitelisted_domains = AsyncMock(return_value={0: ['global.example'], 42: ['guild.example']})
+            db.get_database_stats = AsyncMock(return_value={'scanned_links': 2})
+            db.iter_recent_scanned_links = iter_rows
+            await self.guardian.warm_up(limit=10)
+
+        progress = self.guardian.warmup_progress
+        self.assertEqual((progress['state'], progress['loaded'], progress['skipped'], progress['total']), ('done', 1, 1, 2))
+        self.assertFalse((await self.cache.get('url_scan', 'bad'))['is_safe'])
+        self.assertIsNone(await self.cache.get('url_scan', 'stale'))
+        self.assertTrue(self.guardian.is_whitelisted('guild.example', 42))
+        self.assertFalse(self.guardian.is_whitelisted('guild.example', 7))
+        self.assertTrue(self.guardian.is_whitelisted('global.example'))
+
+class TestRescanQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_dedupes_bounds_and_processes(self):
+        rescanned = []
+
+        async def rescan(url_hash, url):
+            rescanned.append(url_hash)
+
+        queue = RescanQueue(rescan, max_size=2)
+        self.assertTrue(queue.submit('a', 'https://a.example'))
+        self.assertFalse(queue.submit('a', 'https://a.example'))
+        self.assertTrue(queue.submit('b', 'https://b.example'))
+        self.assertFalse(queue.submit('c', 'https://c.example'))
+
+        queue.start()
+        await asyncio.wait_for(queue.join(), 1)
+        await queue.stop()
+
+        self.assertEqual(rescanned, ['a', 'b'])
+        self.assertEqual(queue.get_stats()['dropped'], 1)
+        self.assertTrue(queue.submit('a', 'https://a.example'))
+
+if __name__ == '__main__':
+    unittest.main()
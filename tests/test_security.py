@@ -1,4 +1,6 @@
+import asyncio
 import unittest
+from datetime import timedelta
 from unittest.mock import AsyncMock, MagicMock, patch
 import discord
 from security.threat_analyzer import ThreatAnalyzer
@@ -26,6 +28,17 @@ class TestThreatAnalyzer(unittest.TestCase):
         self.assertIsInstance(result, dict)
         self.assertIn('risk_score', result)
 
+    def test_expired_threats_pruned_without_scheduler(self):
+        for age in (timedelta(hours=30), timedelta(hours=25)):
+            self.analyzer._update_threat_memory({'indicators': ['a', 'b']}, 'spam', 'low')
+            self.analyzer.threat_memory['spam'][-1]['timestamp'] -= age
+        self.assertEqual(asyncio.run(self.analyzer._find_related_threats({'indicators': ['a', 'b']})), [])
+        self.assertEqual(len(self.analyzer.threat_memory['spam']), 0)
+        
+        self.analyzer._update_threat_memory({'indicators': ['a', 'b']}, 'spam', 'low')
+        related = asyncio.run(self.analyzer._find_related_threats({'indicators': ['a', 'b']}))
+        self.assertEqual([threat['type'] for threat in related], ['spam'])
+
 class TestLinkGuardian(unittest.TestCase):
     def setUp(self):
         self.guardian = LinkGuardian('test_api_key')
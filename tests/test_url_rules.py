@@ -0,0 +1,57 @@
+import unittest
+
+from security.link_guardian import LinkGuardian
+from security.url_rules import UrlRuleEngine, benchmark, extract_anchor
+
+class TestUrlRuleEngine(unittest.TestCase):
+    def test_anchor_extraction(self):
+        self.assertEqual(extract_anchor(r'tinyurl\.com'), 'tinyurl.com')
+        self.assertEqual(extract_anchor(r'steam.*community.*gift'), 'community')
+        self.assertEqual(extract_anchor(r'colou?r-scheme'), 'r-scheme')
+        self.assertIsNone(extract_anchor(r'abc|def'))
+        self.assertIsNone(extract_anchor(r'[0-9]+\.[0-9]+'))
+
+    def test_returns_every_matching_rule_in_order(self):
+        engine = UrlRuleEngine({
+            'short': r'abc',
+            'long': r'abcdef',
+            'nitro': r'free.*nitro',
+            'digits': r'\d{4}',
+        })
+
+        self.assertEqual(engine.match('https://x.com/abcdefg/2024'), ['short', 'long', 'digits'])
+        self.assertEqual(engine.match('https://FREE-x-Nitro.com/'), ['nitro'])
+        self.assertEqual(engine.match('https://example.com/'), [])
+
+    def test_suspicious_tld_only_matches_host(self):
+        guardian = LinkGuardian('test_api_key')
+
+        self.assertEqual(guardian._check_suspicious_patterns('https://example.com/page.html')['threats'], [])
+        self.assertEqual(
+            guardian._check_suspicious_patterns('https://freegiftsnow.tk/claim')['threats'],
+            ['suspicious_pattern_suspicious_tld']
+        )
+
+    def test_checked_rules_stay_flat_as_rules_grow(self):
+        def rules(count):
+            generated = {f'scam_domain_{i}': rf'scam-site-{i}\.com' for i in range(count // 2)}
+            generated.update({f'phish_path_{i}': rf'login.*verify-{i}' for i in range(count - count // 2)})
+            return generated
+
+        small, large = UrlRuleEngine(rules(10)), UrlRuleEngine(rules(500))
+        urls = ['https://example.com/some/long/path?query=value', 'https://discord.gift/abcdef123456',
+                'https://scam-site-3.com/login/verify-2']
+
+        # التعبير الكامل يُتحقق فقط للقواعد التي ظهرت مرساتها، مهما زاد عدد القواعد
+        for url in urls:
+            self.assertEqual(large._candidates(url.lower()), small._candidates(url.lower()))
+        self.assertEqual(large._candidates('https://scam-site-3.com/login/verify-2'),
+                         {'scam_domain_3', 'phish_path_2'})
+        self.assertEqual(large._candidates('https://scam-site-42.com/'), {'scam_domain_42'})
+        self.assertEqual(large.match('https://scam-site-42.com/'), ['scam_domain_42'])
+
+    def test_benchmark_reports_each_rule_count(self):
+        self.assertEqual(set(benchmark((10, 20), urls=['https://example.com/'], rounds=1)), {10, 20})
+
+if __name__ == '__main__':
+    unittest.main()
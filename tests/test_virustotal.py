@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from api.virustotal import VirusTotalAPI
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status = 200
+        self._payload = payload
+
+    async def json(self):
+        return self._payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+class FakeSession:
+    """تقرير معلق دائماً حتى يُطلب غير ذلك"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None):
+        self.calls.append('report')
+        return FakeResponse({'response_code': -2})
+
+    def post(self, url, data=None):
+        self.calls.append('submit')
+        return FakeResponse({'scan_id': 'scan-1'})
+
+class TestVirusTotalScanUrl(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.api = VirusTotalAPI('key')
+        self.api.session = FakeSession()
+        sleep_patch = patch('api.virustotal.asyncio.sleep', AsyncMock())
+        self.sleep = sleep_patch.start()
+        self.addCleanup(sleep_patch.stop)
+
+    async def test_every_request_is_charged_to_the_rate_limit(self):
+        result = await self.api.scan_url('https://example.com')
+
+        # تقرير + إرسال + متابعتان، ثم تتوقف المتابعة الثالثة عند حد 4 طلبات في الدقيقة
+        self.assertEqual(self.api.session.calls, ['report', 'submit', 'report', 'report'])
+        self.assertEqual(self.api.rate_limit['request_count'], 4)
+        self.assertEqual(result['scan_engines'], 0)
+
+    async def test_polling_stops_at_callers_budget(self):
+        await self.api.scan_url('https://example.com', budget=2.5)
+
+        # متابعة واحدة فقط تتسع في 2.5 ثانية (انتظار 1 + طلب)
+        self.assertEqual(self.api.session.calls, ['report', 'submit', 'report'])
+        self.sleep.assert_awaited_once_with(1)
+
+    async def test_rate_limited_report_skips_submit(self):
+        self.api.rate_limit['request_count'] = self.api.rate_limit['requests_per_minute']
+        self.api.rate_limit['last_request_time'] = float('inf')
+
+        self.assertIsNone(await self.api.scan_url('https://example.com'))
+        self.assertEqual(self.api.session.calls, [])
+
+if __name__ == '__main__':
+    unittest.main()